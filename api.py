@@ -2,13 +2,98 @@
 # EVE MARKET VERKTØY - API-MODUL
 # ==============================================================================
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+import random
+import json
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config
 import time
 import db 
+import fixtures
+import http_cache
+import universe
+from rate_limit import RateGovernor
+from telemetry import TELEMETRY
+
+# --- DELT HTTP-SESJON ---
+# Én felles sesjon med keep-alive gjør at TCP/TLS-håndtrykket mot ESI og
+# Fuzzwork kun betales én gang per tilkobling, ikke for hvert eneste kall.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def get_session():
+    """Returnerer den delte, trådsikre HTTP-sesjonen (opprettes ved første kall)."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                # Én pool per vert, stor nok til at alle skanner-tråder kan ha en åpen tilkobling
+                adapter = HTTPAdapter(pool_connections=config.HTTP_POOL_HOSTS,
+                                      pool_maxsize=config.HTTP_POOL_SIZE,
+                                      pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    'User-Agent': config.USER_AGENT,
+                    'Accept-Encoding': 'gzip, deflate',
+                    'Connection': 'keep-alive'
+                })
+                _SESSION = session
+    return _SESSION
+
+# Felles strupere for alle tråder. ESI styres av error limit-headerne,
+# Fuzzwork har ingen slike og holdes på en fast, høflig rate.
+ESI_GOVERNOR = RateGovernor("ESI", rate=config.ESI_START_RATE, min_rate=config.ESI_MIN_RATE,
+                            max_rate=config.ESI_MAX_RATE, burst=config.ESI_MAX_CONCURRENCY)
+FUZZWORK_GOVERNOR = RateGovernor("Fuzzwork", rate=config.FUZZWORK_RATE, min_rate=config.FUZZWORK_RATE / 4,
+                                 max_rate=config.FUZZWORK_RATE, burst=1, increase_step=0.1)
+
+# --- OPPTAK AV FIXTURES ---
+# Med config.FIXTURE_RECORD_FILE satt lagres alle ESI/Fuzzwork-svar (med
+# headere) i et arkiv som fixture_server.py kan spille av uten nett.
+_RECORDER = fixtures.FixtureArchive(config.FIXTURE_RECORD_FILE) if config.FIXTURE_RECORD_FILE else None
+
+def _record_fixture(response, elapsed):
+    request = response.request
+    relative = fixtures.relative_url(request.url, (config.ESI_BASE_URL, config.FUZZWORK_BASE_URL))
+    if relative is None or request.method == 'HEAD':
+        return   # SSO-kall og oppvarming spilles aldri inn
+    key = fixtures.fixture_key(request.method, relative, request.body)
+    _RECORDER.record(key, response.status_code, response.headers, response.content, elapsed)
+
+def _request(method, url, **kwargs):
+    """Sentralt punkt for alle HTTP-kall i appen. Alle kall måles i telemetrien."""
+    start = time.monotonic()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.RequestException:
+        TELEMETRY.record_request(url, time.monotonic() - start)
+        raise
+    elapsed = time.monotonic() - start
+    TELEMETRY.record_request(url, elapsed, response.status_code, len(response.content))
+    if _RECORDER is not None:
+        _record_fixture(response, elapsed)
+    return response
+
+def warm_up_connections():
+    """
+    Åpner tilkoblinger mot ESI og Fuzzwork på forhånd, slik at det første
+    skannet slipper å vente på DNS-oppslag og TLS-håndtrykk.
+    """
+    for base_url_name, path in config.WARM_UP_PATHS:
+        url = getattr(config, base_url_name) + path
+        try:
+            _request('HEAD', url, timeout=5)
+        except requests.RequestException:
+            pass
 
 def fetch_blueprint_details(type_id):
     """
-    Henter blueprint-detaljer fra den lokale SDE-databasen via db-modulen.
+    Henter blueprint-detaljer fra oppskriftsindekset i db-modulen (lastet fra SDE én gang).
     """
     return db.get_blueprint_from_sde(type_id)
 
@@ -16,7 +101,7 @@ def fetch_industry_system_indices():
     if config.SYSTEM_INDICES_CACHE:
         return config.SYSTEM_INDICES_CACHE
     
-    url = "https://esi.evetech.net/latest/industry/systems/?datasource=tranquility"
+    url = f"{config.ESI_BASE_URL}/latest/industry/systems/?datasource=tranquility"
     response = fetch_esi_data(url)
     data = response.json() if response else None
     
@@ -26,43 +111,321 @@ def fetch_industry_system_indices():
         return config.SYSTEM_INDICES_CACHE
     return None
 
-def fetch_esi_data(url, token=None, page=None):
+# --- SAMKJØRING AV LIKE KALL (single-flight) ---
+# Flere tråder ber ofte om nøyaktig det samme samtidig (f.eks. lommebok-
+# journalen ved innlogging). Bare den første gjør kallet; de andre venter
+# på det og får samme resultat.
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Lar samtidige kall med samme nøkkel dele ett pågående kall og dets resultat."""
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, func, *args, copy_result=None, on_shared=None, **kwargs):
+        """
+        Kjører func(*args, **kwargs), med mindre et kall med samme nøkkel allerede
+        pågår; da ventes det på det (og on_shared() kalles). copy_result brukes på
+        resultatet for de som ventet, slik at de ikke deler muterbare lister med
+        den som hentet.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlightCall()
+            else:
+                self.shared += 1
+
+        if not leader:
+            if on_shared:
+                on_shared()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy_result(call.result) if copy_result and call.result is not None else call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+_IN_FLIGHT = SingleFlight()
+
+# --- NYE FORSØK ---
+RETRYABLE_STATUS_CODES = {420, 429, 500, 502, 503, 504}
+
+class RetryBudget:
+    """
+    Teller nye forsøk og oppgitte kall. Et skann får et eget budsjett slik at
+    en ESI-nedetid ikke gjør at hvert eneste kall prøves på nytt i det uendelige.
+    """
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.retried = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def try_consume(self):
+        with self._lock:
+            if self.limit is not None and self.retried >= self.limit:
+                return False
+            self.retried += 1
+            return True
+
+    def record_give_up(self):
+        with self._lock:
+            self.gave_up += 1
+
+    def stats(self):
+        with self._lock:
+            return {'retried': self.retried, 'gave_up': self.gave_up}
+
+_RETRY_BUDGET = RetryBudget()
+
+def begin_retry_budget(limit):
+    """Starter et nytt budsjett for nye forsøk (kalles ved starten av et skann)."""
+    global _RETRY_BUDGET
+    _RETRY_BUDGET = RetryBudget(limit)
+
+def end_retry_budget():
+    """Avslutter skannets budsjett og returnerer hvor mange kall som ble prøvd på nytt eller gitt opp."""
+    global _RETRY_BUDGET
+    stats = _RETRY_BUDGET.stats()
+    _RETRY_BUDGET = RetryBudget()
+    return stats
+
+# Ekstra tall i telemetrirapporten (innstillingsfanen og JSON-dumpen ved avslutning)
+TELEMETRY.register_source('rate_governors', lambda: {g.name: round(g.rate, 2) for g in (ESI_GOVERNOR, FUZZWORK_GOVERNOR)})
+TELEMETRY.register_source('retry_budget', lambda: _RETRY_BUDGET.stats())
+TELEMETRY.register_source('single_flight_shared', lambda: _IN_FLIGHT.shared)
+TELEMETRY.register_source('cache_store', lambda: config.CACHE_STORE.stats())
+
+def _retry_delay(attempt, response):
+    """Eksponentiell backoff med 'full jitter', men aldri kortere enn det ESI ber om."""
+    delay = random.uniform(0, min(config.ESI_RETRY_MAX_DELAY, config.ESI_RETRY_BASE_DELAY * (2 ** attempt)))
+    if response is not None:
+        requested = response.headers.get('Retry-After')
+        if response.status_code == 420:
+            requested = response.headers.get('X-ESI-Error-Limit-Reset', requested)
+        try:
+            delay = max(delay, float(requested)) if requested is not None else delay
+        except ValueError:
+            pass
+    return delay
+
+def fetch_esi_data(url, token=None, page=None, use_cache=True):
+    # Responsen er skrivebeskyttet for kallerne og kan deles direkte. use_cache er med i
+    # nøkkelen, slik at et kall uten cache aldri får et svar som ble servert fra cachen.
+    return _IN_FLIGHT.do(('GET', url, page, token, use_cache), _fetch_esi_data, url, token, page, use_cache,
+                         on_shared=lambda: TELEMETRY.record_shared(url))
+
+def _fetch_esi_data(url, token=None, page=None, use_cache=True):
     headers = {'User-Agent': config.USER_AGENT}
     params = {}
     if token:
         headers['Authorization'] = f"Bearer {token}"
     if page:
         params['page'] = page
+
+    # Ferske svar serveres fra disk; utdaterte revalideres med ETag. Under
+    # fixture-opptak hoppes cachen over, ellers ville ikke alle svar blitt spilt inn.
+    cache = http_cache.get_cache() if use_cache and _RECORDER is None else None
+    cache_key = http_cache.make_key(url, params, token) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if http_cache.is_fresh(cached):
+        TELEMETRY.record_cache_hit(url)
+        return http_cache.build_response(url, cached)
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
         
+    error = None
+    for attempt in range(config.ESI_MAX_RETRIES + 1):
+        response = None
+        try:
+            ESI_GOVERNOR.acquire()
+            response = _request('GET', url, headers=headers, params=params, timeout=10)
+            ESI_GOVERNOR.observe(response.status_code, response.headers)
+        except requests.RequestException as e:
+            ESI_GOVERNOR.observe_failure()
+            error = e
+        else:
+            if response.status_code == 304 and cached:
+                return http_cache.build_response(url, cache.refresh(cache_key, cached, response))
+            if response.ok:
+                if cache:
+                    cache.store(cache_key, response)
+                return response
+            error = f"HTTP {response.status_code}"
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                # 4xx-svar er endelige; et nytt forsøk gir samme svar
+                print(f"ESI request failed for {url}: {error}")
+                return None
+
+        if attempt == config.ESI_MAX_RETRIES or not _RETRY_BUDGET.try_consume():
+            break
+        TELEMETRY.record_retry(url)
+        time.sleep(_retry_delay(attempt, response))
+
+    _RETRY_BUDGET.record_give_up()
+    TELEMETRY.record_give_up(url)
+    print(f"ESI request failed for {url}: {error}")
+    return None
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+def iter_json_array(text):
+    """
+    Dekoder en JSON-liste ett element om gangen, slik at hvert element kan
+    filtreres og kastes før neste leses, i stedet for å bygge hele lista først.
+    """
+    match_ws = _JSON_WHITESPACE.match
+    index = match_ws(text, 0).end()
+    if text[index:index + 1] != '[':
+        raise ValueError("Forventet en JSON-liste")
+    index = match_ws(text, index + 1).end()
+    if text[index:index + 1] == ']':
+        return
+    while True:
+        item, index = _JSON_DECODER.raw_decode(text, index)
+        yield item
+        index = match_ws(text, index).end()
+        separator = text[index:index + 1]
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"Ugyldig JSON-liste ved posisjon {index}")
+        index = match_ws(text, index + 1).end()
+
+class FieldFilter(namedtuple('FieldFilter', ['conditions'])):
+    """
+    Hashbart elementfilter for fetch_all_pages: et element beholdes når verdien
+    i hvert felt finnes i feltets verdimengde. Like filtre er like nøkler, slik
+    at samtidige kall med samme filter kan dele én nedlasting.
+    """
+    def __call__(self, record):
+        return all(record.get(field) in values for field, values in self.conditions)
+
+def field_filter(**conditions):
+    """Lager et FieldFilter, f.eks. field_filter(system_id=highsec_systems, type_id=wanted_types)."""
+    return FieldFilter(tuple(sorted((field, frozenset(values)) for field, values in conditions.items())))
+
+def make_record_parser(record_filter=None, fields=None):
+    """
+    Lager en sideparser som bare beholder elementer der record_filter(element)
+    er sann, og bare feltene i 'fields'. Brukes med fetch_all_pages for store
+    ordredumper der det meste av innholdet uansett forkastes.
+    """
+    def parse(response):
+        records = []
+        for record in iter_json_array(response.text):
+            if record_filter is not None and not record_filter(record):
+                continue
+            records.append({field: record.get(field) for field in fields} if fields else record)
+        return records
+    return parse
+
+def _parse_json(response):
+    return response.json()
+
+def _fetch_page_data(url, token, page, parser=_parse_json, use_cache=True):
+    """Henter én side fra et paginert endepunkt. Returnerer (data, respons) eller (None, None)."""
+    response = fetch_esi_data(url, token=token, page=page, use_cache=use_cache)
+    if not response:
+        return None, None
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        return response
-    except requests.RequestException as e:
-        print(f"ESI request failed for {url}: {e}")
-        return None
+        return parser(response), response
+    except ValueError:
+        return None, None
+
+def _fetch_pages(url, token=None, parser=_parse_json, use_cache=True):
+    """
+    Henter alle sider fra et paginert ESI-endepunkt.
+    Side 1 hentes først for å lese 'x-pages', deretter hentes resten parallelt
+    og settes sammen i riktig siderekkefølge. Nye forsøk for en side gjøres
+    bare i fetch_esi_data (ESI_MAX_RETRIES og skannets budsjett); en side som
+    likevel feiler mangler i resultatet. Hver side tolkes med 'parser' straks
+    den kommer inn.
+    Med use_cache=False lagres ikke sidene i HTTP-cachen på disk.
+    Returnerer (resultater, komplett, headere fra side 1).
+    """
+    first_data, first_response = _fetch_page_data(url, token, 1, parser, use_cache)
+    if first_data is None:
+        return [], False, {}
+
+    total_pages = int(first_response.headers.get('x-pages', 1))
+    pages = {1: first_data}
+
+    remaining_pages = list(range(2, total_pages + 1))
+    if remaining_pages:
+        workers = min(config.ESI_PAGE_WORKERS, len(remaining_pages))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_fetch_page_data, url, token, page, parser, use_cache): page for page in remaining_pages}
+            for future in as_completed(futures):
+                page = futures[future]
+                data, _ = future.result()
+                if data is not None:
+                    pages[page] = data
 
-def fetch_all_pages(url, token=None): ### ENDRET: token er valgfri
     all_results = []
-    current_page = 1
-    total_pages = 1
+    for page in range(1, total_pages + 1):
+        all_results.extend(pages.get(page, []))
 
-    while current_page <= total_pages:
-        response = fetch_esi_data(url, token=token, page=current_page)
-        if not response:
-            break
+    is_complete = len(pages) == total_pages
+    if not is_complete:
+        print(f"Ufullstendig henting av {url}: {total_pages - len(pages)} av {total_pages} sider mangler.")
 
-        data = response.json()
-        if not data:
-            break
-        all_results.extend(data)
+    return all_results, is_complete, first_response.headers
 
-        if current_page == 1:
-            total_pages = int(response.headers.get('x-pages', 1))
-        
-        current_page += 1
-        
-    return all_results
+def fetch_all_pages(url, token=None, with_status=False, record_filter=None, fields=None): ### ENDRET: token er valgfri
+    """
+    Henter alle sider. Med with_status=True returneres (resultater, komplett).
+    Med record_filter og/eller fields dekodes hver side element for element og
+    bare det som trengs beholdes (se make_record_parser). record_filter er med
+    i nøkkelen for samkjøring, og bør derfor være et FieldFilter (se
+    field_filter) og ikke en ny lambda per kall. Samtidige kall for samme URL og
+    filter deler én nedlasting; de som venter får hver sin liste, men elementene
+    deles og skal ikke endres av kallerne.
+    """
+    fields = tuple(fields) if fields else None
+    all_results, is_complete = _IN_FLIGHT.do(('PAGES', url, token, record_filter, fields), _fetch_all_pages,
+                                             url, token, record_filter, fields, copy_result=_copy_pages_result,
+                                             on_shared=lambda: TELEMETRY.record_shared(url))
+    return (all_results, is_complete) if with_status else all_results
+
+def _copy_pages_result(result):
+    all_results, is_complete = result
+    return list(all_results), is_complete
+
+def _fetch_all_pages(url, token, record_filter, fields):
+    parser = make_record_parser(record_filter, fields) if (record_filter or fields) else _parse_json
+    all_results, is_complete, _ = _fetch_pages(url, token, parser)
+    return all_results, is_complete
+
+def fetch_region_orders(region_id, order_type="all", fields=None):
+    """
+    Henter hele ordreboken for en region.
+    Returnerer (ordrer, komplett, utløpstid som epoch-sekunder).
+    Med fields beholdes bare de feltene av hver ordre (se make_record_parser).
+    Sidene lagres ikke i HTTP-cachen; snapshotet i order_book er cachen.
+    """
+    url = f"{config.ESI_BASE_URL}/latest/markets/{region_id}/orders/?datasource=tranquility&order_type={order_type}"
+    parser = make_record_parser(fields=tuple(fields)) if fields else _parse_json
+    orders, is_complete, headers = _fetch_pages(url, parser=parser, use_cache=False)
+    return orders, is_complete, http_cache.parse_expires(headers)
 
 ### NY ###
 def fetch_structure_market_orders(structure_id, token):
@@ -74,13 +437,13 @@ def fetch_structure_market_orders(structure_id, token):
         print("Token mangler for å hente data fra structure.")
         return None
         
-    url = f"https://esi.evetech.net/latest/markets/structures/{structure_id}/"
+    url = f"{config.ESI_BASE_URL}/latest/markets/structures/{structure_id}/"
     return fetch_all_pages(url, token)
 
 ### NY ###
 def get_structure_details(structure_id, token):
     """Henter nøkkeldetaljer for en spesifikk struktur."""
-    url = f"https://esi.evetech.net/latest/universe/structures/{structure_id}/?datasource=tranquility"
+    url = f"{config.ESI_BASE_URL}/latest/universe/structures/{structure_id}/?datasource=tranquility"
     response = fetch_esi_data(url, token=token)
     if not response:
         return None
@@ -90,8 +453,9 @@ def get_structure_details(structure_id, token):
     if not system_id:
         return None
 
-    system_name = db.get_system_name_from_sde(system_id)
-    region_id = db.get_region_for_system(system_id)
+    uni = universe.get_universe()
+    system_name = uni.system_name(system_id) if uni else db.get_system_name_from_sde(system_id)
+    region_id = uni.region_for_system(system_id) if uni else db.get_region_for_system(system_id)
 
     return {
         "name": data.get('name', 'Ukjent Navn'),
@@ -101,15 +465,15 @@ def get_structure_details(structure_id, token):
     }
 
 def fetch_character_orders_paginated(character_id, token):
-    url = f"https://esi.evetech.net/v1/characters/{character_id}/orders/"
+    url = f"{config.ESI_BASE_URL}/v1/characters/{character_id}/orders/"
     return fetch_all_pages(url, token)
 
 def fetch_character_transactions_paginated(character_id, token):
-    url = f"https://esi.evetech.net/v1/characters/{character_id}/wallet/transactions/"
+    url = f"{config.ESI_BASE_URL}/v1/characters/{character_id}/wallet/transactions/"
     return fetch_all_pages(url, token)
 
 def fetch_character_assets_paginated(character_id, token):
-    url = f"https://esi.evetech.net/v5/characters/{character_id}/assets/"
+    url = f"{config.ESI_BASE_URL}/v5/characters/{character_id}/assets/"
     return fetch_all_pages(url, token)
 
 # ==============================================================================
@@ -117,20 +481,22 @@ def fetch_character_assets_paginated(character_id, token):
 # ==============================================================================
 def fetch_character_ship(character_id, token):
     """Henter informasjon om spillerens aktive skip."""
-    url = f"https://esi.evetech.net/v2/characters/{character_id}/ship/"
+    url = f"{config.ESI_BASE_URL}/v2/characters/{character_id}/ship/"
     response = fetch_esi_data(url, token=token)
     return response.json() if response else None
 # ==============================================================================
 
 def open_market_window_in_game(type_id, token):
-    url = "https://esi.evetech.net/v1/ui/openwindow/marketdetails/"
+    url = f"{config.ESI_BASE_URL}/v1/ui/openwindow/marketdetails/"
     params = {'type_id': type_id}
     headers = {
         'User-Agent': config.USER_AGENT,
         'Authorization': f"Bearer {token}"
     }
     try:
-        response = requests.post(url, headers=headers, params=params, timeout=10)
+        ESI_GOVERNOR.acquire()
+        response = _request('POST', url, headers=headers, params=params, timeout=10)
+        ESI_GOVERNOR.observe(response.status_code, response.headers)
         response.raise_for_status()
         return True
     except requests.RequestException as e:
@@ -143,7 +509,7 @@ def fetch_tokens_from_code(client_id, secret_key, code):
     data = {'grant_type': 'authorization_code', 'code': code}
     
     try:
-        response = requests.post(url, headers=headers, data=data, auth=(client_id, secret_key))
+        response = _request('POST', url, headers=headers, data=data, auth=(client_id, secret_key), timeout=10)
         response.raise_for_status()
         return response.json()
     except requests.RequestException:
@@ -155,104 +521,195 @@ def refresh_esi_tokens(client_id, secret_key, refresh_token):
     data = {'grant_type': 'refresh_token', 'refresh_token': refresh_token}
 
     try:
-        response = requests.post(url, headers=headers, data=data, auth=(client_id, secret_key))
+        response = _request('POST', url, headers=headers, data=data, auth=(client_id, secret_key), timeout=10)
         response.raise_for_status()
         return response.json()
     except requests.RequestException:
         return None
 
 def fetch_market_orders(region_id, type_id):
-    url = f"https://esi.evetech.net/latest/markets/{region_id}/orders/?datasource=tranquility&type_id={type_id}"
+    url = f"{config.ESI_BASE_URL}/latest/markets/{region_id}/orders/?datasource=tranquility&type_id={type_id}"
     response = fetch_esi_data(url)
     return response.json() if response else None
 
 def fetch_esi_history(region_id, type_id):
-    url = f"https://esi.evetech.net/latest/markets/{region_id}/history/?datasource=tranquility&type_id={type_id}"
+    url = f"{config.ESI_BASE_URL}/latest/markets/{region_id}/history/?datasource=tranquility&type_id={type_id}"
     response = fetch_esi_data(url)
     return response.json() if response else None
 
-def fetch_type_attributes(type_id):
-    if type_id in config.TYPE_ATTRIBUTES_CACHE: 
-        return config.TYPE_ATTRIBUTES_CACHE[type_id]
-    
-    name_from_sde = db.get_type_name_from_sde(type_id)
-    if not name_from_sde.startswith("Ukjent"):
-        url = f"https://esi.evetech.net/latest/universe/types/{type_id}/?datasource=tranquility"
-        response = fetch_esi_data(url)
-        data = response.json() if response else None
-        if data: 
-            config.TYPE_ATTRIBUTES_CACHE[type_id] = data
-        return data
-        
-    url = f"https://esi.evetech.net/latest/universe/types/{type_id}/?datasource=tranquility"
+def _fetch_type_attributes_from_esi(type_id):
+    url = f"{config.ESI_BASE_URL}/latest/universe/types/{type_id}/?datasource=tranquility"
     response = fetch_esi_data(url)
-    data = response.json() if response else None
-    if data: 
-        config.TYPE_ATTRIBUTES_CACHE[type_id] = data
-    return data
+    return response.json() if response else None
 
-def fetch_fuzzwork_market_data(station_id, type_ids):
-    url = "https://market.fuzzwork.co.uk/aggregates/"
+def fetch_type_attributes_bulk(type_ids):
+    """
+    Returnerer {type_id: attributter} for alle type_ids. Det som ikke allerede
+    er i cachen slås opp i SDE i én omgang; bare varer som mangler i SDE
+    hentes fra ESI, og da samtidig i stedet for én etter én.
+    """
+    result = {}
+    missing = []
+    for type_id in type_ids:
+        cached = config.TYPE_ATTRIBUTES_CACHE.get(type_id)
+        if cached is not None:
+            result[type_id] = cached
+        else:
+            missing.append(type_id)
+    if not missing:
+        return result
+
+    from_sde = db.get_type_attributes_bulk(missing)
+    config.TYPE_ATTRIBUTES_CACHE.update(from_sde)
+    result.update(from_sde)
+
+    esi_missing = [type_id for type_id in missing if type_id not in from_sde]
+    if esi_missing:
+        with ThreadPoolExecutor(max_workers=min(config.ESI_PAGE_WORKERS, len(esi_missing))) as pool:
+            for type_id, data in zip(esi_missing, pool.map(_fetch_type_attributes_from_esi, esi_missing)):
+                if data:
+                    config.TYPE_ATTRIBUTES_CACHE[type_id] = data
+                    result[type_id] = data
+    return result
+
+def fetch_type_attributes(type_id):
+    return fetch_type_attributes_bulk([type_id]).get(type_id)
+
+def preload_type_attributes(type_ids):
+    """Fyller attributt-cachen fra SDE ved oppstart (uten ESI-kall)."""
+    loaded = db.get_type_attributes_bulk([type_id for type_id in type_ids if type_id not in config.TYPE_ATTRIBUTES_CACHE])
+    config.TYPE_ATTRIBUTES_CACHE.update(loaded)
+    print(f"Lastet attributter for {len(loaded)} varer fra SDE.")
+
+def fetch_fuzzwork_aggregates(station_id, type_ids):
+    """Ett kall mot Fuzzwork sitt aggregat-endepunkt. Returnerer rå JSON, eller None ved feil."""
+    url = f"{config.FUZZWORK_BASE_URL}/aggregates/"
     params = {'station': station_id, 'types': ",".join(map(str, type_ids))}
     headers = {'User-Agent': config.USER_AGENT}
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=20)
+        FUZZWORK_GOVERNOR.acquire()
+        response = _request('GET', url, params=params, headers=headers, timeout=20)
+        FUZZWORK_GOVERNOR.observe(response.status_code, response.headers)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException:
-        return {}
+    except (requests.RequestException, ValueError):
+        FUZZWORK_GOVERNOR.observe_failure()
+        return None
+
+def fetch_fuzzwork_market_data(station_id, type_ids):
+    return fetch_fuzzwork_aggregates(station_id, type_ids) or {}
 
-def populate_all_regions_cache():
+def _fetch_region_name_from_esi(region_id):
+    response = fetch_esi_data(f"{config.ESI_BASE_URL}/latest/universe/regions/{region_id}/")
+    data = response.json() if response else None
+    return data.get('name') if data else None
+
+def populate_all_regions_cache(use_esi=True):
+    """
+    Fyller regionlisten fra univers-modellen (SDE). ESI brukes bare som
+    reserve hvis SDE ikke er tilgjengelig, og da med navneoppslagene samtidig.
+    """
     if config.ALL_REGIONS_CACHE: return
 
-    response = fetch_esi_data("https://esi.evetech.net/latest/universe/regions/")
+    uni = universe.get_universe()
+    if uni:
+        config.ALL_REGIONS_CACHE.update(uni.k_space_regions())
+        return
+    if not use_esi: return
+
+    response = fetch_esi_data(f"{config.ESI_BASE_URL}/latest/universe/regions/")
     if not response: return
     region_ids = response.json()
 
     k_space_region_ids = [rid for rid in region_ids if str(rid).startswith('10')]
-    for region_id in k_space_region_ids:
-        region_response = fetch_esi_data(f"https://esi.evetech.net/latest/universe/regions/{region_id}/")
-        if region_response:
-            region_data = region_response.json()
-            if region_data and 'name' in region_data:
-                config.ALL_REGIONS_CACHE[region_data['name']] = region_id
+    with ThreadPoolExecutor(max_workers=config.ESI_PAGE_WORKERS) as pool:
+        for region_id, name in zip(k_space_region_ids, pool.map(_fetch_region_name_from_esi, k_space_region_ids)):
+            if name:
+                config.ALL_REGIONS_CACHE[name] = region_id
 
 ### ENDRET ###
-def get_station_name_with_cache(location_id):
+# ID-områder fra ESI: NPC-stasjoner ligger i 60M-64M, spillerstrukturer over 1 billion
+NPC_STATION_ID_RANGE = range(60_000_000, 64_000_000)
+STRUCTURE_ID_MIN = 1_000_000_000_000
+UNIVERSE_NAMES_MAX_IDS = 1000
+
+def _post_universe_names(ids):
+    """Slår opp navn for opptil 1000 ID-er i ett kall. Returnerer {id: navn}."""
+    url = f"{config.ESI_BASE_URL}/latest/universe/names/?datasource=tranquility"
+    headers = {'User-Agent': config.USER_AGENT}
+    try:
+        ESI_GOVERNOR.acquire()
+        response = _request('POST', url, headers=headers, json=list(ids), timeout=10)
+        ESI_GOVERNOR.observe(response.status_code, response.headers)
+        response.raise_for_status()
+        return {entry['id']: entry['name'] for entry in response.json()}
+    except (requests.RequestException, ValueError) as e:
+        print(f"ESI navneoppslag feilet: {e}")
+        return {}
+
+def _fetch_structure_name(structure_id, token):
+    url = f"{config.ESI_BASE_URL}/latest/universe/structures/{structure_id}/?datasource=tranquility"
+    response = fetch_esi_data(url, token=token)
+    return response.json().get('name') if response else None
+
+def resolve_location_names(location_ids, token=None):
     """
-    Henter navnet på en lokasjon (stasjon eller struktur) med cache.
-    Prøver først som stasjon, deretter som struktur.
+    Slår opp navn for mange lokasjoner i én omgang og returnerer {id: navn}.
+    Rekkefølge: cache -> handelshubene -> SDE (staStations) -> ett samlet
+    POST til /universe/names/ -> strukturer samtidig med token.
+    Lokasjoner som ikke kan løses får et plassholdernavn.
     """
-    if location_id in config.STATION_CACHE: 
-        return config.STATION_CACHE[location_id]
-    
-    # Sjekk om det er en pre-definert hub
-    for name, info in config.STATIONS_INFO.items():
-        if info['id'] == location_id:
-            config.STATION_CACHE[location_id] = name
-            return name
-            
-    # Forsøk å hente som NPC-stasjon først
-    station_url = f"https://esi.evetech.net/latest/universe/stations/{location_id}/"
-    response = fetch_esi_data(station_url)
-    if response:
-        data = response.json()
-        if data and 'name' in data:
-            name = data['name']
+    names = {}
+    unknown = set()
+    for location_id in set(location_ids):
+        cached = config.STATION_CACHE.get(location_id)
+        if cached is not None:
+            names[location_id] = cached
+        else:
+            unknown.add(location_id)
+    if not unknown:
+        return names
+
+    resolved = {}
+    hub_names = {info['id']: name for name, info in config.STATIONS_INFO.items()}
+    resolved.update({location_id: hub_names[location_id] for location_id in unknown if location_id in hub_names})
+
+    stations = [location_id for location_id in unknown - resolved.keys() if location_id in NPC_STATION_ID_RANGE]
+    if stations:
+        uni = universe.get_universe()
+        resolved.update(db.get_station_names_bulk(stations) if uni is None else
+                        {s_id: uni.stations[s_id].name for s_id in stations if s_id in uni.stations})
+        stations = [location_id for location_id in stations if location_id not in resolved]
+        for i in range(0, len(stations), UNIVERSE_NAMES_MAX_IDS):
+            resolved.update(_post_universe_names(stations[i:i + UNIVERSE_NAMES_MAX_IDS]))
+
+    structures = [location_id for location_id in unknown - resolved.keys() if location_id >= STRUCTURE_ID_MIN]
+    if structures and token:
+        with ThreadPoolExecutor(max_workers=min(config.ESI_PAGE_WORKERS, len(structures))) as pool:
+            for structure_id, name in zip(structures, pool.map(lambda s_id: _fetch_structure_name(s_id, token), structures)):
+                if name:
+                    resolved[structure_id] = name
+
+    for location_id in unknown:
+        # Uten token kan strukturer ikke slås opp; de får plassholder, men caches ikke
+        name = resolved.get(location_id)
+        if name:
             config.STATION_CACHE[location_id] = name
-            return name
-            
-    # Hvis det feilet, forsøk å hente som brukereid stasjon
-    # Dette krever token, som vi ikke har universell tilgang til her.
-    # Vi stoler derfor på at navnet er cachet fra et annet sted (f.eks. asset-listen)
-    # ELLER at brukeren legger det til manuelt.
-    # For robusthet, kaller vi ikke ESI her, men en bedre app ville sendt token.
-    # Fallback:
-    name_not_found = f"Lokasjon ID: {location_id}"
-    config.STATION_CACHE[location_id] = name_not_found
-    return name_not_found
-
-def get_stations_in_region(region_id):
+        names[location_id] = name or f"Lokasjon ID: {location_id}"
+    return names
+
+def get_station_name_with_cache(location_id, token=None):
+    """Henter navnet på én lokasjon (stasjon eller struktur) med cache."""
+    return resolve_location_names([location_id], token)[location_id]
+
+def get_stations_in_region(region_id, user_structures=()):
+    """
+    Returnerer {stasjonsID: navn} for en region. Har regionen en kjent
+    handelshub, brukes bare den (fokusert skann); ellers alle stasjoner i
+    regionen fra univers-modellen (dypt skann). Brukerens egne strukturer
+    (settings['user_structures']) i regionen tas med i begge tilfeller.
+    """
+    structures_in_region = {s['id']: s['name'] for s in user_structures if s.get('region_id') == region_id}
     major_hubs_in_region = {}
     for station_name, station_info in config.STATIONS_INFO.items():
         if station_info['region_id'] == region_id:
@@ -260,29 +717,31 @@ def get_stations_in_region(region_id):
     
     if major_hubs_in_region:
         print(f"Fokusert skann: Fant {len(major_hubs_in_region)} handelshub(er) i region {region_id}.")
+        major_hubs_in_region.update(structures_in_region)
         return major_hubs_in_region
 
-    print(f"Dypt skann: Ingen kjente huber funnet i region {region_id}. Starter fullt stasjonssøk...")
-    systems_url = f"https://esi.evetech.net/latest/universe/regions/{region_id}/"
+    uni = universe.get_universe()
+    if uni:
+        stations = uni.stations_in_region(region_id, user_structures)
+        print(f"Dypt skann: Fant {len(stations)} stasjoner i region {region_id}.")
+        return stations
+
+    # Reserve uten SDE: gå gjennom systemene via ESI og slå opp navnene samlet til slutt
+    print(f"Dypt skann: SDE utilgjengelig, henter stasjoner i region {region_id} fra ESI...")
+    systems_url = f"{config.ESI_BASE_URL}/latest/universe/regions/{region_id}/"
     region_response = fetch_esi_data(systems_url)
     if not region_response: return {}
     
     region_data = region_response.json()
     if not region_data or 'systems' not in region_data: return {}
 
-    all_stations = {}
-    systems_in_region = region_data.get('systems', [])
-    
-    for system_id in systems_in_region:
-        system_response = fetch_esi_data(f"https://esi.evetech.net/latest/universe/systems/{system_id}/")
-        if system_response:
-            system_data = system_response.json()
-            if system_data and 'stations' in system_data:
-                for station_id in system_data['stations']:
-                    station_info = get_station_name_with_cache(station_id)
-                    if station_info != str(station_id): 
-                        all_stations[station_id] = station_info
-        
-        time.sleep(0.05)
-        
-    return all_stations
\ No newline at end of file
+    def fetch_system_stations(system_id):
+        system_response = fetch_esi_data(f"{config.ESI_BASE_URL}/latest/universe/systems/{system_id}/")
+        system_data = system_response.json() if system_response else None
+        return system_data.get('stations', []) if system_data else []
+
+    with ThreadPoolExecutor(max_workers=config.ESI_PAGE_WORKERS) as pool:
+        station_ids = [s_id for ids in pool.map(fetch_system_stations, region_data['systems']) for s_id in ids]
+    all_stations = resolve_location_names(station_ids)
+    all_stations.update(structures_in_region)
+    return all_stations
@@ -0,0 +1,71 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - ASYNKRON ESI-KLIENT
+# ==============================================================================
+# Asyncio-fasade over api-modulen. Kallene kjøres i en delt trådpool slik at
+# de fortsatt går gjennom samme HTTP-sesjon, cache og rate-governor, men en
+# skanner kan nå vente på hundrevis av kall samtidig fra én event loop.
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import api
+import config
+import history_store
+
+# Delt grense for alle asynkrone ESI-kall i prosessen
+_EXECUTOR = ThreadPoolExecutor(max_workers=config.ESI_MAX_CONCURRENCY, thread_name_prefix="esi-async")
+
+async def _call(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+async def fetch_market_orders(region_id, type_id):
+    return await _call(api.fetch_market_orders, region_id, type_id)
+
+async def fetch_esi_history(region_id, type_id):
+    return await _call(api.fetch_esi_history, region_id, type_id)
+
+async def fetch_history_summary(region_id, type_id):
+    return await _call(history_store.get_summary, region_id, type_id)
+
+async def fetch_type_attributes(type_id):
+    return await _call(api.fetch_type_attributes, type_id)
+
+async def fetch_all_pages(url, token=None, with_status=False, record_filter=None, fields=None):
+    return await _call(api.fetch_all_pages, url, token, with_status=with_status, record_filter=record_filter, fields=fields)
+
+async def gather_by_key(coro_factory, keys, active_flag=None, on_progress=None):
+    """
+    Kjører coro_factory(key) for alle nøkler med felles samtidighetsgrense og
+    returnerer {key: resultat}. Avbrytes skannet, kanselleres resten og det
+    som er ferdig så langt returneres.
+    """
+    keys = list(keys)
+    semaphore = asyncio.Semaphore(config.ESI_MAX_CONCURRENCY)
+    results = {}
+
+    async def run_one(key):
+        async with semaphore:
+            if active_flag is not None and not active_flag.is_set():
+                return key, None
+            return key, await coro_factory(key)
+
+    tasks = [asyncio.ensure_future(run_one(key)) for key in keys]
+    try:
+        for done_count, task in enumerate(asyncio.as_completed(tasks), start=1):
+            key, value = await task
+            results[key] = value
+            if on_progress:
+                on_progress(done_count, len(keys))
+            if active_flag is not None and not active_flag.is_set():
+                break
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+def run(coro):
+    """Kjører en korutine på en egen event loop i den kallende (skanner-)tråden."""
+    return asyncio.run(coro)
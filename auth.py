@@ -180,7 +180,7 @@ class AuthManager:
         if not token:
             return False
 
-        response = api.fetch_esi_data("https://esi.evetech.net/verify/?datasource=tranquility", token=token)
+        response = api.fetch_esi_data(f"{config.ESI_BASE_URL}/verify/?datasource=tranquility", token=token)
         char_data = response.json() if response else None
 
         if char_data and 'CharacterID' in char_data:
@@ -0,0 +1,186 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - PERSISTENT CACHE-LAGER
+# ==============================================================================
+# Felles lager for de globale cachene i config (vareattributter, regioner,
+# stasjonsnavn, industri-indekser). Hvert navnerom har egen levetid og
+# maksstørrelse (LRU), er trådsikkert og lagres i en lokal SQLite-fil slik at
+# neste oppstart slipper å gjøre de samme oppslagene på nytt.
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+class CacheNamespace(MutableMapping):
+    """
+    Dict-lignende cache med levetid (ttl, sekunder) og LRU-grense.
+    Kan brukes akkurat som de gamle modul-dictene i config.
+    """
+    def __init__(self, store, name, ttl, max_entries):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._store = store
+        self._data = OrderedDict()   # nøkkel -> (verdi, utløpstid)
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _ensure_loaded(self):
+        # Kalles med låsen holdt
+        if not self._loaded:
+            self._loaded = True
+            for key, value, expires in self._store.load_namespace(self.name):
+                self._data[key] = (value, expires)
+
+    def _live_entry(self, key, now):
+        # Kalles med låsen holdt. Fjerner utløpte oppføringer underveis.
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._data[key]
+            self.expirations += 1
+            self.dirty = True
+            return None
+        return entry
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._live_entry(key, time.time())
+            if entry is None:
+                self.misses += 1
+                raise KeyError(key)
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        # Teller ikke som treff; det gjør selve oppslaget etterpå
+        with self._lock:
+            self._ensure_loaded()
+            return self._live_entry(key, time.time()) is not None
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._ensure_loaded()
+            self._data[key] = (value, time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            self.dirty = True
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._ensure_loaded()
+            del self._data[key]
+            self.dirty = True
+
+    def _live_keys(self):
+        with self._lock:
+            self._ensure_loaded()
+            now = time.time()
+            return [key for key, (_, expires) in self._data.items() if expires > now]
+
+    def __iter__(self):
+        return iter(self._live_keys())
+
+    def __len__(self):
+        return len(self._live_keys())
+
+    def snapshot(self):
+        """Returnerer (nøkkel, verdi, utløpstid) for alle gyldige oppføringer, eldst brukt først."""
+        with self._lock:
+            self._ensure_loaded()
+            now = time.time()
+            self.dirty = False
+            return [(key, value, expires) for key, (value, expires) in self._data.items() if expires > now]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'expirations': self.expirations}
+
+class CacheStore:
+    """Samling av navnerom som lagres i én SQLite-fil."""
+    def __init__(self, path):
+        self.path = path
+        self.namespaces = {}
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._disabled = False
+        atexit.register(self.save)
+
+    def _connection(self):
+        # Kalles med _conn_lock holdt
+        if self._conn is None and not self._disabled:
+            try:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS cache_entries (
+                        namespace TEXT NOT NULL,
+                        cache_key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires REAL NOT NULL,
+                        position INTEGER NOT NULL,
+                        PRIMARY KEY (namespace, cache_key)
+                    )
+                """)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Kunne ikke åpne cache-lageret {self.path}: {e}. Cachene holdes kun i minnet.")
+                self._conn = None
+                self._disabled = True
+        return self._conn
+
+    def namespace(self, name, ttl, max_entries):
+        cache = CacheNamespace(self, name, ttl, max_entries)
+        self.namespaces[name] = cache
+        return cache
+
+    def load_namespace(self, name):
+        """Leser gyldige oppføringer for et navnerom fra disk, i LRU-rekkefølge."""
+        with self._conn_lock:
+            conn = self._connection()
+            if conn is None:
+                return []
+            try:
+                rows = conn.execute(
+                    "SELECT cache_key, value, expires FROM cache_entries WHERE namespace=? AND expires>? ORDER BY position",
+                    (name, time.time())
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"Kunne ikke lese cache '{name}': {e}")
+                return []
+        return [(json.loads(key), json.loads(value), expires) for key, value, expires in rows]
+
+    def save(self):
+        """Skriver alle endrede navnerom til disk."""
+        with self._conn_lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                for name, cache in self.namespaces.items():
+                    if not cache.dirty:
+                        continue
+                    rows = [(name, json.dumps(key), json.dumps(value), expires, position)
+                            for position, (key, value, expires) in enumerate(cache.snapshot())]
+                    conn.execute("DELETE FROM cache_entries WHERE namespace=?", (name,))
+                    conn.executemany(
+                        "INSERT INTO cache_entries (namespace, cache_key, value, expires, position) VALUES (?, ?, ?, ?, ?)", rows
+                    )
+                conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"Kunne ikke lagre cache-lageret: {e}")
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self.namespaces.items()}
@@ -4,6 +4,7 @@
 import json
 from tkinter import messagebox
 import customtkinter as ctk
+from cache_store import CacheStore
 
 # --- FILNAVN OG KONSTANTER ---
 ITEMS_FILE = 'items_filtered.json'
@@ -14,6 +15,57 @@ GOOD_DEAL_MARGIN = 10.0
 GOLDEN_DEAL_MIN_VOLUME = 500
 GOLDEN_DEAL_MAX_COMPETITION = 10
 
+# --- NETTVERK ---
+# Alle kall går mot disse adressene; pek dem mot fixture_server.py for å
+# kjøre skannerne mot innspilte svar uten nett.
+ESI_BASE_URL = "https://esi.evetech.net"
+FUZZWORK_BASE_URL = "https://market.fuzzwork.co.uk"
+FIXTURE_RECORD_FILE = None    # Filsti: spill inn alle ESI/Fuzzwork-svar (med headere) til dette fixture-arkivet
+ESI_MAX_CONCURRENCY = 16      # Maks samtidige ESI-kall fra skannerne
+ESI_PAGE_WORKERS = 8          # Parallelle sidehentinger per paginert endepunkt
+ORDER_BOOK_MAX_SNAPSHOTS = 4  # Regionale ordrebøker som holdes i minnet samtidig (de eldst brukte kastes først)
+HTTP_POOL_HOSTS = 4           # ESI, Fuzzwork, login og bilde-serveren
+HTTP_POOL_SIZE = ESI_MAX_CONCURRENCY + 4
+ESI_MAX_RETRIES = 4           # Nye forsøk per kall ved tidsavbrudd og 420/429/5xx
+ESI_RETRY_BASE_DELAY = 0.5
+ESI_RETRY_MAX_DELAY = 30.0
+SCAN_RETRY_BUDGET = 500       # Maks antall nye forsøk i løpet av ett skann
+ESI_START_RATE = 20.0         # Kall per sekund før governoren har sett noen headere
+ESI_MIN_RATE = 1.0
+ESI_MAX_RATE = 100.0
+FUZZWORK_RATE = 2.0           # Fuzzwork har ingen error limit; hold en fast, høflig rate
+PRICE_SOURCE = "ESI"          # "ESI": regn ut stasjonspriser lokalt fra ordreboken, "Fuzzwork": hent aggregater
+LOCAL_PRICE_MIN_TYPES = 1000  # Med "ESI" lastes ordreboken ned bare for så mange varer; færre prises fra Fuzzwork med mindre boken alt er i minnet
+FUZZWORK_MAX_CONCURRENCY = 4  # Maks samtidige aggregat-kall (i tillegg til raten over)
+FUZZWORK_START_CHUNK = 200    # Varer per kall før størrelsen justeres etter responstid
+FUZZWORK_MIN_CHUNK = 25
+FUZZWORK_MAX_CHUNK = 1000
+FUZZWORK_MAX_URL_LENGTH = 6000
+FUZZWORK_TARGET_LATENCY = 3.0 # Sekunder; raskere svar gir større grupper, tregere gir mindre
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_FILE = 'esi_cache.sqlite'
+RESPONSE_CACHE_MAX_AGE = 7 * 24 * 3600   # Oppføringer som ikke er revalidert på en uke slettes
+CACHE_STORE_FILE = 'cache_store.sqlite'
+SDE_EXTRACT_ENABLED = True             # Slå opp i det kompakte uttrekket i stedet for SQLite
+SDE_EXTRACT_FILE = 'sde_extract.bin'   # Bygges automatisk ved siden av SDE når den endres
+SDE_MMAP_SIZE = 512 * 1024 * 1024      # SDE leses via mmap; OS-ets sidecache deles av alle tråder
+SDE_CACHE_SIZE_KB = 16 * 1024          # SQLite-sidecache per tråd-tilkobling
+SDE_CACHED_STATEMENTS = 256            # Ferdigkompilerte spørringer per tilkobling
+JUMP_ROUTE_POLICY = "Korteste"         # Rutevalg for hopp-avstander: se jump_graph.ROUTE_POLICIES
+JUMP_TABLE_MAX_ROWS = 256              # Avstandsrader (én per startsystem og rutevalg) som holdes i minnet
+HISTORY_STORE_FILE = 'market_history.sqlite'
+HISTORY_STORE_MAX_AGE = 30 * 24 * 3600   # Varer som ikke er sett på en måned slettes
+HISTORY_ROLLOVER_UTC = (11, 15)          # Ny dag i historikken etter downtime (11:00 UTC) + margin
+TELEMETRY_FILE = 'http_telemetry.json'
+TELEMETRY_DUMP_AT_EXIT = True           # Skriv HTTP-statistikken til TELEMETRY_FILE ved avslutning
+TELEMETRY_REFRESH_MS = 2000             # Oppdateringsintervall for diagnosepanelet i innstillingsfanen
+STARTUP_TIMING_FILE = 'startup_timing.json'   # Tid til første vindu for de siste oppstartene
+# Stier som varmes opp ved start; base-URL-en leses først da, slik at fixture-serveren også gjelder her
+WARM_UP_PATHS = [
+    ("ESI_BASE_URL", "/latest/status/?datasource=tranquility"),
+    ("FUZZWORK_BASE_URL", "/aggregates/")
+]
+
 # --- DATA-Strukturer / Caches ---
 STATIONS_INFO = {
     "Jita": {"id": 60003760, "region_id": 10000002, "system_id": 30000142},
@@ -24,14 +76,21 @@ STATIONS_INFO = {
 }
 ITEM_NAME_TO_ID = {}
 ITEM_LOOKUP_LOWERCASE = {}
-TYPE_ATTRIBUTES_CACHE = {}
-ALL_REGIONS_CACHE = {}
-STATION_CACHE = {}
-SYSTEM_INDICES_CACHE = {}
+# Persistente caches med levetid og maksstørrelse (se cache_store.py)
+CACHE_STORE = CacheStore(CACHE_STORE_FILE)
+TYPE_ATTRIBUTES_CACHE = CACHE_STORE.namespace('type_attributes', ttl=30 * 24 * 3600, max_entries=50000)
+ALL_REGIONS_CACHE = CACHE_STORE.namespace('regions', ttl=30 * 24 * 3600, max_entries=500)
+STATION_CACHE = CACHE_STORE.namespace('location_names', ttl=7 * 24 * 3600, max_entries=20000)
+SYSTEM_INDICES_CACHE = CACHE_STORE.namespace('system_indices', ttl=3600, max_entries=10000)
 
 # --- FUNKSJONER ---
-def load_items_from_file():
-    """Laster inn varelisten fra JSON-filen."""
+ITEMS_FILE_ERROR = "Fant ikke filen '{}'.\n\nProgrammet kan ikke starte uten denne.\nKjør et skript for å generere den først."
+
+def load_items_from_file(show_error=True):
+    """
+    Laster inn varelisten fra JSON-filen. Med show_error=False vises ingen
+    feilmelding, slik at funksjonen kan kalles fra en bakgrunnstråd.
+    """
     global ITEM_NAME_TO_ID, ITEM_LOOKUP_LOWERCASE
     try:
         with open(ITEMS_FILE, 'r', encoding='utf-8') as f:
@@ -40,10 +99,11 @@ def load_items_from_file():
         print(f"Lastet {len(ITEM_NAME_TO_ID)} varer fra {ITEMS_FILE}")
         return True
     except (FileNotFoundError, json.JSONDecodeError):
-        root = ctk.CTk()
-        root.withdraw()
-        messagebox.showerror("Kritisk Feil", f"Fant ikke filen '{ITEMS_FILE}'.\n\nProgrammet kan ikke starte uten denne.\nKjør et skript for å generere den først.", parent=root)
-        root.destroy()
+        if show_error:
+            root = ctk.CTk()
+            root.withdraw()
+            messagebox.showerror("Kritisk Feil", ITEMS_FILE_ERROR.format(ITEMS_FILE), parent=root)
+            root.destroy()
         return False
 
 # ==============================================================================
@@ -81,7 +141,8 @@ def load_settings():
         "galaxy_home_base": "Jita", "galaxy_target_region": "The Forge",
         "galaxy_min_profit": "2000000", "galaxy_min_volume": "10",
         "galaxy_ship_cargo": "4000", "galaxy_max_investment": "100000000",
-        "sales_tax": "8.0", "brokers_fee": "3.0",
+        "sales_tax": "8.0", "brokers_fee": "3.0", "price_source": "ESI", "route_policy": JUMP_ROUTE_POLICY,
+        "price_hunter_origin": "Jita",
         "esi_client_id": "", "esi_secret_key": "",
         "access_token": None, "refresh_token": None, "token_expiry": None,
         "user_structures": []
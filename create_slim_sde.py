@@ -0,0 +1,184 @@
+# Fil: create_slim_sde.py
+# Lager en slank SDE-database med bare tabellene og kolonnene appen bruker,
+# med dekkende indekser for hver spørring i db.py, og kjører ANALYZE.
+# Til slutt måles db.py-funksjonene mot både full og slank database.
+#
+# Når SLIM_SDE_FILE finnes, bruker db.py den i stedet for den fulle SDE-en
+# (se db.SLIM_DB_FILE).
+import os
+import random
+import sqlite3
+import time
+
+FULL_SDE_FILE = 'sde.sqlite.db'
+SLIM_SDE_FILE = 'sde_slim.sqlite.db'
+BENCHMARK_ROUNDS = 3
+BENCHMARK_SAMPLE = 500
+
+# Tabellene appen bruker: (tabell, skjema, kolonner som kopieres)
+SLIM_TABLES = [
+    ('invTypes', """
+        typeID INTEGER PRIMARY KEY, typeName TEXT, volume REAL,
+        groupID INTEGER, marketGroupID INTEGER, published INTEGER""",
+     "typeID, typeName, volume, groupID, marketGroupID, published"),
+    ('invVolumes', "typeID INTEGER PRIMARY KEY, volume REAL", "typeID, volume"),
+    ('mapRegions', "regionID INTEGER PRIMARY KEY, regionName TEXT", "regionID, regionName"),
+    ('mapConstellations', "constellationID INTEGER PRIMARY KEY, constellationName TEXT, regionID INTEGER",
+     "constellationID, constellationName, regionID"),
+    # NOCASE gjør at 'solarSystemName LIKE ?' kan bruke indeksen under
+    ('mapSolarSystems', """
+        solarSystemID INTEGER PRIMARY KEY, solarSystemName TEXT COLLATE NOCASE,
+        regionID INTEGER, constellationID INTEGER, security REAL""",
+     "solarSystemID, solarSystemName, regionID, constellationID, security"),
+    ('staStations', "stationID INTEGER PRIMARY KEY, stationName TEXT, solarSystemID INTEGER, regionID INTEGER",
+     "stationID, stationName, solarSystemID, regionID"),
+    # Primærnøkkelen er også den dekkende indeksen for hoppgrafen (jump_graph.py)
+    ('mapSolarSystemJumps', "fromSolarSystemID INTEGER, toSolarSystemID INTEGER, PRIMARY KEY (fromSolarSystemID, toSolarSystemID)",
+     "fromSolarSystemID, toSolarSystemID"),
+    ('industryActivity', "typeID INTEGER, activityID INTEGER, time INTEGER, PRIMARY KEY (typeID, activityID)",
+     "typeID, activityID, time"),
+    ('industryActivityMaterials', "typeID INTEGER, activityID INTEGER, materialTypeID INTEGER, quantity INTEGER",
+     "typeID, activityID, materialTypeID, quantity"),
+    ('industryActivityProducts', "typeID INTEGER, activityID INTEGER, productTypeID INTEGER, quantity INTEGER",
+     "typeID, activityID, productTypeID, quantity"),
+]
+
+# Dekkende indekser: hver spørring i db.py kan besvares fra indeksen alene.
+# Oppslag på typeID/stationID/solarSystemID går via INTEGER PRIMARY KEY (rowid).
+SLIM_INDEXES = [
+    "CREATE INDEX ix_systems_name ON mapSolarSystems (solarSystemName, solarSystemID)",
+    "CREATE INDEX ix_products_product ON industryActivityProducts (productTypeID, activityID, typeID)",
+    "CREATE INDEX ix_products_blueprint ON industryActivityProducts (typeID, activityID, productTypeID, quantity)",
+    "CREATE INDEX ix_materials_blueprint ON industryActivityMaterials (typeID, activityID, materialTypeID, quantity)",
+]
+
+def create_slim_sde(source=FULL_SDE_FILE, target=SLIM_SDE_FILE):
+    """Kopierer tabellene appen bruker fra source til en ny, indeksert database i target."""
+    tmp_target = f"{target}.tmp"
+    if os.path.exists(tmp_target):
+        os.remove(tmp_target)
+    conn = sqlite3.connect(tmp_target)
+    try:
+        conn.execute("ATTACH DATABASE ? AS full", (f'file:{source}?mode=ro',))
+        source_tables = {row[0] for row in conn.execute("SELECT name FROM full.sqlite_master WHERE type='table'")}
+        for table, schema, columns in SLIM_TABLES:
+            conn.execute(f"CREATE TABLE {table} ({schema})")
+            if table not in source_tables:
+                print(f"  {table}: finnes ikke i {source}, lager tom tabell")
+                continue
+            # ORDER BY rowid beholder SDE-rekkefølgen ("første blueprint per produkt")
+            order = "" if table == 'industryActivity' else " ORDER BY rowid"
+            conn.execute(f"INSERT OR IGNORE INTO {table} ({columns}) SELECT {columns} FROM full.{table}{order}")
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"  {table}: {count} rader")
+        conn.commit()
+        conn.execute("DETACH DATABASE full")
+        for statement in SLIM_INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_target, target)
+
+# --- MÅLING ---
+def _sample(conn, query, rng, size):
+    # Spørringen sorterer på nøkkelen, så utvalget avhenger ikke av radrekkefølgen i filen
+    values = [row[0] for row in conn.execute(query)]
+    rng.shuffle(values)
+    return values[:size]
+
+def _draw_samples(sde_file):
+    """
+    Trekker testdataene én gang, slik at full og slank SDE måles på nøyaktig
+    de samme ID-ene og navnene.
+    """
+    rng = random.Random(1)
+    conn = sqlite3.connect(f'file:{sde_file}?mode=ro', uri=True)
+    try:
+        return {
+            'type_ids': _sample(conn, "SELECT typeID FROM invTypes ORDER BY typeID", rng, BENCHMARK_SAMPLE),
+            'product_ids': _sample(conn, "SELECT DISTINCT productTypeID FROM industryActivityProducts WHERE activityID=1 ORDER BY productTypeID", rng, BENCHMARK_SAMPLE),
+            'system_ids': _sample(conn, "SELECT solarSystemID FROM mapSolarSystems ORDER BY solarSystemID", rng, BENCHMARK_SAMPLE),
+            'system_names': _sample(conn, "SELECT solarSystemName FROM mapSolarSystems ORDER BY solarSystemName", rng, BENCHMARK_SAMPLE),
+            'station_ids': _sample(conn, "SELECT stationID FROM staStations ORDER BY stationID", rng, BENCHMARK_SAMPLE),
+        }
+    finally:
+        conn.close()
+
+def _benchmarks(db, samples):
+    """(navn, funksjon) for oppslagene db.py gjør, med testdataene fra _draw_samples."""
+    conn = db.connect_to_sde()
+    type_ids, product_ids = samples['type_ids'], samples['product_ids']
+    system_ids, system_names, station_ids = samples['system_ids'], samples['system_names'], samples['station_ids']
+
+    def blueprint_per_product():
+        # Den gamle enkeltspørringen fra get_blueprint_from_sde, én per produkt
+        for product_id in product_ids:
+            conn.execute("SELECT typeID FROM industryActivityProducts WHERE productTypeID=? AND activityID=1", (product_id,)).fetchone()
+
+    def load_recipes():
+        db.reset_connections()
+        db.get_manufacturing_recipes()
+
+    return [
+        (f"get_type_name_from_sde x{len(type_ids)}", lambda: [db.get_type_name_from_sde(t) for t in type_ids]),
+        (f"get_type_attributes_bulk ({len(type_ids)})", lambda: db.get_type_attributes_bulk(type_ids)),
+        (f"get_station_names_bulk ({len(station_ids)})", lambda: db.get_station_names_bulk(station_ids)),
+        (f"get_system_id_from_name x{len(system_names)}", lambda: [db.get_system_id_from_name(n) for n in system_names]),
+        (f"get_system_name_from_sde x{len(system_ids)}", lambda: [db.get_system_name_from_sde(s) for s in system_ids]),
+        (f"get_region_for_system x{len(system_ids)}", lambda: [db.get_region_for_system(s) for s in system_ids]),
+        (f"blueprint-oppslag per produkt x{len(product_ids)}", blueprint_per_product),
+        ("get_manufacturing_recipes (last alle)", load_recipes),
+        ("get_all_manufacturable_item_ids", db.get_all_manufacturable_item_ids),
+        ("get_all_system_security_statuses", db.get_all_system_security_statuses),
+        ("get_universe_tables", db.get_universe_tables),
+        ("get_system_jumps", db.get_system_jumps),
+    ]
+
+def _run_benchmarks(db, sde_file, samples):
+    """Kjører alle målingene mot én SDE-fil uten binæruttrekket. Returnerer {navn: beste tid}."""
+    db.DB_FILE = sde_file
+    db.reset_connections()
+    results = {}
+    for name, func in _benchmarks(db, samples):
+        best = None
+        for _ in range(BENCHMARK_ROUNDS):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    db.reset_connections()
+    return results
+
+def benchmark(full=FULL_SDE_FILE, slim=SLIM_SDE_FILE):
+    """Sammenligner db.py-funksjonene mot full og slank SDE (beste av BENCHMARK_ROUNDS)."""
+    import config
+    import db
+    config.SDE_EXTRACT_ENABLED = False   # Mål SQLite, ikke binæruttrekket
+    original_file = db.DB_FILE
+    samples = _draw_samples(slim)
+    try:
+        full_results = _run_benchmarks(db, full, samples)
+        slim_results = _run_benchmarks(db, slim, samples)
+    finally:
+        db.DB_FILE = original_file
+
+    print(f"\n{'Funksjon':<45}{'Full (ms)':>12}{'Slank (ms)':>12}{'Faktor':>9}")
+    for name, full_time in full_results.items():
+        slim_time = slim_results[name]
+        factor = full_time / slim_time if slim_time else float('inf')
+        print(f"{name:<45}{full_time * 1000:>12.2f}{slim_time * 1000:>12.2f}{factor:>8.1f}x")
+    print(f"\nStørrelse: {os.path.getsize(full) / (1024 * 1024):.1f} MB -> {os.path.getsize(slim) / (1024 * 1024):.1f} MB")
+
+if __name__ == '__main__':
+    try:
+        print(f"Lager {SLIM_SDE_FILE} fra {FULL_SDE_FILE}...")
+        create_slim_sde()
+        print(f"Vellykket! Slank SDE er lagret i {SLIM_SDE_FILE}")
+        benchmark()
+    except sqlite3.Error as e:
+        print(f"FEIL: Kunne ikke lage slank SDE fra '{FULL_SDE_FILE}': {e}")
+        print("Sørg for at den fulle SDE-filen er lastet ned (git lfs pull) og ligger i samme mappe som dette scriptet.")
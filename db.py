@@ -1,94 +1,262 @@
 # ==============================================================================
 # EVE MARKET VERKTØY - DATABASE-MODUL (SDE)
 # ==============================================================================
+import os
 import sqlite3
+import threading
 import config
+import sde_extract
 
-DB_FILE = 'sde.sqlite.db'
+FULL_DB_FILE = 'sde.sqlite.db'
+SLIM_DB_FILE = 'sde_slim.sqlite.db'   # Lages av create_slim_sde.py; brukes når den finnes
+DB_FILE = SLIM_DB_FILE if os.path.exists(SLIM_DB_FILE) else FULL_DB_FILE
+
+# --- TILKOBLINGER ---
+# SDE er skrivebeskyttet, så hver tråd kan beholde én åpen tilkobling i stedet
+# for å åpne og lukke filen for hvert oppslag. sqlite3 cacher de kompilerte
+# spørringene per tilkobling, slik at gjentatte oppslag også slipper å
+# parses på nytt.
+_LOCAL = threading.local()
+_GENERATION = 0   # Økes av reset_connections(); eldre tilkoblinger åpnes på nytt
+
+def _open_sde_connection():
+    conn = sqlite3.connect(f'file:{DB_FILE}?mode=ro', uri=True, cached_statements=config.SDE_CACHED_STATEMENTS)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {int(config.SDE_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size = -{int(config.SDE_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
 
 def connect_to_sde():
-    """Oppretter en tilkobling til SDE-databasen."""
-    try:
-        conn = sqlite3.connect(f'file:{DB_FILE}?mode=ro', uri=True)
+    """
+    Returnerer trådens faste, skrivebeskyttede tilkobling til SDE-databasen
+    (opprettes ved første kall i tråden). Tilkoblingen skal ikke lukkes av kalleren.
+    """
+    conn = getattr(_LOCAL, 'conn', None)
+    if conn is not None and _LOCAL.generation == _GENERATION:
         return conn
+    if conn is not None:
+        conn.close()
+        _LOCAL.conn = None
+    try:
+        conn = _open_sde_connection()
     except sqlite3.Error as e:
         print(f"Databasefeil: {e}")
         return None
+    _LOCAL.conn, _LOCAL.generation = conn, _GENERATION
+    return conn
+
+def reset_connections():
+    """Får alle tråder til å åpne SDE på nytt ved neste oppslag (f.eks. etter at filen er byttet ut)."""
+    global _GENERATION, _RECIPES, _EXTRACT
+    _GENERATION += 1
+    _RECIPES = None
+    _EXTRACT = None
+    close_connection()
+
+def close_connection():
+    """Lukker tilkoblingen til tråden som kaller, hvis den har en."""
+    conn = getattr(_LOCAL, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _LOCAL.conn = None
+
+# --- BINÆRT UTTREKK ---
+# Når uttrekket (sde_extract.py) kan lastes, besvares alle oppslag under fra
+# det minnemappede uttrekket; SQLite brukes bare for å bygge det, eller som
+# reserve hvis det ikke lar seg bygge.
+_EXTRACT = None
+_EXTRACT_LOCK = threading.Lock()
+
+def get_extract():
+    """Returnerer det minnemappede SDE-uttrekket (bygges ved behov), eller None."""
+    global _EXTRACT
+    if _EXTRACT is None:
+        with _EXTRACT_LOCK:
+            if _EXTRACT is None:
+                _EXTRACT = False
+                if config.SDE_EXTRACT_ENABLED:
+                    try:
+                        _EXTRACT = sde_extract.load_or_build(DB_FILE, config.SDE_EXTRACT_FILE)
+                    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                        print(f"Kunne ikke bruke SDE-uttrekket, bruker SQLite: {e}")
+    return _EXTRACT or None
 
 def get_type_name_from_sde(type_id):
     """Henter navnet på en vare fra SDE basert på typeID."""
+    extract = get_extract()
+    if extract:
+        return extract.type_name(type_id) or f"Ukjent Vare ID: {type_id}"
     conn = connect_to_sde()
     if not conn:
         return f"Ukjent Vare ID: {type_id}"
         
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT typeName FROM invTypes WHERE typeID=?", (type_id,))
-        result = cursor.fetchone()
+        result = conn.execute("SELECT typeName FROM invTypes WHERE typeID=?", (type_id,)).fetchone()
         return result[0] if result else f"Ukjent Vare ID: {type_id}"
-    finally:
-        conn.close()
+    except sqlite3.Error as e:
+        print(f"SQL-feil ved henting av varenavn: {e}")
+        return f"Ukjent Vare ID: {type_id}"
 
-def get_blueprint_from_sde(product_type_id):
+# Maks antall parametere per IN (...)-spørring (eldre SQLite har grense på 999)
+SQL_CHUNK_SIZE = 500
+
+def get_type_attributes_bulk(type_ids):
     """
-    Henter en komplett blueprint-oppskrift fra SDE-databasen
-    basert på ID-en til produktet som skal lages.
+    Henter volum, pakket volum, gruppe og markedsgruppe for mange varer i
+    samme tilkobling. Returnerer {typeID: dict} med samme nøkler som ESI sitt
+    /universe/types/-svar, slik at kallere ikke merker hvor dataene kom fra.
+    Varer som ikke finnes i SDE er utelatt fra resultatet.
     """
+    extract = get_extract()
+    if extract:
+        return extract.type_attributes(type_ids)
+    type_ids = list(set(type_ids))
     conn = connect_to_sde()
-    if not conn:
-        return None
+    if not conn: return {}
+    attributes = {}
+    try:
+        cursor = conn.cursor()
+        try:
+            # invVolumes har pakket volum for skip o.l.; for andre varer er det lik 'volume'
+            cursor.execute("SELECT 1 FROM invVolumes LIMIT 1")
+            volume_join = "LEFT JOIN invVolumes AS v ON v.typeID = t.typeID"
+            packaged_column = "v.volume"
+        except sqlite3.OperationalError:
+            volume_join, packaged_column = "", "NULL"
 
+        for i in range(0, len(type_ids), SQL_CHUNK_SIZE):
+            chunk = type_ids[i:i + SQL_CHUNK_SIZE]
+            cursor.execute(f"""
+                SELECT t.typeID, t.typeName, t.volume, {packaged_column}, t.groupID, t.marketGroupID
+                FROM invTypes AS t {volume_join}
+                WHERE t.typeID IN ({','.join('?' * len(chunk))})
+            """, chunk)
+            for type_id, name, volume, packaged_volume, group_id, market_group_id in cursor.fetchall():
+                attributes[type_id] = {
+                    'type_id': type_id, 'name': name, 'volume': volume or 0,
+                    'packaged_volume': packaged_volume if packaged_volume is not None else (volume or 0),
+                    'group_id': group_id, 'market_group_id': market_group_id
+                }
+        return attributes
+    except sqlite3.Error as e:
+        print(f"SQL-feil ved henting av vare-attributter: {e}")
+        return attributes
+
+def get_station_names_bulk(station_ids):
+    """Henter navn på NPC-stasjoner fra staStations. Returnerer {stationID: navn}."""
+    extract = get_extract()
+    if extract:
+        return extract.station_names(station_ids)
+    station_ids = list(set(station_ids))
+    conn = connect_to_sde()
+    if not conn: return {}
+    names = {}
     try:
         cursor = conn.cursor()
-        
-        cursor.execute("SELECT typeID FROM industryActivityProducts WHERE productTypeID=? AND activityID=1", (product_type_id,))
-        bpo_result = cursor.fetchone()
-        if not bpo_result:
-            return None 
-        
-        blueprint_type_id = bpo_result[0]
+        for i in range(0, len(station_ids), SQL_CHUNK_SIZE):
+            chunk = station_ids[i:i + SQL_CHUNK_SIZE]
+            cursor.execute(f"SELECT stationID, stationName FROM staStations WHERE stationID IN ({','.join('?' * len(chunk))})", chunk)
+            names.update(cursor.fetchall())
+        return names
+    except sqlite3.Error as e:
+        print(f"SQL-feil ved henting av stasjonsnavn: {e}")
+        return names
 
-        cursor.execute("SELECT time FROM industryActivity WHERE typeID=? AND activityID=1", (blueprint_type_id,))
-        time_result = cursor.fetchone()
-        
-        cursor.execute("""
-            SELECT materialTypeID, quantity 
-            FROM industryActivityMaterials 
-            WHERE typeID=? AND activityID=1
-        """, (blueprint_type_id,))
-        materials_result = cursor.fetchall()
+# --- PRODUKSJONSOPPSKRIFTER ---
+# Alle produksjonsoppskrifter lastes med tre mengdespørringer og holdes i et
+# kompakt indeks i minnet (tupler, ikke dicts), i stedet for fire spørringer
+# per blueprint.
+MANUFACTURING_ACTIVITY = 1
+_RECIPES = None
+_RECIPES_LOCK = threading.Lock()
 
-        cursor.execute("""
-            SELECT productTypeID, quantity 
-            FROM industryActivityProducts 
-            WHERE typeID=? AND activityID=1
-        """, (blueprint_type_id,))
-        products_result = cursor.fetchall()
+class RecipeIndex:
+    """Produksjonsoppskrifter indeksert på blueprint og på produkt."""
+    def __init__(self, times, materials, products):
+        # blueprintID -> (tid, ((materialID, antall), ...), ((produktID, antall), ...))
+        self.by_blueprint = {}
+        for blueprint_id, recipe_products in products.items():
+            recipe_materials = materials.get(blueprint_id)
+            if blueprint_id in times and recipe_materials and recipe_products:
+                self.by_blueprint[blueprint_id] = (times[blueprint_id], tuple(recipe_materials), tuple(recipe_products))
+        # produktID -> blueprintID (første treff, som i den gamle enkeltspørringen)
+        self.blueprint_for_product = {}
+        for blueprint_id, recipe_products in products.items():
+            for product_id, _ in recipe_products:
+                self.blueprint_for_product.setdefault(product_id, blueprint_id)
 
-        if not time_result or not materials_result or not products_result:
-            return None
+    def __len__(self):
+        return len(self.by_blueprint)
 
-        bp_data = {
+    def for_blueprint(self, blueprint_type_id):
+        """Oppskriften i samme format som get_blueprint_from_sde, eller None."""
+        recipe = self.by_blueprint.get(blueprint_type_id)
+        if recipe is None:
+            return None
+        time_required, materials, products = recipe
+        return {
             "blueprintTypeID": blueprint_type_id, # Inkluderer BPO ID
             "adjustedprice": 0, # Dette må hentes fra en annen kilde, men vi lar det være
             "activities": {
                 "manufacturing": {
-                    "time": time_result[0],
-                    "materials": [{"typeID": m[0], "quantity": m[1]} for m in materials_result],
-                    "products": [{"typeID": p[0], "quantity": p[1]} for p in products_result]
+                    "time": time_required,
+                    "materials": [{"typeID": m[0], "quantity": m[1]} for m in materials],
+                    "products": [{"typeID": p[0], "quantity": p[1]} for p in products]
                 }
             }
         }
-        return bp_data
 
+    def for_product(self, product_type_id):
+        blueprint_id = self.blueprint_for_product.get(product_type_id)
+        return self.for_blueprint(blueprint_id) if blueprint_id is not None else None
+
+def _load_recipe_index():
+    extract = get_extract()
+    if extract:
+        return RecipeIndex(*extract.recipe_tables())
+    conn = connect_to_sde()
+    if not conn:
+        return None
+    try:
+        times = dict(conn.execute("SELECT typeID, time FROM industryActivity WHERE activityID=?", (MANUFACTURING_ACTIVITY,)))
+        materials, products = {}, {}
+        for blueprint_id, material_id, quantity in conn.execute(
+                "SELECT typeID, materialTypeID, quantity FROM industryActivityMaterials WHERE activityID=?", (MANUFACTURING_ACTIVITY,)):
+            materials.setdefault(blueprint_id, []).append((material_id, quantity))
+        for blueprint_id, product_id, quantity in conn.execute(
+                "SELECT typeID, productTypeID, quantity FROM industryActivityProducts WHERE activityID=?", (MANUFACTURING_ACTIVITY,)):
+            products.setdefault(blueprint_id, []).append((product_id, quantity))
+        return RecipeIndex(times, materials, products)
     except sqlite3.Error as e:
-        print(f"SQL-feil ved henting av blueprint: {e}")
+        print(f"SQL-feil ved lasting av produksjonsoppskrifter: {e}")
         return None
-    finally:
-        conn.close()
+
+def get_manufacturing_recipes():
+    """
+    Returnerer indekset over alle produksjonsoppskrifter (lastes ved første kall).
+    Returnerer None hvis SDE ikke kan leses; da prøves det igjen neste gang.
+    """
+    global _RECIPES
+    if _RECIPES is None:
+        with _RECIPES_LOCK:
+            if _RECIPES is None:
+                _RECIPES = _load_recipe_index()
+    return _RECIPES
+
+def get_blueprint_from_sde(product_type_id):
+    """
+    Henter en komplett blueprint-oppskrift fra SDE-databasen
+    basert på ID-en til produktet som skal lages.
+    """
+    recipes = get_manufacturing_recipes()
+    return recipes.for_product(product_type_id) if recipes else None
 
 def get_system_id_from_name(system_name):
     """Henter solarSystemID fra SDE basert på systemnavn."""
+    extract = get_extract()
+    if extract:
+        return extract.system_id(system_name)
     conn = connect_to_sde()
     if not conn:
         return None
@@ -101,24 +269,27 @@ def get_system_id_from_name(system_name):
     except sqlite3.Error as e:
         print(f"SQL-feil ved henting av system-ID: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_system_name_from_sde(system_id):
     """Henter navnet på et solsystem fra SDE basert på solarSystemID."""
+    extract = get_extract()
+    if extract:
+        return extract.system_name(system_id) or f"Ukjent System ID: {system_id}"
     conn = connect_to_sde()
     if not conn:
         return f"Ukjent System ID: {system_id}"
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT solarSystemName FROM mapSolarSystems WHERE solarSystemID=?", (system_id,))
-        result = cursor.fetchone()
+        result = conn.execute("SELECT solarSystemName FROM mapSolarSystems WHERE solarSystemID=?", (system_id,)).fetchone()
         return result[0] if result else f"Ukjent System ID: {system_id}"
-    finally:
-        conn.close()
+    except sqlite3.Error as e:
+        print(f"SQL-feil ved henting av systemnavn: {e}")
+        return f"Ukjent System ID: {system_id}"
 
 def get_region_for_system(system_id):
     """Henter regionID for et gitt solarSystemID fra SDE."""
+    extract = get_extract()
+    if extract:
+        return extract.region_for_system(system_id)
     conn = connect_to_sde()
     if not conn:
         return None
@@ -130,11 +301,28 @@ def get_region_for_system(system_id):
     except sqlite3.Error as e:
         print(f"SQL-feil ved henting av region for system: {e}")
         return None
-    finally:
-        conn.close()
+
+def get_system_jumps():
+    """
+    Henter alle stargate-forbindelser fra mapSolarSystemJumps som en liste med
+    (fraSystemID, tilSystemID). Hver forbindelse står i tabellen i begge retninger.
+    """
+    extract = get_extract()
+    if extract:
+        return extract.system_jumps()
+    conn = connect_to_sde()
+    if not conn: return []
+    try:
+        return conn.execute("SELECT fromSolarSystemID, toSolarSystemID FROM mapSolarSystemJumps").fetchall()
+    except sqlite3.Error as e:
+        print(f"SQL-feil ved henting av stargate-forbindelser: {e}")
+        return []
 
 def get_all_manufacturable_products_and_bpos():
     """Henter en liste med tupler (productTypeID, blueprintTypeID) for alle produserbare varer."""
+    extract = get_extract()
+    if extract:
+        return extract.manufacturable_pairs()
     conn = connect_to_sde()
     if not conn: return []
     try:
@@ -147,11 +335,12 @@ def get_all_manufacturable_products_and_bpos():
     except sqlite3.Error as e:
         print(f"SQL-feil ved henting av alle produserbare varer: {e}")
         return []
-    finally:
-        conn.close()
 
 def get_all_system_security_statuses():
     """Henter en dictionary med security status for alle solsystemer."""
+    extract = get_extract()
+    if extract:
+        return extract.security_statuses()
     conn = connect_to_sde()
     if not conn: return {}
     all_systems = {}
@@ -165,8 +354,31 @@ def get_all_system_security_statuses():
     except sqlite3.Error as e:
         print(f"SQL-feil ved henting av security status: {e}")
         return {}
-    finally:
-        conn.close()
+
+def get_universe_tables():
+    """
+    Leser regioner, konstellasjoner, solsystemer og NPC-stasjoner fra SDE i én tilkobling.
+    Returnerer en dict med radlister, eller None hvis SDE ikke kan leses.
+    """
+    extract = get_extract()
+    if extract:
+        return extract.universe_tables()
+    conn = connect_to_sde()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT regionID, regionName FROM mapRegions")
+        regions = cursor.fetchall()
+        cursor.execute("SELECT constellationID, constellationName, regionID FROM mapConstellations")
+        constellations = cursor.fetchall()
+        cursor.execute("SELECT solarSystemID, solarSystemName, regionID, constellationID, security, ROUND(security, 1) FROM mapSolarSystems")
+        systems = cursor.fetchall()
+        cursor.execute("SELECT stationID, stationName, solarSystemID, regionID FROM staStations")
+        stations = cursor.fetchall()
+        return {'regions': regions, 'constellations': constellations, 'systems': systems, 'stations': stations}
+    except sqlite3.Error as e:
+        print(f"SQL-feil ved lasting av univers-data: {e}")
+        return None
 
 # ==============================================================================
 # === NY FUNKSJON FOR BPO-SCANNER ===
@@ -176,6 +388,9 @@ def get_all_manufacturable_item_ids():
     Henter en liste med tupler (productTypeID, blueprintTypeID) for alle 
     produserbare varer fra SDE.
     """
+    extract = get_extract()
+    if extract:
+        return extract.manufacturable_pairs(published_only=True)
     conn = connect_to_sde()
     if not conn: return []
     try:
@@ -194,5 +409,3 @@ def get_all_manufacturable_item_ids():
     except sqlite3.Error as e:
         print(f"SQL-feil ved henting av alle produserbare varer: {e}")
         return []
-    finally:
-        conn.close()
\ No newline at end of file
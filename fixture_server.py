@@ -0,0 +1,146 @@
+# Fil: fixture_server.py
+# Lokal erstatning for ESI og Fuzzwork som spiller av et fixture-arkiv
+# innspilt med config.FIXTURE_RECORD_FILE. Pek config.ESI_BASE_URL og
+# config.FUZZWORK_BASE_URL mot serveren (f.eks. "http://127.0.0.1:8765")
+# for å måle skannerne reproduserbart uten nett.
+#
+#   python fixture_server.py fixtures.sqlite --latency 80 --jitter 40 --error-rate 0.02
+import argparse
+import json
+import random
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from fixtures import FixtureArchive, fixture_key
+
+DEFAULT_PORT = 8765
+
+class ReplaySettings:
+    def __init__(self, latency=0.0, jitter=0.0, recorded_latency=False, error_rate=0.0, error_status=502, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.recorded_latency = recorded_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.served = self.missing = self.injected = 0
+
+    def delay(self, recorded_elapsed):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter)
+        base = recorded_elapsed if self.recorded_latency else self.latency
+        return base + jitter
+
+    def inject_error(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def count(self, counter):
+        """Øker 'served', 'missing' eller 'injected'; forespørslene kommer fra flere tråder."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def counts(self):
+        with self._lock:
+            return self.served, self.missing, self.injected
+
+def _shift_expiry(headers):
+    """Flytter Date/Expires til nå, med samme levetid som i opptaket, slik at svarene ikke er utløpt ved avspilling."""
+    try:
+        lifetime = parsedate_to_datetime(headers['Expires']).timestamp() - parsedate_to_datetime(headers['Date']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return headers
+    now = time.time()
+    headers = dict(headers)
+    headers['Date'] = formatdate(now, usegmt=True)
+    headers['Expires'] = formatdate(now + max(0, lifetime), usegmt=True)
+    return headers
+
+def make_handler(archive, settings):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, headers, body):
+            # send_response_only: de innspilte headerne har allerede Date/Server
+            self.send_response_only(status)
+            if not any(name.lower() == 'date' for name in headers):
+                self.send_header('Date', self.date_time_string())
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def _send_json(self, status, payload):
+            self._send(status, {'Content-Type': 'application/json; charset=UTF-8'}, json.dumps(payload).encode('utf-8'))
+
+        def _replay(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+            if self.command == 'HEAD':
+                # Oppvarming av tilkoblinger: svar alltid OK
+                self._send(200, {}, b'')
+                return
+
+            fixture = archive.lookup(fixture_key(self.command, self.path, body))
+            if fixture is None:
+                settings.count('missing')
+                print(f"Mangler fixture: {self.command} {self.path}")
+                self._send_json(404, {'error': f"Ingen fixture for {self.command} {self.path}"})
+                return
+
+            status, headers, content, elapsed = fixture
+            time.sleep(settings.delay(elapsed))
+            if settings.inject_error():
+                settings.count('injected')
+                self._send_json(settings.error_status, {'error': "Injisert feil fra fixture_server"})
+                return
+
+            settings.count('served')
+            headers = _shift_expiry(headers)
+            etag = headers.get('ETag') or headers.get('etag')
+            if etag and self.headers.get('If-None-Match') == etag:
+                self._send(304, {k: v for k, v in headers.items() if k.lower() != 'content-type'}, b'')
+                return
+            self._send(status, headers, content)
+
+        do_GET = do_POST = do_HEAD = _replay
+
+        def log_message(self, format, *args):
+            pass   # Ett linjeskift per kall drukner resten av utskriften
+
+    return FixtureHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Spiller av innspilte ESI/Fuzzwork-svar lokalt.")
+    parser.add_argument('archive', help="Fixture-arkivet (config.FIXTURE_RECORD_FILE under opptak)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.0, help="Fast forsinkelse per svar, i millisekunder")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Tilfeldig ekstra forsinkelse (0..jitter ms)")
+    parser.add_argument('--recorded-latency', action='store_true', help="Bruk responstiden fra opptaket i stedet for --latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Andel svar som erstattes med en feil (0..1)")
+    parser.add_argument('--error-status', type=int, default=502, help="Statuskode for injiserte feil (f.eks. 420, 502, 504)")
+    parser.add_argument('--seed', type=int, default=None, help="Frø for feil og jitter, for reproduserbare kjøringer")
+    args = parser.parse_args()
+
+    archive = FixtureArchive(args.archive)
+    settings = ReplaySettings(args.latency / 1000, args.jitter / 1000, args.recorded_latency,
+                              args.error_rate, args.error_status, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(archive, settings))
+    print(f"Spiller av {archive.count()} fixtures fra {args.archive} på http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        served, missing, injected = settings.counts()
+        print(f"Servert: {served}, manglet: {missing}, injiserte feil: {injected}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - FIXTURE-ARKIV (opptak/avspilling av HTTP-svar)
+# ==============================================================================
+# Innspilte ESI- og Fuzzwork-svar lagres med status, headere og innhold i én
+# SQLite-fil. api.py spiller inn når config.FIXTURE_RECORD_FILE er satt, og
+# fixture_server.py spiller dem av igjen. Modulen importerer ikke config,
+# slik at serveren kan kjøres uten GUI-avhengighetene.
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Headere som beskriver overføringen, ikke innholdet (requests har allerede pakket ut svaret)
+_TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive', 'set-cookie'}
+
+def fixture_key(method, path_and_query, body=None):
+    """
+    Nøkkel for et kall: metode + sti + sorterte parametere, pluss en hash av
+    innholdet for POST. Verten er ikke med, slik at samme arkiv kan spilles
+    av fra en hvilken som helst base-URL.
+    """
+    parts = urlsplit(path_and_query)
+    key = f"{method.upper()} {parts.path}"
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    if query:
+        key += '?' + urlencode(query)
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key += '#' + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+def relative_url(url, base_urls):
+    """Sti + query for en URL under en av base-URL-ene, ellers None."""
+    for base in base_urls:
+        if url.startswith(base):
+            rest = url[len(base):]
+            return rest if rest.startswith('/') else '/' + rest
+    return None
+
+class FixtureArchive:
+    """Trådsikker lagring av innspilte svar, én rad per nøkkel (siste opptak vinner)."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fixtures (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                elapsed REAL NOT NULL,
+                recorded_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def record(self, key, status, headers, body, elapsed):
+        headers = {name: value for name, value in headers.items() if name.lower() not in _TRANSFER_HEADERS}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fixtures (key, status, headers, body, elapsed, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(headers), body or b'', elapsed, time.time())
+            )
+            self._conn.commit()
+
+    def lookup(self, key):
+        """Returnerer (status, headere, innhold, opprinnelig responstid) eller None."""
+        with self._lock:
+            row = self._conn.execute("SELECT status, headers, body, elapsed FROM fixtures WHERE key=?", (key,)).fetchone()
+        if not row:
+            return None
+        status, headers, body, elapsed = row
+        return status, json.loads(headers), bytes(body), elapsed
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fixtures").fetchone()[0]
@@ -0,0 +1,126 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - FUZZWORK-KLIENT
+# ==============================================================================
+# Henter Fuzzwork-aggregater for mange varer og stasjoner samtidig, innenfor
+# en høflig grense. Gruppestørrelsen tilpasses URL-lengde og responstid, og
+# alt samles i én pristabell med tall i stedet for strenger:
+#   {stasjonsID: {typeID: {'buy': {'max': float, ...}, 'sell': {...}}}}
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import api
+import config
+
+PRICE_FIELDS = ('weightedAverage', 'max', 'min', 'stddev', 'median', 'volume', 'orderCount', 'percentile')
+# Hvor mange ganger hver vare legges tilbake i køen etter mislykkede kall før vi gir opp
+MAX_RETRIES_PER_ITEM = 3
+
+def _parse_side(side):
+    """Gjør én 'buy'/'sell'-blokk om til tall. Manglende felter blir 0."""
+    if not side:
+        return {}
+    parsed = {}
+    for field in PRICE_FIELDS:
+        try:
+            parsed[field] = float(side.get(field, 0) or 0)
+        except (TypeError, ValueError):
+            parsed[field] = 0.0
+    parsed['orderCount'] = int(parsed['orderCount'])
+    return parsed
+
+def parse_aggregates(raw):
+    """Konverterer et rått Fuzzwork-svar til {typeID: {'buy': {...}, 'sell': {...}}}."""
+    return {int(type_id): {'buy': _parse_side(data.get('buy')), 'sell': _parse_side(data.get('sell'))}
+            for type_id, data in (raw or {}).items() if data}
+
+class _ChunkSizer:
+    """Justerer antall varer per kall etter hvor raskt Fuzzwork svarer."""
+    def __init__(self):
+        self.size = config.FUZZWORK_START_CHUNK
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, ok):
+        with self._lock:
+            if not ok:
+                self.size = max(config.FUZZWORK_MIN_CHUNK, self.size // 2)
+            elif elapsed < config.FUZZWORK_TARGET_LATENCY / 2:
+                self.size = min(config.FUZZWORK_MAX_CHUNK, int(self.size * 1.5))
+            elif elapsed > config.FUZZWORK_TARGET_LATENCY:
+                self.size = max(config.FUZZWORK_MIN_CHUNK, int(self.size * 0.7))
+
+def _url_overhead():
+    """Base-URL + stasjon; resten av plassen går til type-listen. Leses hver gang, siden base-URL-en kan byttes."""
+    return len(f"{config.FUZZWORK_BASE_URL}/aggregates/?station=000000000000&types=")
+
+def _take_chunk(pending, size):
+    """
+    Tar neste gruppe for samme stasjon fra køen, begrenset av størrelse og URL-lengde.
+    Køen har (stasjonsID, typeID, forsøk); gruppen er en liste med (typeID, forsøk).
+    """
+    station_id, type_id, attempts = pending.popleft()
+    chunk = [(type_id, attempts)]
+    url_length = _url_overhead() + len(str(type_id))
+    while pending and len(chunk) < size and pending[0][0] == station_id:
+        next_length = url_length + len(str(pending[0][1])) + 3   # ',' URL-kodes som %2C
+        if next_length > config.FUZZWORK_MAX_URL_LENGTH:
+            break
+        url_length = next_length
+        _, type_id, attempts = pending.popleft()
+        chunk.append((type_id, attempts))
+    return station_id, chunk
+
+def fetch_price_tables(station_ids, type_ids, active_flag=None, on_progress=None):
+    """
+    Henter aggregater for alle type_ids på alle station_ids samtidig.
+    Returnerer {stasjonsID: {typeID: {'buy': {...}, 'sell': {...}}}}.
+    on_progress(ferdige, totalt) kalles etter hvert kall, målt i antall varer.
+    """
+    station_ids = list(dict.fromkeys(station_ids))
+    type_ids = list(dict.fromkeys(type_ids))
+    tables = {station_id: {} for station_id in station_ids}
+    pending = deque((station_id, type_id, 0) for station_id in station_ids for type_id in type_ids)
+    total = len(pending)
+    state = {'done': 0}
+    lock = threading.Lock()
+    sizer = _ChunkSizer()
+
+    def worker():
+        while True:
+            if active_flag is not None and not active_flag.is_set():
+                return
+            with lock:
+                if not pending:
+                    return
+                station_id, chunk = _take_chunk(pending, sizer.size)
+            start = time.monotonic()
+            raw = api.fetch_fuzzwork_aggregates(station_id, [type_id for type_id, _ in chunk])
+            sizer.record(time.monotonic() - start, raw is not None)
+            with lock:
+                if raw is None:
+                    # Prøv varene på nytt senere, da med mindre gruppestørrelse; hver vare har sin egen grense
+                    retry = [(station_id, type_id, attempts + 1) for type_id, attempts in chunk if attempts < MAX_RETRIES_PER_ITEM]
+                    pending.extend(retry)
+                    given_up = len(chunk) - len(retry)
+                    if given_up:
+                        print(f"Fuzzwork: ga opp {given_up} varer for stasjon {station_id}.")
+                    state['done'] += given_up
+                    if not given_up:
+                        continue
+                else:
+                    tables[station_id].update(parse_aggregates(raw))
+                    state['done'] += len(chunk)
+                done = state['done']
+            if on_progress:
+                on_progress(done, total)
+
+    workers = min(config.FUZZWORK_MAX_CONCURRENCY, max(1, total // config.FUZZWORK_MIN_CHUNK))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fuzzwork") as pool:
+        for future in [pool.submit(worker) for _ in range(workers)]:
+            future.result()
+    return tables
+
+def fetch_price_table(station_id, type_ids, active_flag=None, on_progress=None):
+    """Som fetch_price_tables, men for én stasjon: {typeID: {'buy': {...}, 'sell': {...}}}."""
+    return fetch_price_tables([station_id], type_ids, active_flag, on_progress)[station_id]
@@ -0,0 +1,181 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - LOKAL MARKEDSHISTORIKK
+# ==============================================================================
+# Markedshistorikken endres bare én gang i døgnet (etter downtime). Radene
+# lagres lokalt per (region, vare), og ESI spørres først igjen etter neste
+# døgnskifte; da legges bare de nye dagene til. 7-dagers volum og trend
+# regnes ut ved lagring, slik at skannerne kan hoppe over selve historikken.
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import api
+import config
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+HISTORY_FIELDS = ('date', 'average', 'highest', 'lowest', 'order_count', 'volume')
+
+def trend_indicator(history):
+    """Analyserer prishistorikk for å lage en enkel trendindikator (↑, ↓, —)."""
+    if not history or len(history) < 10:
+        return "—"
+    try:
+        # Sammenligner snittet av de siste 3 dagene med de 7 dagene før det
+        recent_avg = sum(h['average'] for h in history[-3:]) / 3
+        older_avg = sum(h['average'] for h in history[-10:-3]) / 7
+        if older_avg > 0:
+            price_change_pct = ((recent_avg - older_avg) / older_avg) * 100
+            if price_change_pct > 1.5: return "↑"   # Prisen går opp
+            if price_change_pct < -1.5: return "↓"  # Prisen går ned
+    except (ZeroDivisionError, IndexError):
+        pass
+    return "—"  # Stabil pris
+
+def avg_daily_volume(history):
+    """Snittlig dagsvolum de siste 7 dagene, eller 0 hvis historikken er for kort."""
+    return sum(h['volume'] for h in history[-7:]) / 7 if history and len(history) >= 7 else 0
+
+def summarize(history):
+    return {'avg_daily_volume': avg_daily_volume(history), 'trend': trend_indicator(history), 'days': len(history or [])}
+
+def next_rollover(timestamp):
+    """Første døgnskifte (downtime + margin, UTC) etter gitt tidspunkt."""
+    hour, minute = config.HISTORY_ROLLOVER_UTC
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    rollover = moment.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if rollover <= moment:
+        rollover += timedelta(days=1)
+    return rollover.timestamp()
+
+class HistoryStore:
+    """SQLite-lager for markedshistorikk med én metarad per (region, vare)."""
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                region_id INTEGER NOT NULL,
+                type_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                average REAL, highest REAL, lowest REAL,
+                order_count INTEGER, volume INTEGER,
+                PRIMARY KEY (region_id, type_id, date)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS history_meta (
+                region_id INTEGER NOT NULL,
+                type_id INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_date TEXT,
+                avg_daily_volume REAL NOT NULL,
+                trend TEXT NOT NULL,
+                days INTEGER NOT NULL,
+                PRIMARY KEY (region_id, type_id)
+            )
+        """)
+        self._conn.commit()
+
+    def _meta(self, region_id, type_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT fetched_at, last_date, avg_daily_volume, trend, days FROM history_meta WHERE region_id=? AND type_id=?",
+                (region_id, type_id)
+            ).fetchone()
+
+    def _rows(self, region_id, type_id):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(HISTORY_FIELDS)} FROM history WHERE region_id=? AND type_id=? ORDER BY date",
+                (region_id, type_id)
+            ).fetchall()
+        return [dict(zip(HISTORY_FIELDS, row)) for row in rows]
+
+    def _refresh(self, region_id, type_id, last_date):
+        """Henter historikken fra ESI og lagrer bare dagene fra og med siste lagrede dag."""
+        history = api.fetch_esi_history(region_id, type_id)
+        if history is None:
+            return None
+        history.sort(key=lambda h: h['date'])
+        new_rows = [(region_id, type_id) + tuple(h.get(field) for field in HISTORY_FIELDS)
+                    for h in history if last_date is None or h['date'] >= last_date]
+        summary = summarize(history)
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO history (region_id, type_id, {', '.join(HISTORY_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                new_rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history_meta (region_id, type_id, fetched_at, last_date, avg_daily_volume, trend, days) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (region_id, type_id, time.time(), history[-1]['date'] if history else last_date,
+                 summary['avg_daily_volume'], summary['trend'], summary['days'])
+            )
+            self._conn.commit()
+        return history
+
+    def _ensure_fresh(self, region_id, type_id):
+        """Returnerer (metarad, nyhentet historikk eller None). Henter bare etter et døgnskifte."""
+        meta = self._meta(region_id, type_id)
+        if meta and time.time() < next_rollover(meta[0]):
+            return meta, None
+        history = self._refresh(region_id, type_id, meta[1] if meta else None)
+        if history is None:
+            return meta, None   # ESI feilet: bruk det vi har, selv om det er fra i går
+        return self._meta(region_id, type_id), history
+
+    def get_history(self, region_id, type_id):
+        meta, history = self._ensure_fresh(region_id, type_id)
+        if history is not None:
+            return history
+        return self._rows(region_id, type_id) if meta else None
+
+    def get_summary(self, region_id, type_id):
+        meta, _ = self._ensure_fresh(region_id, type_id)
+        if not meta:
+            return None
+        return {'avg_daily_volume': meta[2], 'trend': meta[3], 'days': meta[4]}
+
+    def prune(self, max_age_seconds):
+        """Sletter varer som ikke er oppdatert på lenge, med all historikk."""
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            self._conn.execute("""
+                DELETE FROM history WHERE (region_id, type_id) IN
+                    (SELECT region_id, type_id FROM history_meta WHERE fetched_at < ?)
+            """, (cutoff,))
+            self._conn.execute("DELETE FROM history_meta WHERE fetched_at < ?", (cutoff,))
+            self._conn.commit()
+
+def get_store():
+    """Returnerer det globale historikklageret, eller None hvis det ikke kan åpnes."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                try:
+                    _STORE = HistoryStore(config.HISTORY_STORE_FILE)
+                    _STORE.prune(config.HISTORY_STORE_MAX_AGE)
+                except sqlite3.Error as e:
+                    print(f"Kunne ikke åpne historikklageret {config.HISTORY_STORE_FILE}: {e}")
+                    _STORE = False
+    return _STORE or None
+
+def get_history(region_id, type_id):
+    """Daglige historikkrader for en vare i en region (samme format som ESI)."""
+    store = get_store()
+    if store is None:
+        return api.fetch_esi_history(region_id, type_id)
+    return store.get_history(region_id, type_id)
+
+def get_summary(region_id, type_id):
+    """{'avg_daily_volume', 'trend', 'days'} for en vare, uten å lese selve historikken."""
+    store = get_store()
+    if store is None:
+        history = api.fetch_esi_history(region_id, type_id)
+        return summarize(history) if history is not None else None
+    return store.get_summary(region_id, type_id)
@@ -0,0 +1,146 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - HTTP-CACHE-MODUL (ETag / Expires)
+# ==============================================================================
+import sqlite3
+import threading
+import hashlib
+import base64
+import json
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import config
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def _token_owner(token):
+    """
+    Finner hvilken karakter et access token tilhører (JWT 'sub'-feltet),
+    slik at autentiserte svar aldri deles mellom karakterer.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get('sub') or ''
+    except (IndexError, ValueError, AttributeError):
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+def make_key(url, params=None, token=None):
+    """Bygger cache-nøkkelen for et GET-kall: URL + sorterte parametere (+ karakter)."""
+    key = url
+    if params:
+        key += ('&' if '?' in url else '?') + urlencode(sorted(params.items()))
+    if token:
+        key += f"#{_token_owner(token)}"
+    return key
+
+def parse_expires(headers):
+    """Leser 'Expires'-headeren som epoch-sekunder. Mangler den, er svaret straks utdatert."""
+    expires = headers.get('Expires')
+    if not expires:
+        return time.time()
+    try:
+        return parsedate_to_datetime(expires).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+class ResponseCache:
+    """
+    Persistent svar-cache for ESI lagret i en lokal SQLite-fil.
+    Ferske svar (før 'Expires') serveres uten nettverk; utdaterte svar
+    revalideres med If-None-Match slik at et 304-svar gjenbruker lagret innhold.
+    """
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                etag TEXT,
+                expires REAL NOT NULL,
+                stored_at REAL NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, expires, headers, body FROM responses WHERE cache_key=?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'etag': row[0], 'expires': row[1], 'headers': json.loads(row[2]), 'body': row[3]}
+
+    def store(self, key, response):
+        """Lagrer et vellykket svar hvis ESI har gitt oss noe å revalidere eller utløpe på."""
+        etag = response.headers.get('ETag')
+        if not etag and 'Expires' not in response.headers:
+            return
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+        body = zlib.compress(response.content, 1)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, etag, expires, stored_at, headers, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, parse_expires(response.headers), time.time(), json.dumps(headers), body)
+            )
+            self._conn.commit()
+
+    def refresh(self, key, entry, not_modified_response):
+        """Oppdaterer utløpstid og headere etter et 304 Not Modified-svar."""
+        entry['headers'].update({k: v for k, v in not_modified_response.headers.items()
+                                 if k.lower() in ('expires', 'last-modified', 'etag', 'date', 'x-pages')})
+        entry['expires'] = parse_expires(not_modified_response.headers)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET expires=?, stored_at=?, headers=? WHERE cache_key=?",
+                (entry['expires'], time.time(), json.dumps(entry['headers']), key)
+            )
+            self._conn.commit()
+        return entry
+
+    def prune(self, max_age_seconds):
+        """Sletter oppføringer som ikke er brukt eller revalidert på lenge."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - max_age_seconds,))
+            self._conn.commit()
+
+def is_fresh(entry):
+    return entry is not None and entry['expires'] > time.time()
+
+def build_response(url, entry):
+    """Lager et requests.Response-objekt fra en cache-oppføring, slik at kallere ikke merker forskjell."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = zlib.decompress(entry['body'])
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+def get_cache():
+    """Returnerer den globale svar-cachen, eller None hvis den er slått av."""
+    global _CACHE
+    if not config.RESPONSE_CACHE_ENABLED:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                try:
+                    _CACHE = ResponseCache(config.RESPONSE_CACHE_FILE)
+                    _CACHE.prune(config.RESPONSE_CACHE_MAX_AGE)
+                except sqlite3.Error as e:
+                    print(f"Kunne ikke åpne svar-cachen {config.RESPONSE_CACHE_FILE}: {e}")
+                    config.RESPONSE_CACHE_ENABLED = False
+                    return None
+    return _CACHE
@@ -0,0 +1,174 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - HOPPGRAF (stargate-avstander fra SDE)
+# ==============================================================================
+# Solsystemene og stargate-forbindelsene fra mapSolarSystemJumps lastes én
+# gang som en graf med tette indekser. Antall hopp fra et startsystem til
+# alle andre systemer regnes ut i én omgang (BFS) og lagres som en kompakt
+# avstandsrad (array('H'), 2 byte per system). Radene for handelsknutepunktene
+# regnes ut når grafen lastes; andre rader når de først trengs. Deretter er
+# hvert avstandsoppslag ett indeksoppslag i raden.
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+
+import config
+import db
+import universe
+
+# Rutevalg (vises også i innstillingsfanen)
+SHORTEST = "Korteste"
+HIGHSEC_ONLY = "Kun high-sec"
+AVOID_LOW_NULL = "Unngå low/null"
+ROUTE_POLICIES = (SHORTEST, HIGHSEC_ONLY, AVOID_LOW_NULL)
+
+UNREACHABLE = 0xFFFF        # Verdien i avstandsraden for systemer som ikke kan nås
+HIGHSEC_LIMIT = 0.5
+LOW_NULL_PENALTY = 50       # Et hopp inn i low/null koster like mye som så mange high-sec-hopp
+
+_GRAPH = None
+_GRAPH_LOCK = threading.Lock()
+
+class JumpGraph:
+    """Stargate-graf med avstandsrader per (rutevalg, startsystem). Trygg å bruke fra flere tråder."""
+    def __init__(self, jumps, security, max_rows=256):
+        system_ids = sorted({system_id for pair in jumps for system_id in pair} | set(security))
+        self.system_ids = array('i', system_ids)
+        self.index = {system_id: i for i, system_id in enumerate(system_ids)}
+        neighbours = [set() for _ in system_ids]
+        for from_id, to_id in jumps:
+            a, b = self.index[from_id], self.index[to_id]
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+        self.neighbours = [array('i', sorted(n)) for n in neighbours]
+        self.highsec = bytearray(1 if security.get(system_id, -1.0) >= HIGHSEC_LIMIT else 0 for system_id in system_ids)
+        self.max_rows = max_rows
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.system_ids)
+
+    def _bfs_row(self, source, highsec_only):
+        row = array('H', [UNREACHABLE]) * len(self.system_ids)
+        row[source] = 0
+        frontier, distance = [source], 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for node in frontier:
+                for neighbour in self.neighbours[node]:
+                    if row[neighbour] == UNREACHABLE and (not highsec_only or self.highsec[neighbour]):
+                        row[neighbour] = distance
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return row
+
+    def _weighted_row(self, source):
+        """Dijkstra der hopp inn i low/null koster LOW_NULL_PENALTY; raden inneholder antall hopp på den billigste ruten."""
+        row = array('H', [UNREACHABLE]) * len(self.system_ids)
+        row[source] = 0
+        best = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if cost > best[node]:
+                continue
+            for neighbour in self.neighbours[node]:
+                new_cost = cost + (1 if self.highsec[neighbour] else LOW_NULL_PENALTY)
+                if new_cost < best.get(neighbour, new_cost + 1):
+                    best[neighbour] = new_cost
+                    row[neighbour] = row[node] + 1
+                    heapq.heappush(heap, (new_cost, neighbour))
+        return row
+
+    def _compute_row(self, source, policy):
+        if policy == SHORTEST:
+            return self._bfs_row(source, highsec_only=False)
+        if policy == HIGHSEC_ONLY:
+            return self._bfs_row(source, highsec_only=True)
+        if policy == AVOID_LOW_NULL:
+            return self._weighted_row(source)
+        raise ValueError(f"Ukjent rutevalg: {policy}")
+
+    def row(self, source, policy=SHORTEST):
+        """Avstandsraden for en systemindeks; regnes ut og legges i hurtigbufferen ved første bruk."""
+        key = (policy, source)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+                return row
+        row = self._compute_row(source, policy)
+        with self._lock:
+            self._rows[key] = row
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+        return row
+
+    def precompute(self, system_ids, policies=ROUTE_POLICIES):
+        """Regner ut avstandsradene for systemene på forhånd (f.eks. handelsknutepunktene)."""
+        for system_id in system_ids:
+            source = self.index.get(system_id)
+            if source is None:
+                continue
+            for policy in policies:
+                self.row(source, policy)
+
+    def distance(self, from_system_id, to_system_id, policy=SHORTEST):
+        """Antall hopp mellom to systemer, eller None hvis de ikke henger sammen under rutevalget."""
+        source, target = self.index.get(from_system_id), self.index.get(to_system_id)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return 0
+        jumps = self.row(source, policy)[target]
+        return None if jumps == UNREACHABLE else jumps
+
+def get_jump_graph():
+    """
+    Returnerer den globale hoppgrafen, lastet fra SDE ved første kall, med
+    avstandsradene for handelsknutepunktene i config.STATIONS_INFO ferdig utregnet.
+    Returnerer None hvis SDE ikke kan leses; da prøves det igjen neste gang.
+    """
+    global _GRAPH
+    if _GRAPH is None:
+        with _GRAPH_LOCK:
+            if _GRAPH is None:
+                jumps = db.get_system_jumps()
+                uni = universe.get_universe()
+                if jumps and uni:
+                    graph = JumpGraph(jumps, uni.security_statuses(), config.JUMP_TABLE_MAX_ROWS)
+                    graph.precompute(info['system_id'] for info in config.STATIONS_INFO.values())
+                    _GRAPH = graph
+                    print(f"Hoppgraf lastet fra SDE: {len(graph)} systemer, {len(jumps)} stargate-forbindelser.")
+    return _GRAPH
+
+def jumps_between(from_system_id, to_system_id, policy=None):
+    """Antall hopp med rutevalget (standard config.JUMP_ROUTE_POLICY), eller None hvis ukjent/uoppnåelig."""
+    if from_system_id is None or to_system_id is None:
+        return None
+    graph = get_jump_graph()
+    if not graph:
+        return None
+    if policy is None:
+        # Innstillingen kan være lagret av en eldre versjon; ukjente verdier gir korteste rute
+        policy = config.JUMP_ROUTE_POLICY if config.JUMP_ROUTE_POLICY in ROUTE_POLICIES else SHORTEST
+    return graph.distance(from_system_id, to_system_id, policy)
+
+def system_for_location(location_id, user_structures=()):
+    """Solsystemet til en NPC-stasjon eller en av brukerens egne strukturer, ellers None."""
+    uni = universe.get_universe()
+    station = uni.stations.get(location_id) if uni else None
+    if station:
+        return station.system_id
+    for structure in user_structures:
+        if structure.get('id') == location_id:
+            return structure.get('system_id')
+    return None
+
+def isk_per_jump(isk, jumps):
+    """ISK per hopp; handel i samme system (0 hopp) regnes som ett hopp. None hvis avstanden er ukjent."""
+    if jumps is None:
+        return None
+    return isk / max(jumps, 1)
@@ -2,6 +2,7 @@
 # EVE MARKET VERKTØY - BEREGNINGS-MODUL
 # ==============================================================================
 import api
+import order_book
 import config
 import math # NY IMPORT
 
@@ -18,12 +19,12 @@ def get_single_item_analysis(analysis_config):
         sell_station_info = config.STATIONS_INFO[analysis_config['sell_station']]
 
         # --- 2. Hent markedsordrer ---
-        buy_orders_data = api.fetch_market_orders(buy_station_info['region_id'], type_id)
+        buy_orders_data = order_book.get_type_orders(buy_station_info['region_id'], type_id)
         # Hvis salgs- og kjøpsstasjon er i samme region, trenger vi ikke hente to ganger
         if buy_station_info['region_id'] == sell_station_info['region_id']:
             sell_orders_data = buy_orders_data
         else:
-            sell_orders_data = api.fetch_market_orders(sell_station_info['region_id'], type_id)
+            sell_orders_data = order_book.get_type_orders(sell_station_info['region_id'], type_id)
 
         if not buy_orders_data or not sell_orders_data:
             return {'error': "Kunne ikke hente markedsordrer for en av regionene."}
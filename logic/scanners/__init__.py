@@ -5,6 +5,9 @@
 # Den fungerer også som en sentral (dispatcher) som importerer den faktiske
 # logikken fra sine søstermoduler og kaller riktig funksjon.
 
+import api
+import config
+
 # Relative importer fra andre filer i samme mappe (scanners/)
 from .helpers import get_active_items_from_jita
 from .bpo import run_bpo_scan
@@ -16,8 +19,19 @@ from .galaxy import run_galaxy_scan
 def run_scan_thread(scan_config, progress_callback):
     """
     Hovedfunksjon som delegerer til riktig skanner basert på konfigurasjon.
-    Denne funksjonen kalles fra UI-tråden.
+    Denne funksjonen kalles fra UI-tråden. Returnerer skannets nettverksstatistikk
+    (antall kall som ble prøvd på nytt eller gitt opp).
     """
+    api.begin_retry_budget(config.SCAN_RETRY_BUDGET)
+    try:
+        _dispatch_scan(scan_config, progress_callback)
+    finally:
+        retry_stats = api.end_retry_budget()
+    if retry_stats['retried'] or retry_stats['gave_up']:
+        print(f"Skann '{scan_config.get('scan_type')}': {retry_stats['retried']} nye forsøk, {retry_stats['gave_up']} kall gitt opp.")
+    return retry_stats
+
+def _dispatch_scan(scan_config, progress_callback):
     scan_type = scan_config.get('scan_type')
     active_flag = scan_config.get('active_flag')
 
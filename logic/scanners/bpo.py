@@ -34,6 +34,11 @@ def run_bpo_scan(scan_config, progress_callback):
             progress_callback({'scan_type': scan_type, 'error': 'Kunne ikke hente blueprints fra databasen.'})
             return
 
+        recipes = db.get_manufacturing_recipes()
+        if not recipes:
+            progress_callback({'scan_type': scan_type, 'error': 'Kunne ikke laste produksjonsoppskrifter fra databasen.'})
+            return
+
         total_items = len(all_producible_items)
         progress_callback({'scan_type': scan_type, 'eta': f'Analyserer {total_items} blueprints...'})
 
@@ -61,7 +66,7 @@ def run_bpo_scan(scan_config, progress_callback):
             ids_to_price = set()
             bpos_in_batch = {}
             for product_id, bpo_id in batch:
-                bp_data = db.get_blueprint_from_sde(product_id)
+                bp_data = recipes.for_product(product_id)
                 if not bp_data: continue
                 
                 bpos_in_batch[bpo_id] = bp_data
@@ -117,7 +122,6 @@ def run_bpo_scan(scan_config, progress_callback):
 
                 except (KeyError, ValueError, TypeError):
                     continue
-            time.sleep(0.5) 
         
         progress_callback({'scan_type': scan_type, 'status': 'Blueprint-skann fullført!'})
 
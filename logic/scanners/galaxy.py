@@ -1,9 +1,14 @@
-import time
 from collections import defaultdict
 import api
+import api_async
 import config
-import db
-from .helpers import get_trend_indicator
+import jump_graph
+import market_prices
+import universe
+from .helpers import make_progress_reporter
+
+# Feltene fra regionale salgsordrer som galakse-skannet faktisk bruker
+GALAXY_ORDER_FIELDS = ('type_id', 'location_id', 'system_id', 'price', 'volume_remain')
 
 def _create_optimal_bundle(items, cargo_capacity, max_investment):
     """
@@ -46,16 +51,21 @@ def _create_optimal_bundle(items, cargo_capacity, max_investment):
                 'buy_volume_available': item['buy_volume_available'],
                 'sell_volume_available': item['sell_volume_available'],
                 'daily_volume': item['daily_volume'], 'trend': item['trend'],
-                'buy_station': item['buy_station'] 
+                'buy_station': item['buy_station'], 'jumps': item['jumps']
             })
             
             total_profit += profit_from_this_item
             remaining_cargo -= units_to_take * item['item_m3']
             remaining_investment -= cost_of_this_item
 
+    # Flerstasjonspakker: avstanden til den fjerneste kjøpsstasjonen (en nedre grense for turen)
+    known_jumps = [item['jumps'] for item in bundle_items if item['jumps'] is not None]
+    jumps = max(known_jumps) if known_jumps and len(known_jumps) == len(bundle_items) else None
+
     return {
         "is_bundle": True, "buy_station": items[0]['buy_station'] if items else 'N/A', 
         "total_profit": total_profit, "item_count": len(bundle_items), "items": bundle_items,
+        "jumps": jumps, "isk_per_jump": jump_graph.isk_per_jump(total_profit, jumps),
         "cargo_used_percentage": (1 - (remaining_cargo / cargo_capacity)) * 100 if cargo_capacity > 0 else 0
     }
 
@@ -74,50 +84,46 @@ def run_galaxy_scan(scan_config, all_type_ids, progress_callback):
         return
 
     progress_callback({'scan_type': scan_type, 'status': "Henter system-sikkerhet..."})
-    system_securities = db.get_all_system_security_statuses()
+    uni = universe.get_universe()
+    system_securities = uni.security_statuses() if uni else {}
     if not system_securities:
         progress_callback({'scan_type': scan_type, 'error': "Kunne ikke laste system-data fra SDE."})
         return
 
-    item_chunks = [all_type_ids[i:i + 200] for i in range(0, len(all_type_ids), 200)]
     progress_callback({'scan_type': scan_type, 'progress': 0.1, 'status': "Steg 1/4: Henter priser for hjemmebase..."})
-    home_buy_orders = {}
-    for i, chunk in enumerate(item_chunks):
-        if not active_flag.is_set(): return
-        progress_callback({'scan_type': scan_type, 'progress': 0.1 + ((i + 1) / len(item_chunks) * 0.15), 'status': f"Henter hjemmebase-priser (Gruppe {i+1}/{len(item_chunks)})"})
-        data = api.fetch_fuzzwork_market_data(home_base_info['id'], chunk)
-        for typeid_str, item_data in (data or {}).items():
-            if item_data and item_data.get('buy') and item_data.get('buy').get('max'):
-                home_buy_orders[int(typeid_str)] = {'price': float(item_data['buy']['max']), 'volume': float(item_data['buy'].get('volume', 0))}
-        time.sleep(0.5)
-
-    progress_callback({'scan_type': scan_type, 'progress': 0.25, 'status': f"Steg 2/4: Henter salgsordrer fra {scan_config['target_region']}..."})
-    all_regional_sell_orders = api.fetch_all_pages(f"https://esi.evetech.net/latest/markets/{target_region_id}/orders/?datasource=tranquility&order_type=sell") or []
+    home_prices = market_prices.fetch_price_table(
+        home_base_info['id'], all_type_ids, active_flag,
+        make_progress_reporter(progress_callback, scan_type, "Henter hjemmebase-priser, varer", 0.1, 0.15))
+    if not active_flag.is_set(): return
+    home_buy_orders = {type_id: {'price': item_data['buy']['max'], 'volume': item_data['buy']['volume']}
+                       for type_id, item_data in home_prices.items() if item_data['buy'] and item_data['buy']['max']}
+
+    # Bare varer vi har hjemmepris for, i systemer med valgte sikkerhetsnivåer
+    wanted_systems = [sys_id for sys_id, sec_status in system_securities.items()
+                      if (scan_config.get('include_hisec') and sec_status >= 0.5) or
+                         (scan_config.get('include_lowsec') and 0.0 < sec_status < 0.5) or
+                         (scan_config.get('include_nullsec') and sec_status <= 0.0)]
+    is_wanted = api.field_filter(type_id=home_buy_orders, system_id=wanted_systems)
+
+    # Ordresidene dekodes og filtreres etter hvert som de kommer inn; bare feltene vi trenger beholdes
+    progress_callback({'scan_type': scan_type, 'progress': 0.25, 'status': f"Steg 2/4: Henter og filtrerer salgsordrer fra {scan_config['target_region']}..."})
+    filtered_orders, orders_complete = api.fetch_all_pages(
+        f"{config.ESI_BASE_URL}/latest/markets/{target_region_id}/orders/?datasource=tranquility&order_type=sell",
+        with_status=True, record_filter=is_wanted, fields=GALAXY_ORDER_FIELDS)
+    if not orders_complete:
+        progress_callback({'scan_type': scan_type, 'status': "Advarsel: Noen ordresider kunne ikke hentes. Resultatene kan være ufullstendige."})
+    # Stasjonene i målregionen fra univers-modellen, med egne strukturer fra innstillingene
+    region_stations = api.get_stations_in_region(target_region_id, scan_config['settings'].get('user_structures', []))
     if scan_config.get('include_structures'):
-        structures_to_scan = [s for s in scan_config['settings'].get('user_structures', []) if s.get('region_id') == target_region_id]
-        for i, s_info in enumerate(structures_to_scan):
+        structures_to_scan = [(s_id, name) for s_id, name in region_stations.items() if s_id >= api.STRUCTURE_ID_MIN]
+        for i, (structure_id, structure_name) in enumerate(structures_to_scan):
             if not active_flag.is_set(): return
-            progress_callback({'scan_type': scan_type, 'progress': 0.25 + (((i + 1) / len(structures_to_scan)) * 0.15), 'status': f"Skanner struktur {i+1}/{len(structures_to_scan)}: {s_info['name']}"})
-            structure_orders = api.fetch_structure_market_orders(s_info['id'], scan_config['token'])
-            if structure_orders: all_regional_sell_orders.extend([o for o in structure_orders if not o.get('is_buy_order')])
-    
-    if not all_regional_sell_orders: 
-        progress_callback({'scan_type': scan_type, 'status': "Fant ingen salgsordrer i regionen."})
-        return
-
-    progress_callback({'scan_type': scan_type, 'progress': 0.4, 'status': f"Steg 3/4: Filtrerer {len(all_regional_sell_orders)} ordrer..."})
-    filtered_orders = []
-    for order in all_regional_sell_orders:
-        sec_status = system_securities.get(order.get('system_id'))
-        if sec_status is None: continue
-
-        if (scan_config.get('include_hisec') and sec_status >= 0.5) or \
-           (scan_config.get('include_lowsec') and 0.0 < sec_status < 0.5) or \
-           (scan_config.get('include_nullsec') and sec_status <= 0.0):
-            filtered_orders.append(order)
+            progress_callback({'scan_type': scan_type, 'progress': 0.25 + (((i + 1) / len(structures_to_scan)) * 0.15), 'status': f"Skanner struktur {i+1}/{len(structures_to_scan)}: {structure_name}"})
+            structure_orders = api.fetch_structure_market_orders(structure_id, scan_config['token'])
+            if structure_orders: filtered_orders.extend([o for o in structure_orders if not o.get('is_buy_order') and is_wanted(o)])
     
     if not filtered_orders:
-        progress_callback({'scan_type': scan_type, 'status': "Ingen ordrer i valgte sikkerhetsnivåer."})
+        progress_callback({'scan_type': scan_type, 'status': "Fant ingen salgsordrer i valgte sikkerhetsnivåer."})
         return
 
     orders_by_type = defaultdict(list)
@@ -127,34 +133,50 @@ def run_galaxy_scan(scan_config, all_type_ids, progress_callback):
     profitable_items_by_station = defaultdict(list)
     all_profitable_items = []
 
-    for i, type_id in enumerate(list(orders_by_type.keys())):
-        if not active_flag.is_set(): return
-        progress_callback({'scan_type': scan_type, 'progress': 0.5 + (((i + 1) / len(orders_by_type)) * 0.4), 'status': f"Analyserer marked i {scan_config['target_region']} ({i+1}/{len(orders_by_type)})"})
-        
+    # Finn varer som er lønnsomme på pris alene før vi bruker ESI-kall på dem
+    price_candidates = {}
+    for type_id, type_orders in orders_by_type.items():
         home_order_info = home_buy_orders.get(type_id)
         if not home_order_info: continue
         
-        best_buy_order = min(orders_by_type[type_id], key=lambda x: x['price'])
-        buy_price = best_buy_order['price']
+        best_buy_order = min(type_orders, key=lambda x: x['price'])
         net_sell_price = home_order_info['price'] * (1 - scan_config['sales_tax_rate'] / 100.0)
+        if net_sell_price <= best_buy_order['price']: continue
+        price_candidates[type_id] = (best_buy_order, home_order_info, net_sell_price)
+
+    # Volum for alle kandidater fra SDE i én omgang, og dagsvolum/trend samtidig fra historikklageret
+    candidate_attributes = api.fetch_type_attributes_bulk(list(price_candidates))
+    candidate_summaries = api_async.run(api_async.gather_by_key(
+        lambda type_id: api_async.fetch_history_summary(home_base_info['region_id'], type_id),
+        [type_id for type_id in price_candidates if candidate_attributes.get(type_id, {}).get('volume', 0) > 0], active_flag,
+        make_progress_reporter(progress_callback, scan_type, f"Analyserer marked i {scan_config['target_region']}", 0.5, 0.4)))
+    if not active_flag.is_set(): return
+
+    # Navn på alle kjøpsstasjoner i én omgang; stasjoner som ikke er med i regionoppslaget slås opp samlet
+    location_names = dict(region_stations)
+    location_names.update(api.resolve_location_names(
+        [price_candidates[type_id][0]['location_id'] for type_id in candidate_summaries
+         if price_candidates[type_id][0]['location_id'] not in location_names], scan_config.get('token')))
+
+    for type_id, (best_buy_order, home_order_info, net_sell_price) in price_candidates.items():
+        if type_id not in candidate_summaries: continue
+        type_attributes, summary = candidate_attributes.get(type_id), candidate_summaries[type_id]
+        buy_price = best_buy_order['price']
         
-        if net_sell_price <= buy_price: continue
-        
-        type_attributes = api.fetch_type_attributes(type_id)
         if not type_attributes or type_attributes.get('volume', 0) <= 0: continue
         
-        history = api.fetch_esi_history(home_base_info['region_id'], type_id)
-        avg_daily_vol = sum(h['volume'] for h in history[-7:]) / 7 if history and len(history) >= 7 else 0
+        avg_daily_vol = summary['avg_daily_volume'] if summary else 0
         if avg_daily_vol < scan_config['min_volume']: continue
         
         net_profit_per_unit = net_sell_price - buy_price
         original_trade_limit = min(scan_config['max_investment'] / buy_price if buy_price > 0 else float('inf'), best_buy_order['volume_remain'])
         
         item_data = {
-            'item': id_to_name.get(type_id, f"ID: {type_id}"), 'buy_station': api.get_station_name_with_cache(best_buy_order['location_id']),
+            'item': id_to_name.get(type_id, f"ID: {type_id}"), 'buy_station': location_names[best_buy_order['location_id']],
             'buy_price': buy_price, 'sell_price': home_order_info['price'], 'net_profit_per_unit': net_profit_per_unit,
             'item_m3': type_attributes['volume'], 'units_to_trade': original_trade_limit, 'buy_volume_available': best_buy_order['volume_remain'],
-            'sell_volume_available': home_order_info['volume'], 'daily_volume': avg_daily_vol, 'trend': get_trend_indicator(history)
+            'sell_volume_available': home_order_info['volume'], 'daily_volume': avg_daily_vol, 'trend': summary['trend'] if summary else "—",
+            'jumps': jump_graph.jumps_between(home_base_info['system_id'], best_buy_order.get('system_id'))
         }
 
         if (original_trade_limit * net_profit_per_unit) > scan_config['min_profit']:
@@ -1,7 +1,11 @@
 import heapq
 import api
 import config
-import db
+import jump_graph
+import universe
+
+# Feltene fra salgsordrene som prisjakten viser eller sorterer på
+PRICE_HUNTER_ORDER_FIELDS = ('order_id', 'price', 'volume_remain', 'location_id', 'system_id')
 
 def run_price_hunter_scan(scan_config, progress_callback):
     """Scanner alle regioner for den billigste salgsordren av en vare."""
@@ -11,7 +15,8 @@ def run_price_hunter_scan(scan_config, progress_callback):
     item_name = scan_config['item_name']
 
     progress_callback({'scan_type': scan_type, 'progress': 0, 'status': "Henter system-sikkerhet..."})
-    system_securities = db.get_all_system_security_statuses()
+    uni = universe.get_universe()
+    system_securities = uni.security_statuses() if uni else {}
     if not system_securities:
         progress_callback({'scan_type': scan_type, 'error': "Kunne ikke laste system-data fra SDE."})
         return
@@ -30,7 +35,9 @@ def run_price_hunter_scan(scan_config, progress_callback):
     if not config.ALL_REGIONS_CACHE: api.populate_all_regions_cache()
     all_regions = [rid for rid in config.ALL_REGIONS_CACHE.values() if str(rid).startswith("10")]
     total_regions = len(all_regions)
+    system_filter = api.field_filter(system_id=security_map)
     cheapest_orders = []
+    incomplete_regions = []
     
     for i, region_id in enumerate(all_regions):
         if not active_flag.is_set():
@@ -41,22 +48,23 @@ def run_price_hunter_scan(scan_config, progress_callback):
         progress = (i + 1) / total_regions
         progress_callback({'scan_type': scan_type, 'progress': progress, 'status': f"Skanner region {i+1}/{total_regions}: {region_name}"})
         
-        url = f"https://esi.evetech.net/latest/markets/{region_id}/orders/?datasource=tranquility&order_type=sell&type_id={type_id}"
-        orders_in_region = api.fetch_all_pages(url)
+        url = f"{config.ESI_BASE_URL}/latest/markets/{region_id}/orders/?datasource=tranquility&order_type=sell&type_id={type_id}"
+        orders_in_region, region_complete = api.fetch_all_pages(
+            url, with_status=True, record_filter=system_filter, fields=PRICE_HUNTER_ORDER_FIELDS)
+        if not region_complete:
+            incomplete_regions.append(region_name)
 
         if not orders_in_region: continue
 
         for order in orders_in_region:
-            system_id = order.get('system_id')
-            if system_id in security_map:
-                price = order['price']
-                # Bruker en min-heap for å effektivt holde styr på de 20 billigste
-                order_tuple = (price, order['order_id'], order)
+            price = order['price']
+            # Bruker en min-heap for å effektivt holde styr på de 20 billigste
+            order_tuple = (price, order['order_id'], order)
 
-                if len(cheapest_orders) < 20:
-                    heapq.heappush(cheapest_orders, order_tuple)
-                elif price < cheapest_orders[0][0]:
-                    heapq.heapreplace(cheapest_orders, order_tuple)
+            if len(cheapest_orders) < 20:
+                heapq.heappush(cheapest_orders, order_tuple)
+            elif price < cheapest_orders[0][0]:
+                heapq.heapreplace(cheapest_orders, order_tuple)
 
     if not cheapest_orders:
         progress_callback({'scan_type': scan_type, 'status': f"Fant ingen salgsordrer for '{item_name}' i valgte områder."})
@@ -64,14 +72,25 @@ def run_price_hunter_scan(scan_config, progress_callback):
         
     final_results = sorted([item[2] for item in cheapest_orders], key=lambda x: x['price'])
 
+    # Stasjonsnavn fra univers-modellen per system (med egne strukturer); resten slås opp samlet
+    location_names = {}
+    for system_id in {o['system_id'] for o in final_results}:
+        location_names.update(uni.stations_in_system(system_id, scan_config.get('user_structures', ())))
+    location_names.update(api.resolve_location_names(
+        [o['location_id'] for o in final_results if o['location_id'] not in location_names]))
+    origin_info = config.STATIONS_INFO.get(scan_config.get('origin'), config.STATIONS_INFO['Jita'])
     for order in final_results:
         result = {
             'item_name': item_name, 'price': order['price'], 'quantity': order['volume_remain'],
-            'location_name': api.get_station_name_with_cache(order['location_id']),
-            'system_name': db.get_system_name_from_sde(order['system_id']),
-            'security': security_map.get(order['system_id'], "N/A")
+            'location_name': location_names[order['location_id']],
+            'system_name': uni.system_name(order['system_id']),
+            'security': security_map.get(order['system_id'], "N/A"),
+            'jumps': jump_graph.jumps_between(origin_info['system_id'], order['system_id'])
         }
         progress_callback({'scan_type': 'price_hunter', 'result': result})
     
-    progress_callback({'scan_type': scan_type, 'status': f"Prisjakt for '{item_name}' fullført."})
+    if incomplete_regions:
+        progress_callback({'scan_type': scan_type, 'status': f"Prisjakt for '{item_name}' fullført, men {len(incomplete_regions)} region(er) ble ikke hentet komplett."})
+    else:
+        progress_callback({'scan_type': scan_type, 'status': f"Prisjakt for '{item_name}' fullført."})
 
@@ -1,7 +1,8 @@
-import time
-import api
+import api_async
 import config
-from .helpers import get_trend_indicator, format_time
+import market_prices
+import order_book
+from .helpers import make_progress_reporter
 
 def run_region_trading_scan(scan_config, all_type_ids, progress_callback):
     """Kjører 'flipping'-skann innad på én stasjon."""
@@ -11,50 +12,59 @@ def run_region_trading_scan(scan_config, all_type_ids, progress_callback):
     base_progress = 0.1
     
     station_info = config.STATIONS_INFO[scan_config['station']]
-    item_chunks = [all_type_ids[i:i + 200] for i in range(0, len(all_type_ids), 200)]
     
     progress_callback({'scan_type': scan_type, 'progress': base_progress, 'status': f"Steg 1: Henter priser for {scan_config['station']}..."})
-    prices_map = {}
-    for i, chunk in enumerate(item_chunks):
-        if not active_flag.is_set(): return
-        progress = base_progress + (i / len(item_chunks) * 0.4)
-        progress_callback({'scan_type': scan_type, 'progress': progress, 'status': f"Henter pris-gruppe {i+1}/{len(item_chunks)}..."})
-        data = api.fetch_fuzzwork_market_data(station_info['id'], chunk)
-        for typeid_str, item_data in (data or {}).items():
-            prices_map[int(typeid_str)] = item_data
-        time.sleep(0.5)
+    prices_map = market_prices.fetch_price_table(
+        station_info['id'], all_type_ids, active_flag,
+        make_progress_reporter(progress_callback, scan_type, "Henter priser, varer", base_progress, 0.4))
+    if not active_flag.is_set(): return
 
     progress_callback({'scan_type': scan_type, 'progress': 0.5, 'status': "Steg 2: Finner kandidater..."})
     candidates = []
     for type_id in all_type_ids:
         item_data = prices_map.get(type_id)
         if not item_data or not item_data.get('buy') or not item_data.get('sell'): continue
-        if float(item_data['buy']['max']) > 0 and float(item_data['sell']['min']) > float(item_data['buy']['max']):
+        if item_data['buy']['max'] > 0 and item_data['sell']['min'] > item_data['buy']['max']:
             candidates.append(type_id)
 
-    total_candidates, start_time = len(candidates), time.time()
-    for i, type_id in enumerate(candidates):
+    # Steg 3: Hent 7-dagers volum og trend for alle kandidater samtidig (fra historikklageret)
+    summaries = api_async.run(api_async.gather_by_key(
+        lambda type_id: api_async.fetch_history_summary(station_info['region_id'], type_id),
+        candidates, active_flag,
+        make_progress_reporter(progress_callback, scan_type, "Henter historikk for kandidat", 0.5, 0.2)))
+    if not active_flag.is_set(): return
+
+    finalists = {}
+    for type_id in candidates:
+        summary = summaries.get(type_id)
+        avg_daily_vol = summary['avg_daily_volume'] if summary else 0
+        if avg_daily_vol < scan_config['min_volume']: continue
+        finalists[type_id] = (summary['trend'] if summary else "—", avg_daily_vol)
+
+    # Steg 4: Last regionens ordrebok én gang i stedet for ett kall per finalist
+    if not finalists:
+        progress_callback({'scan_type': scan_type, 'status': 'Stasjonshandel-skann fullført!'})
+        return
+    progress_callback({'scan_type': scan_type, 'progress': 0.7, 'status': "Steg 4: Laster ordrebok for regionen..."})
+    book = order_book.get_region_snapshot(station_info['region_id'])
+    if not book:
+        progress_callback({'scan_type': scan_type, 'status': 'Kunne ikke hente ordreboken fra ESI.'})
+        return
+
+    for i, (type_id, (trend, avg_daily_vol)) in enumerate(finalists.items()):
         if not active_flag.is_set(): break
+        progress_callback({'scan_type': scan_type, 'progress': 0.7 + (i / len(finalists) * 0.3)})
         item_name = id_to_name.get(type_id, f"ID: {type_id}")
-        progress = 0.5 + ((i + 1) / total_candidates * 0.5) if total_candidates > 0 else 1
-        eta = (total_candidates - (i + 1)) * ((time.time() - start_time) / (i + 1)) if i > 0 else None
-        progress_callback({'scan_type': scan_type, 'progress': progress, 'status': f"Sjekker finalist {i+1}/{total_candidates}: {item_name}", 'eta': f"ETA: {format_time(eta)}"})
-        
-        history = api.fetch_esi_history(station_info['region_id'], type_id)
-        avg_daily_vol = sum(h['volume'] for h in history[-7:]) / 7 if history and len(history) >= 7 else 0
-        if avg_daily_vol < scan_config['min_volume']: continue
-        
-        trend = get_trend_indicator(history)
-        orders_data = api.fetch_market_orders(station_info['region_id'], type_id)
-        if not orders_data: continue
+        buy_orders = book.station_orders(type_id, station_info['id'], True)
+        sell_orders = book.station_orders(type_id, station_info['id'], False)
         
-        highest_buy = max((o for o in orders_data if o['location_id'] == station_info['id'] and o['is_buy_order']), key=lambda x: x['price'], default=None)
-        lowest_sell = min((o for o in orders_data if o['location_id'] == station_info['id'] and not o['is_buy_order']), key=lambda x: x['price'], default=None)
+        highest_buy = max(buy_orders, key=lambda x: x['price'], default=None)
+        lowest_sell = min(sell_orders, key=lambda x: x['price'], default=None)
         if not highest_buy or not lowest_sell: continue
 
         # Beregn antall konkurrenter
-        comp_buy = sum(1 for o in orders_data if o['location_id'] == station_info['id'] and o['is_buy_order'] and o['price'] >= highest_buy['price'])
-        comp_sell = sum(1 for o in orders_data if o['location_id'] == station_info['id'] and not o['is_buy_order'] and o['price'] <= lowest_sell['price'])
+        comp_buy = sum(1 for o in buy_orders if o['price'] >= highest_buy['price'])
+        comp_sell = sum(1 for o in sell_orders if o['price'] <= lowest_sell['price'])
         
         buy_price = highest_buy['price'] + 0.01
         sell_price = lowest_sell['price'] - 0.01
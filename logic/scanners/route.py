@@ -1,7 +1,10 @@
-import time
 import api
+import api_async
 import config
-from .helpers import get_trend_indicator, format_time
+import jump_graph
+import market_prices
+import order_book
+from .helpers import make_progress_reporter
 
 def run_route_scan(scan_config, all_type_ids, progress_callback):
     """Kjører ruteskann (stasjon til stasjon, både import og arbitrage)."""
@@ -10,22 +13,17 @@ def run_route_scan(scan_config, all_type_ids, progress_callback):
     active_flag = scan_config['active_flag']
     base_progress = 0.1
     
-    item_chunks = [all_type_ids[i:i + 200] for i in range(0, len(all_type_ids), 200)]
     buy_info = config.STATIONS_INFO[scan_config['buy_station']]
     sell_info = config.STATIONS_INFO[scan_config['sell_station']]
+    route_jumps = jump_graph.jumps_between(buy_info['system_id'], sell_info['system_id'])
     
+    # Steg 1: Priser for begge stasjonene hentes samtidig
     progress_callback({'scan_type': scan_type, 'progress': base_progress, 'status': "Steg 1: Henter priser fra Fuzzwork..."})
-    buy_prices_map, sell_prices_map = {}, {}
-    for i, chunk in enumerate(item_chunks):
-        if not active_flag.is_set(): return
-        progress = base_progress + (i / len(item_chunks) * 0.4)
-        progress_callback({'scan_type': scan_type, 'progress': progress, 'status': f"Henter pris-gruppe {i+1}/{len(item_chunks)}..."})
-        
-        buy_data = api.fetch_fuzzwork_market_data(buy_info['id'], chunk)
-        sell_data = api.fetch_fuzzwork_market_data(sell_info['id'], chunk)
-        for typeid_str, data in (buy_data or {}).items(): buy_prices_map[int(typeid_str)] = data
-        for typeid_str, data in (sell_data or {}).items(): sell_prices_map[int(typeid_str)] = data
-        time.sleep(0.5)
+    price_tables = market_prices.fetch_price_tables(
+        [buy_info['id'], sell_info['id']], all_type_ids, active_flag,
+        make_progress_reporter(progress_callback, scan_type, "Henter priser, varer", base_progress, 0.4))
+    if not active_flag.is_set(): return
+    buy_prices_map, sell_prices_map = price_tables[buy_info['id']], price_tables[sell_info['id']]
 
     progress_callback({'scan_type': scan_type, 'progress': 0.5, 'status': "Steg 2: Finner kandidater..."})
     candidates = []
@@ -33,34 +31,51 @@ def run_route_scan(scan_config, all_type_ids, progress_callback):
         buy_item, sell_item = buy_prices_map.get(type_id), sell_prices_map.get(type_id)
         if not buy_item or not sell_item or not buy_item.get('sell') or not sell_item.get('buy'): continue
         
-        buy_price = float(buy_item['sell']['min'])
+        buy_price = buy_item['sell']['min']
         # Arbitrage (salg->salg) har en annen salgsprismetode
-        sell_price = float(sell_item['buy']['max'] if scan_type == 'station' else sell_item['sell']['min'])
+        sell_price = sell_item['buy']['max'] if scan_type == 'station' else sell_item['sell']['min']
         if buy_price > 0 and sell_price > buy_price:
             candidates.append(type_id)
 
-    total_candidates, start_time = len(candidates), time.time()
-    for i, type_id in enumerate(candidates):
+    # Steg 3: Hent 7-dagers volum og trend for alle kandidater samtidig (fra historikklageret)
+    summaries = api_async.run(api_async.gather_by_key(
+        lambda type_id: api_async.fetch_history_summary(sell_info['region_id'], type_id),
+        candidates, active_flag,
+        make_progress_reporter(progress_callback, scan_type, "Henter historikk for kandidat", 0.5, 0.2)))
+    if not active_flag.is_set(): return
+
+    finalists = {}
+    for type_id in candidates:
+        summary = summaries.get(type_id)
+        avg_daily_vol = summary['avg_daily_volume'] if summary else 0
+        if avg_daily_vol < scan_config['min_volume']: continue
+        finalists[type_id] = (summary['trend'] if summary else "—", avg_daily_vol)
+
+    # Steg 4: Last ordrebøkene for begge regioner én gang, og volum for alle finalistene fra SDE
+    if not finalists:
+        progress_callback({'scan_type': scan_type, 'status': 'Ruteskann fullført!'})
+        return
+    progress_callback({'scan_type': scan_type, 'progress': 0.7, 'status': "Steg 4: Laster ordrebøker for regionene..."})
+    buy_book = order_book.get_region_snapshot(buy_info['region_id'])
+    sell_book = order_book.get_region_snapshot(sell_info['region_id'])
+    if not buy_book or not sell_book:
+        progress_callback({'scan_type': scan_type, 'status': 'Kunne ikke hente ordrebøkene fra ESI.'})
+        return
+
+    finalist_attributes = api.fetch_type_attributes_bulk(list(finalists))
+
+    for i, (type_id, (trend, avg_daily_vol)) in enumerate(finalists.items()):
         if not active_flag.is_set(): break
+        progress_callback({'scan_type': scan_type, 'progress': 0.7 + (i / len(finalists) * 0.3)})
+        type_attributes = finalist_attributes.get(type_id)
         item_name = id_to_name.get(type_id, f"ID: {type_id}")
-        progress = 0.5 + ((i + 1) / total_candidates * 0.5) if total_candidates > 0 else 1
-        eta = (total_candidates - (i + 1)) * ((time.time() - start_time) / (i + 1)) if i > 0 else None
-        progress_callback({'scan_type': scan_type, 'progress': progress, 'status': f"Sjekker finalist {i+1}/{total_candidates}: {item_name}", 'eta': f"ETA: {format_time(eta)}"})
-        
-        history = api.fetch_esi_history(sell_info['region_id'], type_id)
-        avg_daily_vol = sum(h['volume'] for h in history[-7:]) / 7 if history and len(history) >= 7 else 0
-        if avg_daily_vol < scan_config['min_volume']: continue
         
-        trend = get_trend_indicator(history)
-        buy_orders_data = api.fetch_market_orders(buy_info['region_id'], type_id)
-        sell_orders_data = api.fetch_market_orders(sell_info['region_id'], type_id)
-        
-        buy_order = min((o for o in (buy_orders_data or []) if o['location_id'] == buy_info['id'] and not o['is_buy_order']), key=lambda x: x['price'], default=None)
+        buy_order = buy_book.best_sell_order(type_id, buy_info['id'])
         
         if scan_type == 'station':  # Kjøp -> Salg (Import)
-            sell_order = max((o for o in (sell_orders_data or []) if o['location_id'] == sell_info['id'] and o['is_buy_order']), key=lambda x: x['price'], default=None)
+            sell_order = sell_book.best_buy_order(type_id, sell_info['id'])
         else:  # Salg -> Salg (Arbitrage)
-            sell_order = min((o for o in (sell_orders_data or []) if o['location_id'] == sell_info['id'] and not o['is_buy_order']), key=lambda x: x['price'], default=None)
+            sell_order = sell_book.best_sell_order(type_id, sell_info['id'])
 
         if not buy_order or not sell_order: continue
         
@@ -76,7 +91,6 @@ def run_route_scan(scan_config, all_type_ids, progress_callback):
         if buy_price <= 0 or net_sell_price <= buy_price: continue
         
         profit_margin = ((net_sell_price - buy_price) / buy_price) * 100
-        type_attributes = api.fetch_type_attributes(type_id)
         if not type_attributes or 'volume' not in type_attributes: continue
         
         item_m3 = type_attributes.get('volume', 0)
@@ -93,10 +107,9 @@ def run_route_scan(scan_config, all_type_ids, progress_callback):
                 'item': item_name, 'profit_per_trip': total_profit, 'profit_margin': profit_margin, 
                 'units_to_trade': trade_limit, 'daily_volume': avg_daily_vol, 'buy_price': buy_price, 
                 'sell_price': sell_price, 'buy_volume_available': buy_volume_available, 
-                'sell_volume_available': sell_volume_available, 'trend': trend
+                'sell_volume_available': sell_volume_available, 'trend': trend,
+                'jumps': route_jumps, 'isk_per_jump': jump_graph.isk_per_jump(total_profit, route_jumps)
             }
             progress_callback({'scan_type': scan_type, 'result': result})
-        
-        time.sleep(0.1)
 
     progress_callback({'scan_type': scan_type, 'status': 'Ruteskann fullført!'})
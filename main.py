@@ -1,26 +1,30 @@
 # ==============================================================================
 # EVE MARKET VERKTØY - HOVEDFIL
 # ==============================================================================
+from startup_timing import STARTUP   # Importeres først, slik at også importtiden måles
 import sys
 # ENDRET IMPORT-LINJE:
 from ui.main_app import EveMarketApp
-from config import load_items_from_file, load_settings
+from config import load_settings
 
 def main():
     """
     Hovedfunksjon for å starte EVE Market Verktøy.
-    Laster inn nødvendige data og starter GUI-loopen.
+    Laster innstillingene og starter GUI-loopen. Varelisten lastes i
+    bakgrunnen av appen, slik at vinduet vises med en gang.
     """
-    # 1. Last inn kritiske varedata. Avslutt hvis det feiler.
-    if not load_items_from_file():
-        sys.exit(1)
+    STARTUP.mark("importer")
 
-    # 2. Last inn lagrede innstillinger fra config-filen.
+    # 1. Last inn lagrede innstillinger fra config-filen (én gang).
     app_settings = load_settings()
 
-    # 3. Opprett og kjør applikasjonen.
+    # 2. Opprett og kjør applikasjonen.
     app = EveMarketApp(settings_dict=app_settings)
     app.mainloop()
 
+    # Varelisten manglet: appen har vist feilmeldingen og lukket seg
+    if app.startup_failed:
+        sys.exit(1)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,79 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - PRISKILDE FOR SKANNERNE
+# ==============================================================================
+# Felles inngang for stasjonspriser. Med priskilde "ESI" regnes tabellen ut
+# lokalt fra regionens ordrebok-snapshot (én bulk-nedlasting som også brukes
+# videre i skannet). For noen få varer lønner det seg ikke å laste ned hele
+# regionen; da brukes snapshotet bare hvis det alt ligger i minnet. Med
+# "Fuzzwork", eller når snapshotet mangler eller ikke er komplett, hentes
+# aggregatene fra Fuzzwork som før.
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import fuzzwork
+import order_book
+import universe
+
+PRICE_SOURCES = ("ESI", "Fuzzwork")
+
+def station_region(station_id):
+    """Regionen til en NPC-stasjon, eller None (f.eks. for spillerstrukturer)."""
+    for info in config.STATIONS_INFO.values():
+        if info['id'] == station_id:
+            return info['region_id']
+    uni = universe.get_universe()
+    station = uni.stations.get(station_id) if uni else None
+    return station.region_id if station else None
+
+def _local_price_tables(station_ids, download):
+    """
+    Regner ut pristabeller fra ordrebok-snapshots. Uten download brukes bare
+    snapshots som alt er i minnet. Stasjoner som ikke lot seg beregne utelates.
+    """
+    regions = {station_id: station_region(station_id) for station_id in station_ids}
+    region_ids = {region_id for region_id in regions.values() if region_id}
+    if not region_ids:
+        return {}
+    if download:
+        with ThreadPoolExecutor(max_workers=len(region_ids)) as pool:
+            snapshots = dict(zip(region_ids, pool.map(order_book.get_region_snapshot, region_ids)))
+    else:
+        snapshots = {region_id: order_book.get_cached_snapshot(region_id) for region_id in region_ids}
+
+    tables = {}
+    for station_id, region_id in regions.items():
+        snapshot = snapshots.get(region_id)
+        if snapshot and snapshot.is_complete:
+            tables[station_id] = snapshot.station_price_table(station_id)
+    return tables
+
+def fetch_price_tables(station_ids, type_ids, active_flag=None, on_progress=None):
+    """
+    Returnerer {stasjonsID: {typeID: {'buy': {...}, 'sell': {...}}}} med tall,
+    i samme format som fuzzwork.fetch_price_tables.
+    """
+    station_ids = list(dict.fromkeys(station_ids))
+    type_ids = list(type_ids)
+    tables = {}
+    if config.PRICE_SOURCE == "ESI":
+        tables = _local_price_tables(station_ids, download=len(type_ids) >= config.LOCAL_PRICE_MIN_TYPES)
+    if tables:
+        wanted = set(type_ids)
+        tables = {station_id: {t: stats for t, stats in table.items() if t in wanted} for station_id, table in tables.items()}
+
+    remaining = [station_id for station_id in station_ids if station_id not in tables]
+    if remaining:
+        if config.PRICE_SOURCE == "ESI" and len(type_ids) >= config.LOCAL_PRICE_MIN_TYPES:
+            print(f"Lokal prisberegning ikke mulig for {remaining}; bruker Fuzzwork.")
+        tables.update(fuzzwork.fetch_price_tables(remaining, type_ids, active_flag, on_progress))
+    elif on_progress:
+        on_progress(len(type_ids), len(type_ids))
+
+    for station_id in station_ids:
+        if not tables.get(station_id):
+            print(f"Fant ingen priser for stasjon {station_id}.")
+    return tables
+
+def fetch_price_table(station_id, type_ids, active_flag=None, on_progress=None):
+    """Som fetch_price_tables, men for én stasjon."""
+    return fetch_price_tables([station_id], type_ids, active_flag, on_progress).get(station_id, {})
@@ -0,0 +1,86 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - LOKAL PRISSTATISTIKK (Fuzzwork-format)
+# ==============================================================================
+# Regner ut de samme buy/sell-tallene som Fuzzwork sitt aggregat-endepunkt
+# (max, min, volum, antall ordrer, vektet snitt, standardavvik, median og
+# 5%-persentil) direkte fra ESI-ordrer, slik at en hel stasjons pristabell
+# kan lages fra ett regionalt ordrebok-snapshot.
+from collections import defaultdict
+
+from fuzzwork import PRICE_FIELDS
+
+# Andel av volumet (beste priser først) som inngår i 'percentile'
+PERCENTILE_SHARE = 0.05
+
+def _empty_side():
+    side = dict.fromkeys(PRICE_FIELDS, 0.0)
+    side['orderCount'] = 0
+    return side
+
+def _side_stats(prices, volumes):
+    """
+    Statistikk for én side av markedet. prices/volumes er sortert med beste
+    pris først (høyeste for kjøp, laveste for salg). Median og persentil er
+    volumvektet, som hos Fuzzwork.
+    """
+    total_volume = sum(volumes)
+    if total_volume <= 0:
+        side = _empty_side()
+        side['orderCount'] = len(prices)
+        return side
+
+    # Snitt, varians, median og persentil i én gjennomgang av ordrene
+    weighted_sum = squared_sum = 0.0
+    median = prices[-1]
+    percentile_target = total_volume * PERCENTILE_SHARE
+    percentile_sum = percentile_volume = 0.0
+    cumulative = 0
+    median_found = False
+    for price, volume in zip(prices, volumes):
+        weighted_sum += price * volume
+        squared_sum += price * price * volume
+        if percentile_volume < percentile_target:
+            take = min(volume, percentile_target - percentile_volume)
+            percentile_sum += price * take
+            percentile_volume += take
+        cumulative += volume
+        if not median_found and cumulative * 2 >= total_volume:
+            median, median_found = price, True
+    weighted_average = weighted_sum / total_volume
+    # Avrundingsfeil kan gi en svært liten negativ varians når alle prisene er like
+    variance = max(squared_sum / total_volume - weighted_average ** 2, 0.0)
+
+    return {
+        'weightedAverage': weighted_average,
+        'max': float(max(prices[0], prices[-1])),
+        'min': float(min(prices[0], prices[-1])),
+        'stddev': variance ** 0.5,
+        'median': float(median),
+        'volume': float(total_volume),
+        'orderCount': len(prices),
+        'percentile': percentile_sum / percentile_volume if percentile_volume else 0.0,
+    }
+
+def aggregate_orders(orders):
+    """
+    Lager en Fuzzwork-lik pristabell {typeID: {'buy': {...}, 'sell': {...}}}
+    for alle varer i ordrelisten i én gjennomgang. Ordrene bør allerede være
+    filtrert til én stasjon.
+    """
+    buy_sides = defaultdict(list)
+    sell_sides = defaultdict(list)
+    for order in orders:
+        (buy_sides if order['is_buy_order'] else sell_sides)[order['type_id']].append((order['price'], order['volume_remain']))
+
+    table = {}
+    for type_id in buy_sides.keys() | sell_sides.keys():
+        sides = {}
+        for side_name, side_orders, best_first_high in (('buy', buy_sides.get(type_id), True), ('sell', sell_sides.get(type_id), False)):
+            if not side_orders:
+                sides[side_name] = _empty_side()
+                continue
+            side_orders.sort(reverse=best_first_high)
+            prices, volumes = zip(*side_orders)
+            sides[side_name] = _side_stats(prices, volumes)
+        table[type_id] = sides
+    return table
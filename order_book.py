@@ -0,0 +1,131 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - REGIONALE ORDREBOK-SNAPSHOTS
+# ==============================================================================
+# Én paginert nedlasting av /markets/{region}/orders/ er langt billigere enn
+# hundrevis av enkeltoppslag per vare. Snapshotet holdes i minnet til ESI sin
+# 'Expires'-tid og deles av skannere, analyse og detaljvinduet. Utløpte
+# snapshots kastes, og maks config.ORDER_BOOK_MAX_SNAPSHOTS holdes i minnet.
+import threading
+import time
+from collections import defaultdict, OrderedDict
+
+import api
+import config
+import market_stats
+
+_SNAPSHOTS = OrderedDict()
+_SNAPSHOTS_LOCK = threading.Lock()
+_REGION_LOCKS = defaultdict(threading.Lock)
+_REGION_LOCKS_GUARD = threading.Lock()
+
+# Feltene fra ordrene som skannerne, analysen, detaljvinduet og market_stats bruker
+ORDER_BOOK_FIELDS = ('type_id', 'price', 'volume_remain', 'is_buy_order', 'location_id', 'system_id')
+
+# Et ufullstendig snapshot beholdes bare kort, slik at neste skann prøver på nytt
+INCOMPLETE_SNAPSHOT_TTL = 60
+
+class RegionOrderBook:
+    """Ordrebok for én region, indeksert på type_id og (type_id, location_id)."""
+    def __init__(self, region_id, orders, is_complete, expires):
+        self.region_id = region_id
+        self.is_complete = is_complete
+        self.expires = expires if is_complete else min(expires, time.time() + INCOMPLETE_SNAPSHOT_TTL)
+        self.order_count = len(orders)
+        self._by_type = defaultdict(list)
+        self._by_type_location = defaultdict(list)
+        self._by_location = defaultdict(list)
+        self._price_tables = {}
+        self._price_tables_lock = threading.Lock()
+        for order in orders:
+            self._by_type[order['type_id']].append(order)
+            self._by_type_location[(order['type_id'], order['location_id'])].append(order)
+            self._by_location[order['location_id']].append(order)
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def orders_for_type(self, type_id):
+        """
+        Samme ordrer som api.fetch_market_orders(region_id, type_id), med
+        feltene i ORDER_BOOK_FIELDS.
+        Mangler det sider i snapshotet, hentes varen direkte fra ESI.
+        """
+        if not self.is_complete:
+            return api.fetch_market_orders(self.region_id, type_id)
+        return self._by_type.get(type_id, [])
+
+    def station_orders(self, type_id, location_id, is_buy_order):
+        """Alle kjøps- eller salgsordrer for en vare på én stasjon."""
+        if not self.is_complete:
+            return [o for o in (self.orders_for_type(type_id) or [])
+                    if o['location_id'] == location_id and o['is_buy_order'] == is_buy_order]
+        return [o for o in self._by_type_location.get((type_id, location_id), []) if o['is_buy_order'] == is_buy_order]
+
+    def best_sell_order(self, type_id, location_id):
+        return min(self.station_orders(type_id, location_id, False), key=lambda x: x['price'], default=None)
+
+    def best_buy_order(self, type_id, location_id):
+        return max(self.station_orders(type_id, location_id, True), key=lambda x: x['price'], default=None)
+
+    def station_price_table(self, location_id):
+        """
+        Fuzzwork-lik pristabell {typeID: {'buy': {...}, 'sell': {...}}} for
+        alle varer på én stasjon. Regnes ut én gang per snapshot.
+        """
+        with self._price_tables_lock:
+            if location_id not in self._price_tables:
+                self._price_tables[location_id] = market_stats.aggregate_orders(self._by_location.get(location_id, []))
+            return self._price_tables[location_id]
+
+def _region_lock(region_id):
+    with _REGION_LOCKS_GUARD:
+        return _REGION_LOCKS[region_id]
+
+def _evict_expired():
+    """Fjerner utløpte snapshots, slik at ordrebøker for regioner som ikke skannes lenger frigjøres."""
+    for region_id in [r for r, snapshot in _SNAPSHOTS.items() if not snapshot.is_fresh()]:
+        del _SNAPSHOTS[region_id]
+
+def get_cached_snapshot(region_id):
+    """Returnerer et ferskt snapshot hvis det allerede ligger i minnet, ellers None."""
+    with _SNAPSHOTS_LOCK:
+        _evict_expired()
+        snapshot = _SNAPSHOTS.get(region_id)
+        if snapshot:
+            _SNAPSHOTS.move_to_end(region_id)
+        return snapshot
+
+def get_region_snapshot(region_id):
+    """
+    Returnerer et ferskt snapshot av regionens ordrebok, og laster det ned ved
+    behov. Samtidige kall for samme region venter på én og samme nedlasting.
+    """
+    snapshot = get_cached_snapshot(region_id)
+    if snapshot:
+        return snapshot
+
+    with _region_lock(region_id):
+        snapshot = get_cached_snapshot(region_id)
+        if snapshot:
+            return snapshot
+        orders, is_complete, expires = api.fetch_region_orders(region_id, fields=ORDER_BOOK_FIELDS)
+        if not orders:
+            return None
+        snapshot = RegionOrderBook(region_id, orders, is_complete, expires)
+        with _SNAPSHOTS_LOCK:
+            _SNAPSHOTS[region_id] = snapshot
+            while len(_SNAPSHOTS) > config.ORDER_BOOK_MAX_SNAPSHOTS:
+                _SNAPSHOTS.popitem(last=False)
+        print(f"Ordrebok for region {region_id} lastet: {snapshot.order_count} ordrer{'' if is_complete else ' (ufullstendig)'}.")
+        return snapshot
+
+def get_type_orders(region_id, type_id):
+    """
+    Ordrer for én vare i en region. Besvares fra et ferskt snapshot hvis det
+    finnes i minnet; ellers gjøres ett enkelt oppslag i stedet for å laste ned
+    hele regionen for en enkelt vare.
+    """
+    snapshot = get_cached_snapshot(region_id)
+    if snapshot:
+        return snapshot.orders_for_type(type_id)
+    return api.fetch_market_orders(region_id, type_id)
@@ -0,0 +1,98 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - RATE-GOVERNOR (ESI error limit)
+# ==============================================================================
+import threading
+import time
+
+class RateGovernor:
+    """
+    Prosessomfattende token bucket som deles av alle tråder mot én vert.
+    Raten økes gradvis så lenge ESI har god margin, og strupes eller pauses
+    når X-ESI-Error-Limit-Remain blir lav eller ESI svarer 420/429/5xx.
+    """
+    def __init__(self, name, rate, min_rate, max_rate, burst,
+                 increase_step=1.0, low_error_remain=20, critical_error_remain=10):
+        self.name = name
+        self._rate = float(rate)
+        self._min_rate = float(min_rate)
+        self._max_rate = float(max_rate)
+        self._burst = float(burst)
+        self._increase_step = increase_step
+        self._low_error_remain = low_error_remain
+        self._critical_error_remain = critical_error_remain
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def _refill(self, now):
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Blokkerer til det er lov å sende et nytt kall."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def _pause(self, seconds):
+        # Kalles med låsen holdt
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    def observe(self, status_code, headers):
+        """Justerer raten ut fra statuskode og ESI sine error limit-headere."""
+        remain = _int_header(headers, 'X-ESI-Error-Limit-Remain')
+        reset = _int_header(headers, 'X-ESI-Error-Limit-Reset')
+        retry_after = _int_header(headers, 'Retry-After')
+
+        with self._lock:
+            if status_code == 420:
+                # Appen er allerede utestengt: vent til vinduet nullstilles
+                self._rate = self._min_rate
+                self._pause(reset if reset is not None else 60)
+                print(f"[{self.name}] Error limit nådd, pauser i {reset if reset is not None else 60} sekunder.")
+                return
+            if status_code == 429:
+                self._rate = max(self._min_rate, self._rate / 2)
+                self._pause(retry_after if retry_after is not None else 5)
+                return
+            if status_code >= 500:
+                self._rate = max(self._min_rate, self._rate * 0.7)
+
+            if remain is not None:
+                if remain <= self._critical_error_remain:
+                    self._rate = self._min_rate
+                    self._pause(reset if reset is not None else 60)
+                    return
+                if remain <= self._low_error_remain:
+                    self._rate = max(self._min_rate, self._rate / 2)
+                    return
+
+            if status_code < 400:
+                self._rate = min(self._max_rate, self._rate + self._increase_step)
+
+    def observe_failure(self):
+        """Tidsavbrudd og tilkoblingsfeil: trekk raten litt ned."""
+        with self._lock:
+            self._rate = max(self._min_rate, self._rate * 0.8)
+
+def _int_header(headers, name):
+    try:
+        value = headers.get(name)
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
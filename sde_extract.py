@@ -0,0 +1,351 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - BINÆRT SDE-UTTREKK
+# ==============================================================================
+# Appen bruker bare en håndfull tabeller fra den store SDE-filen. De samles
+# her i én kompakt binærfil (kolonner som arrays + strengtabeller) ved siden
+# av databasen. Filen minnemappes ved oppstart, så oppslag går rett mot
+# kolonnene uten SQLite. Uttrekket bygges på nytt når SDE-filen endres
+# (endret størrelse/mtime og annet innhold).
+#
+#   python sde_extract.py [sde.sqlite.db] [sde_extract.bin]
+import array
+import bisect
+import hashlib
+import json
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+
+MAGIC = b'EVESDEX1'
+FORMAT_VERSION = 2
+HEADER_SIZE = 8192          # Fast størrelse, slik at kildeinfo kan oppdateres på stedet
+_HEADER_LENGTH = struct.Struct('<I')
+ALIGNMENT = 8
+MISSING_ID = -1             # NULL i heltallskolonner (f.eks. marketGroupID)
+HASH_BLOCK_SIZE = 1024 * 1024
+MANUFACTURING_ACTIVITY = 1
+
+# --- KILDEINFO ---
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def source_info(path, with_hash=True):
+    stat = os.stat(path)
+    info = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        info['sha256'] = file_hash(path)
+    return info
+
+# --- BYGGING ---
+class _Writer:
+    """Samler seksjoner (array-kolonner) og skriver dem etter en fast header."""
+    def __init__(self):
+        self.sections = {}
+        self.chunks = []
+        self.offset = HEADER_SIZE
+
+    def add_array(self, name, typecode, values):
+        data = array.array(typecode, values).tobytes()
+        self.sections[name] = {'offset': self.offset, 'typecode': typecode, 'count': len(data) // array.array(typecode).itemsize}
+        padding = -len(data) % ALIGNMENT
+        self.chunks.append(data + b'\0' * padding)
+        self.offset += len(data) + padding
+
+    def add_strings(self, name, strings):
+        """Strengtabell: UTF-8-blob + offset-kolonne med len(strings) + 1 verdier."""
+        blob = bytearray()
+        offsets = [0]
+        for text in strings:
+            blob += (text or '').encode('utf-8')
+            offsets.append(len(blob))
+        self.add_array(f"{name}.offsets", 'Q', offsets)
+        self.add_array(f"{name}.blob", 'B', blob)
+
+    def write(self, path, source):
+        header = json.dumps({'version': FORMAT_VERSION, 'source': source, 'sections': self.sections}).encode('utf-8')
+        if len(MAGIC) + _HEADER_LENGTH.size + len(header) > HEADER_SIZE:
+            raise ValueError("SDE-uttrekket har for mange seksjoner for headeren")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+            f.write(b'\0' * (HEADER_SIZE - f.tell()))
+            for chunk in self.chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+def _columns(rows, count):
+    return [list(column) for column in zip(*rows)] if rows else [[] for _ in range(count)]
+
+def build_extract(sde_path, extract_path, source=None):
+    """Leser tabellene appen trenger fra SDE og skriver uttrekket til extract_path."""
+    conn = sqlite3.connect(f'file:{sde_path}?mode=ro', uri=True)
+    try:
+        writer = _Writer()
+        try:
+            conn.execute("SELECT 1 FROM invVolumes LIMIT 1")
+            volume_join, packaged_column = "LEFT JOIN invVolumes AS v ON v.typeID = t.typeID", "v.volume"
+        except sqlite3.OperationalError:
+            volume_join, packaged_column = "", "NULL"
+        rows = conn.execute(f"""
+            SELECT t.typeID, t.typeName, t.volume, {packaged_column}, t.groupID, t.marketGroupID, t.published
+            FROM invTypes AS t {volume_join} ORDER BY t.typeID
+        """).fetchall()
+        type_ids, names, volumes, packaged, group_ids, market_group_ids, published = _columns(rows, 7)
+        writer.add_array('types.id', 'i', type_ids)
+        writer.add_strings('types.name', names)
+        writer.add_array('types.volume', 'd', [v or 0.0 for v in volumes])
+        writer.add_array('types.packaged_volume', 'd', [math.nan if v is None else v for v in packaged])
+        writer.add_array('types.group_id', 'i', [MISSING_ID if v is None else v for v in group_ids])
+        writer.add_array('types.market_group_id', 'i', [MISSING_ID if v is None else v for v in market_group_ids])
+        writer.add_array('types.published', 'b', [1 if v else 0 for v in published])
+
+        rows = conn.execute("SELECT regionID, regionName FROM mapRegions ORDER BY regionID").fetchall()
+        region_ids, region_names = _columns(rows, 2)
+        writer.add_array('regions.id', 'i', region_ids)
+        writer.add_strings('regions.name', region_names)
+
+        rows = conn.execute("SELECT constellationID, constellationName, regionID FROM mapConstellations ORDER BY constellationID").fetchall()
+        ids, c_names, c_regions = _columns(rows, 3)
+        writer.add_array('constellations.id', 'i', ids)
+        writer.add_strings('constellations.name', c_names)
+        writer.add_array('constellations.region_id', 'i', c_regions)
+
+        rows = conn.execute("""
+            SELECT solarSystemID, solarSystemName, regionID, constellationID, security, ROUND(security, 1)
+            FROM mapSolarSystems ORDER BY solarSystemID
+        """).fetchall()
+        ids, s_names, s_regions, s_constellations, security, security_rounded = _columns(rows, 6)
+        writer.add_array('systems.id', 'i', ids)
+        writer.add_strings('systems.name', s_names)
+        writer.add_array('systems.region_id', 'i', s_regions)
+        writer.add_array('systems.constellation_id', 'i', s_constellations)
+        writer.add_array('systems.security', 'd', security)
+        writer.add_array('systems.security_rounded', 'd', security_rounded)
+
+        rows = conn.execute("SELECT stationID, stationName, solarSystemID, regionID FROM staStations ORDER BY stationID").fetchall()
+        ids, st_names, st_systems, st_regions = _columns(rows, 4)
+        writer.add_array('stations.id', 'i', ids)
+        writer.add_strings('stations.name', st_names)
+        writer.add_array('stations.system_id', 'i', st_systems)
+        writer.add_array('stations.region_id', 'i', st_regions)
+
+        rows = conn.execute("SELECT fromSolarSystemID, toSolarSystemID FROM mapSolarSystemJumps ORDER BY fromSolarSystemID, toSolarSystemID").fetchall()
+        jumps_from, jumps_to = _columns(rows, 2)
+        writer.add_array('jumps.from', 'i', jumps_from)
+        writer.add_array('jumps.to', 'i', jumps_to)
+
+        # Produksjonsoppskrifter i SDE-rekkefølge (første blueprint per produkt vinner, som i db.py)
+        for table, columns in (('industryActivity', ('typeID', 'time')),
+                               ('industryActivityMaterials', ('typeID', 'materialTypeID', 'quantity')),
+                               ('industryActivityProducts', ('typeID', 'productTypeID', 'quantity'))):
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE activityID=?", (MANUFACTURING_ACTIVITY,)).fetchall()
+            for column, values in zip(columns, _columns(rows, len(columns))):
+                writer.add_array(f"{table}.{column}", 'i', values)
+    finally:
+        conn.close()
+    writer.write(extract_path, source or source_info(sde_path))
+
+# --- LESING ---
+class _Strings:
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+def read_header(path):
+    """Leser headeren uten å mappe filen. Returnerer None hvis filen mangler eller har feil format."""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER_SIZE)
+    except OSError:
+        return None
+    if len(raw) < HEADER_SIZE or not raw.startswith(MAGIC):
+        return None
+    (length,) = _HEADER_LENGTH.unpack_from(raw, len(MAGIC))
+    start = len(MAGIC) + _HEADER_LENGTH.size
+    try:
+        header = json.loads(raw[start:start + length])
+    except ValueError:
+        return None
+    return header if header.get('version') == FORMAT_VERSION else None
+
+def _rewrite_source(path, header, source):
+    """Oppdaterer kildeinfo i headeren (samme innhold, ny mtime) uten å bygge på nytt."""
+    header = dict(header, source=source)
+    encoded = json.dumps(header).encode('utf-8')
+    if len(MAGIC) + _HEADER_LENGTH.size + len(encoded) > HEADER_SIZE:
+        return False
+    with open(path, 'r+b') as f:
+        f.write(MAGIC + _HEADER_LENGTH.pack(len(encoded)) + encoded)
+        f.write(b'\0' * (HEADER_SIZE - f.tell()))
+    return True
+
+class SdeExtract:
+    """Skrivebeskyttet, minnemappet SDE-uttrekk. Trygt å lese fra flere tråder."""
+    def __init__(self, path):
+        header = read_header(path)
+        if header is None:
+            raise ValueError(f"{path} er ikke et gyldig SDE-uttrekk")
+        self.path = path
+        self.source = header['source']
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        self._columns = {}
+        for name, section in header['sections'].items():
+            itemsize = array.array(section['typecode']).itemsize
+            start = section['offset']
+            self._columns[name] = view[start:start + section['count'] * itemsize].cast(section['typecode'])
+        self._lock = threading.Lock()
+        self._system_ids_by_name = None
+
+    def column(self, name):
+        return self._columns[name]
+
+    def strings(self, name):
+        return _Strings(self._columns[f"{name}.offsets"], self._columns[f"{name}.blob"])
+
+    def _row(self, table, row_id):
+        """Radnummeret for row_id i en tabell sortert på ID, eller None."""
+        ids = self._columns[f"{table}.id"]
+        index = bisect.bisect_left(ids, row_id)
+        return index if index < len(ids) and ids[index] == row_id else None
+
+    # --- Varer ---
+    def type_name(self, type_id):
+        row = self._row('types', type_id)
+        return self.strings('types.name')[row] if row is not None else None
+
+    def type_published(self, type_id):
+        row = self._row('types', type_id)
+        return row is not None and bool(self._columns['types.published'][row])
+
+    def type_attributes(self, type_ids):
+        """Samme format som db.get_type_attributes_bulk."""
+        names = self.strings('types.name')
+        volumes = self._columns['types.volume']
+        packaged = self._columns['types.packaged_volume']
+        groups = self._columns['types.group_id']
+        market_groups = self._columns['types.market_group_id']
+        attributes = {}
+        for type_id in set(type_ids):
+            row = self._row('types', type_id)
+            if row is None:
+                continue
+            packaged_volume = packaged[row]
+            attributes[type_id] = {
+                'type_id': type_id, 'name': names[row], 'volume': volumes[row],
+                'packaged_volume': volumes[row] if math.isnan(packaged_volume) else packaged_volume,
+                'group_id': None if groups[row] == MISSING_ID else groups[row],
+                'market_group_id': None if market_groups[row] == MISSING_ID else market_groups[row]
+            }
+        return attributes
+
+    # --- Kart ---
+    def station_names(self, station_ids):
+        names = self.strings('stations.name')
+        result = {}
+        for station_id in set(station_ids):
+            row = self._row('stations', station_id)
+            if row is not None:
+                result[station_id] = names[row]
+        return result
+
+    def system_name(self, system_id):
+        row = self._row('systems', system_id)
+        return self.strings('systems.name')[row] if row is not None else None
+
+    def region_for_system(self, system_id):
+        row = self._row('systems', system_id)
+        return self._columns['systems.region_id'][row] if row is not None else None
+
+    def system_id(self, system_name):
+        """Som 'solarSystemName LIKE ?' uten jokertegn: navnet uten hensyn til store/små bokstaver."""
+        if self._system_ids_by_name is None:
+            with self._lock:
+                if self._system_ids_by_name is None:
+                    names = self.strings('systems.name')
+                    ids = self._columns['systems.id']
+                    self._system_ids_by_name = {names[i].lower(): ids[i] for i in range(len(ids))}
+        return self._system_ids_by_name.get(system_name.lower())
+
+    def security_statuses(self):
+        return dict(zip(self._columns['systems.id'], self._columns['systems.security_rounded']))
+
+    def universe_tables(self):
+        """Samme radlister som db.get_universe_tables."""
+        c = self._columns
+        return {
+            'regions': list(zip(c['regions.id'], self.strings('regions.name'))),
+            'constellations': list(zip(c['constellations.id'], self.strings('constellations.name'), c['constellations.region_id'])),
+            'systems': list(zip(c['systems.id'], self.strings('systems.name'), c['systems.region_id'],
+                                c['systems.constellation_id'], c['systems.security'], c['systems.security_rounded'])),
+            'stations': list(zip(c['stations.id'], self.strings('stations.name'), c['stations.system_id'], c['stations.region_id'])),
+        }
+
+    def system_jumps(self):
+        """Stargate-forbindelser som (fraSystemID, tilSystemID), som db.get_system_jumps."""
+        return list(zip(self._columns['jumps.from'], self._columns['jumps.to']))
+
+    # --- Industri ---
+    def recipe_tables(self):
+        """(tider, materialer, produkter) som db.RecipeIndex tar imot."""
+        c = self._columns
+        times = dict(zip(c['industryActivity.typeID'], c['industryActivity.time']))
+        materials, products = {}, {}
+        for blueprint_id, material_id, quantity in zip(c['industryActivityMaterials.typeID'],
+                                                       c['industryActivityMaterials.materialTypeID'],
+                                                       c['industryActivityMaterials.quantity']):
+            materials.setdefault(blueprint_id, []).append((material_id, quantity))
+        for blueprint_id, product_id, quantity in zip(c['industryActivityProducts.typeID'],
+                                                      c['industryActivityProducts.productTypeID'],
+                                                      c['industryActivityProducts.quantity']):
+            products.setdefault(blueprint_id, []).append((product_id, quantity))
+        return times, materials, products
+
+    def manufacturable_pairs(self, published_only=False):
+        """Unike (produktID, blueprintID) for alle produksjonsoppskrifter."""
+        pairs = set(zip(self._columns['industryActivityProducts.productTypeID'], self._columns['industryActivityProducts.typeID']))
+        if published_only:
+            pairs = {(product_id, blueprint_id) for product_id, blueprint_id in pairs if self.type_published(blueprint_id)}
+        return list(pairs)
+
+def load_or_build(sde_path, extract_path):
+    """
+    Åpner uttrekket, og bygger det først hvis det mangler eller er utdatert.
+    Størrelse og mtime sjekkes ved hver oppstart; bare når de er endret
+    leses hele SDE-filen for å sammenligne innholdshash.
+    """
+    header = read_header(extract_path)
+    current = source_info(sde_path, with_hash=False)
+    if header:
+        recorded = header['source']
+        if recorded.get('size') == current['size'] and recorded.get('mtime_ns') == current['mtime_ns']:
+            return SdeExtract(extract_path)
+        current['sha256'] = file_hash(sde_path)
+        if recorded.get('sha256') == current['sha256'] and _rewrite_source(extract_path, header, current):
+            return SdeExtract(extract_path)
+    print(f"Bygger SDE-uttrekk {extract_path} fra {sde_path}...")
+    if 'sha256' not in current:
+        current['sha256'] = file_hash(sde_path)
+    build_extract(sde_path, extract_path, current)
+    return SdeExtract(extract_path)
+
+if __name__ == '__main__':
+    sde_file = sys.argv[1] if len(sys.argv) > 1 else 'sde.sqlite.db'
+    extract_file = sys.argv[2] if len(sys.argv) > 2 else 'sde_extract.bin'
+    build_extract(sde_file, extract_file)
+    print(f"Vellykket! SDE-uttrekket er lagret i {extract_file} ({os.path.getsize(extract_file) / (1024 * 1024):.1f} MB)")
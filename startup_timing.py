@@ -0,0 +1,63 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - OPPSTARTSTID
+# ==============================================================================
+# Måler tiden fra programstart til viktige punkter i oppstarten (importer
+# ferdig, vinduet opprettet, første vindu tegnet, varelisten lastet i
+# bakgrunnen). Hver oppstart legges til i en JSON-fil, slik at tiden til
+# første vindu kan følges over tid. main.py importerer modulen før alt annet,
+# og den importerer derfor ikke config.
+import json
+import os
+import threading
+import time
+
+_PROCESS_START = time.perf_counter()
+DEFAULT_HISTORY_LENGTH = 50     # Antall oppstarter som beholdes i rapportfilen
+
+class StartupTimer:
+    """Tidsmerker (sekunder siden start) for én oppstart. Merker kan settes fra flere tråder."""
+    def __init__(self, start=None):
+        self.start = _PROCESS_START if start is None else start
+        self.started_at = time.time() - (time.perf_counter() - self.start)
+        self.marks = []
+        self._lock = threading.Lock()
+
+    def mark(self, label):
+        """Setter et tidsmerke og returnerer tiden siden start."""
+        elapsed = time.perf_counter() - self.start
+        with self._lock:
+            self.marks.append((label, elapsed))
+        return elapsed
+
+    def elapsed(self, label):
+        with self._lock:
+            return next((seconds for name, seconds in self.marks if name == label), None)
+
+    def snapshot(self):
+        with self._lock:
+            marks = {label: round(seconds * 1000, 1) for label, seconds in self.marks}
+        return {'started_at': round(self.started_at, 3), 'marks_ms': marks}
+
+    def report(self, path=None, history_length=DEFAULT_HISTORY_LENGTH):
+        """Skriver tidsmerkene til konsollen, og legger oppstarten til i path (de siste history_length beholdes)."""
+        snapshot = self.snapshot()
+        print("Oppstartstid: " + ", ".join(f"{label} {ms:.0f} ms" for label, ms in snapshot['marks_ms'].items()))
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+            if not isinstance(history, list):
+                history = []
+        except (OSError, ValueError):
+            history = []
+        history = (history + [snapshot])[-history_length:]
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(history, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Kunne ikke skrive oppstartstid til {path}: {e}")
+
+STARTUP = StartupTimer()
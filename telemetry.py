@@ -0,0 +1,149 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - HTTP-TELEMETRI
+# ==============================================================================
+# Teller alle HTTP-kall per endepunktmal (ID-er i stien erstattes med {id}):
+# antall, statuskoder, responstid som histogram, mottatte bytes, nye forsøk,
+# 304-svar og cache-treff. Tallene vises live i innstillingsfanen og skrives
+# til en JSON-fil når programmet avsluttes.
+import atexit
+import json
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import config
+
+# Øvre grenser (sekunder) for responstid-histogrammet; siste bøtte er "mer enn"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_ID_SEGMENT = re.compile(r'^\d+$')
+
+def endpoint_template(url):
+    """'https://esi.evetech.net/latest/markets/10000002/orders/?...' -> 'esi.evetech.net/latest/markets/{id}/orders/'"""
+    parts = urlsplit(url)
+    path = '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split('/'))
+    return f"{parts.netloc}{path}"
+
+def _bucket_label(index):
+    return f"<={LATENCY_BUCKETS[index]}s" if index < len(LATENCY_BUCKETS) else f">{LATENCY_BUCKETS[-1]}s"
+
+class _EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.status = {}
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.not_modified = 0
+        self.cache_hits = 0
+        self.shared = 0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'status': dict(sorted(self.status.items())),
+            'avg_time': self.total_time / self.requests if self.requests else 0.0,
+            'max_time': self.max_time,
+            'latency': {_bucket_label(i): count for i, count in enumerate(self.latency)},
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'gave_up': self.gave_up,
+            'not_modified': self.not_modified,
+            'cache_hits': self.cache_hits,
+            'shared': self.shared,
+        }
+
+class Telemetry:
+    """Trådsikker samling av HTTP-statistikk per endepunktmal."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started = time.time()
+
+    def _stats(self, url):
+        template = endpoint_template(url)
+        stats = self._endpoints.get(template)
+        if stats is None:
+            stats = self._endpoints[template] = _EndpointStats()
+        return stats
+
+    def record_request(self, url, elapsed, status=None, nbytes=0):
+        """Ett faktisk HTTP-kall. status=None betyr nettverksfeil (tidsavbrudd, brudd osv.)."""
+        bucket = next((i for i, limit in enumerate(LATENCY_BUCKETS) if elapsed <= limit), len(LATENCY_BUCKETS))
+        with self._lock:
+            stats = self._stats(url)
+            stats.requests += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.latency[bucket] += 1
+            stats.bytes += nbytes
+            if status is None:
+                stats.errors += 1
+                return
+            stats.status[status] = stats.status.get(status, 0) + 1
+            if status == 304:
+                stats.not_modified += 1
+
+    def _count(self, url, field):
+        with self._lock:
+            stats = self._stats(url)
+            setattr(stats, field, getattr(stats, field) + 1)
+
+    def record_cache_hit(self, url):
+        """Svaret kom fra den lokale svar-cachen uten nettverkskall."""
+        self._count(url, 'cache_hits')
+
+    def record_retry(self, url):
+        self._count(url, 'retries')
+
+    def record_give_up(self, url):
+        self._count(url, 'gave_up')
+
+    def record_shared(self, url):
+        """Kallet ble slått sammen med et likt kall som allerede pågikk."""
+        self._count(url, 'shared')
+
+    def register_source(self, name, func):
+        """Legger til ekstra tall i rapporten, f.eks. governor-rate eller cache-statistikk."""
+        self._sources[name] = func
+
+    def snapshot(self):
+        """Alle tall som en ordbok, sortert med de tregeste endepunktene (total tid) først."""
+        with self._lock:
+            ordered = sorted(self._endpoints.items(), key=lambda item: item[1].total_time, reverse=True)
+            endpoints = {template: stats.to_dict() for template, stats in ordered}
+            started = self.started
+        extra = {}
+        for name, func in list(self._sources.items()):
+            try:
+                extra[name] = func()
+            except Exception as e:
+                extra[name] = f"Feil: {e}"
+        return {'since': started, 'uptime': time.time() - started, 'endpoints': endpoints, 'sources': extra}
+
+    def dump(self, path=None):
+        """Skriver snapshot() til JSON-fil (config.TELEMETRY_FILE som standard)."""
+        path = path or config.TELEMETRY_FILE
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, indent=2, ensure_ascii=False, default=str)
+        except (OSError, TypeError) as e:
+            print(f"Kunne ikke skrive telemetri til {path}: {e}")
+
+TELEMETRY = Telemetry()
+
+def _dump_at_exit():
+    if config.TELEMETRY_DUMP_AT_EXIT:
+        TELEMETRY.dump()
+
+atexit.register(_dump_at_exit)
@@ -1,12 +1,10 @@
 import tkinter
 import customtkinter as ctk
 from tkinter import ttk
-from PIL import Image
 import threading
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import api
+import history_store
+import order_book
 
 class ItemDetailWindow(ctk.CTkToplevel):
     def __init__(self, master, item_name, type_id, buy_station_info, sell_station_info):
@@ -22,8 +20,6 @@ class ItemDetailWindow(ctk.CTkToplevel):
         self.buy_station_info = buy_station_info
         self.sell_station_info = sell_station_info
 
-        plt.style.use('dark_background')
-
         self._create_widgets()
         threading.Thread(target=self._fetch_and_display_data, daemon=True).start()
 
@@ -59,12 +55,12 @@ class ItemDetailWindow(ctk.CTkToplevel):
         ctk.CTkLabel(self.graph_frame, text="Henter historikk...").pack(pady=20)
 
     def _fetch_and_display_data(self):
-        buy_region_orders = api.fetch_market_orders(self.buy_station_info['region_id'], self.type_id)
-        sell_region_orders = api.fetch_market_orders(self.sell_station_info['region_id'], self.type_id)
+        buy_region_orders = order_book.get_type_orders(self.buy_station_info['region_id'], self.type_id)
+        sell_region_orders = order_book.get_type_orders(self.sell_station_info['region_id'], self.type_id)
         self.after(0, self._populate_order_trees, buy_region_orders, sell_region_orders)
 
-        buy_history = api.fetch_esi_history(self.buy_station_info['region_id'], self.type_id)
-        sell_history = api.fetch_esi_history(self.sell_station_info['region_id'], self.type_id)
+        buy_history = history_store.get_history(self.buy_station_info['region_id'], self.type_id)
+        sell_history = history_store.get_history(self.sell_station_info['region_id'], self.type_id)
         self.after(0, self._create_history_graphs, buy_history, sell_history)
 
     def _populate_order_trees(self, buy_region_orders, sell_region_orders):
@@ -82,6 +78,11 @@ class ItemDetailWindow(ctk.CTkToplevel):
                 self.sell_orders_tree.insert("", "end", values=(f"{order['price']:,.2f}", f"{order['volume_remain']:,}"))
 
     def _create_history_graphs(self, buy_history, sell_history):
+        # matplotlib er tregt å importere; lastes først når en graf skal tegnes
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        plt.style.use('dark_background')
+
         for widget in self.graph_frame.winfo_children():
             widget.destroy()
 
@@ -1,10 +1,8 @@
 import tkinter
 import customtkinter as ctk
 from tkinter import ttk, messagebox, TclError
-from PIL import Image
 import threading
 import io
-import time
 from datetime import datetime, timedelta, timezone
 import requests
 from collections import defaultdict, deque
@@ -15,6 +13,11 @@ import config
 import api
 import auth  # Importerer den oppdaterte auth-modulen med AuthManager
 import db
+import history_store
+import market_prices
+import universe
+from startup_timing import STARTUP
+from telemetry import TELEMETRY, LATENCY_BUCKETS
 from logic import calculations, scanners
 from ui.tabs import (
     character, assets, manufacturing, bpo_scanner, analyse,
@@ -44,22 +47,66 @@ class EveMarketApp(ctk.CTk):
         self.all_system_names = []
         self.active_suggestion_entry = None
         self.current_main_frame = None
+        self.items_loaded = threading.Event()
+        self.startup_failed = False
+        self._startup_pending = {"første vindu", "varer lastet"}
+        TELEMETRY.register_source('startup', STARTUP.snapshot)
 
         self._initialize_variables()
         self._create_widgets()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # Start-oppgaver
+        threading.Thread(target=self._load_items_in_background, daemon=True).start()
+        threading.Thread(target=api.warm_up_connections, daemon=True).start()
         self.load_all_regions()
         threading.Thread(target=self.populate_industry_systems, daemon=True).start()
         self.after(500, self.initial_auth_check)
         self.show_frame("character")
+        STARTUP.mark("vindu opprettet")
+        # Idle-kall kjøres etter at Tk har tegnet vinduet første gang
+        self.after_idle(self._on_first_window)
+
+    # --- Oppstart ---
+    def _load_items_in_background(self):
+        """Leser varelisten (stor JSON-fil) mens vinduet vises, og varmer deretter opp vare-attributtene."""
+        if not config.load_items_from_file(show_error=False):
+            self.after(0, self._on_items_failed)
+            return
+        STARTUP.mark("varer lastet")
+        self.after(0, self._on_items_loaded)
+        api.preload_type_attributes(list(config.ITEM_NAME_TO_ID.values()))
+
+    def _on_items_loaded(self):
+        self.items_loaded.set()
+        self._finish_startup_step("varer lastet")
+
+    def _on_items_failed(self):
+        messagebox.showerror("Kritisk Feil", config.ITEMS_FILE_ERROR.format(config.ITEMS_FILE), parent=self)
+        self.startup_failed = True
+        self.destroy()
+
+    def _on_first_window(self):
+        STARTUP.mark("første vindu")
+        self._finish_startup_step("første vindu")
+
+    def _finish_startup_step(self, step):
+        """Skriver oppstartsrapporten når både vinduet og varelisten er klare."""
+        self._startup_pending.discard(step)
+        if not self._startup_pending:
+            STARTUP.report(config.STARTUP_TIMING_FILE)
 
     def _initialize_variables(self):
         """Initialiserer alle ctk-variabler for UI-elementer."""
         # Generelle innstillinger
         self.sales_tax_var = ctk.StringVar(value=self.settings.get('sales_tax', '8.0'))
         self.brokers_fee_var = ctk.StringVar(value=self.settings.get('brokers_fee', '3.0'))
+        self.price_source_var = ctk.StringVar(value=self.settings.get('price_source', config.PRICE_SOURCE))
+        config.PRICE_SOURCE = self.price_source_var.get()
+        self.price_source_var.trace_add("write", lambda *args: setattr(config, 'PRICE_SOURCE', self.price_source_var.get()))
+        self.route_policy_var = ctk.StringVar(value=self.settings.get('route_policy', config.JUMP_ROUTE_POLICY))
+        config.JUMP_ROUTE_POLICY = self.route_policy_var.get()
+        self.route_policy_var.trace_add("write", lambda *args: setattr(config, 'JUMP_ROUTE_POLICY', self.route_policy_var.get()))
         
         # =====================================================================
         # == REFAKTORERING: ESI-variabler med "trace"
@@ -91,7 +138,7 @@ class EveMarketApp(ctk.CTk):
         self.bpo_min_daily_volume_var = ctk.StringVar(value="100")
         
         for scan_type in ["scanner", "arbitrage", "region", "galaxy"]:
-            defaults = config.load_settings()
+            defaults = self.settings
             setattr(self, f"{scan_type}_buy_station_var", ctk.StringVar(value=defaults.get(f"{scan_type}_buy_station")))
             setattr(self, f"{scan_type}_sell_station_var", ctk.StringVar(value=defaults.get(f"{scan_type}_sell_station")))
             setattr(self, f"{scan_type}_min_profit_var", ctk.StringVar(value=defaults.get(f"{scan_type}_min_profit")))
@@ -113,6 +160,7 @@ class EveMarketApp(ctk.CTk):
         self.price_hunter_hisec_var = ctk.BooleanVar(value=True)
         self.price_hunter_lowsec_var = ctk.BooleanVar(value=False)
         self.price_hunter_nullsec_var = ctk.BooleanVar(value=False)
+        self.price_hunter_origin_var = ctk.StringVar(value=self.settings.get('price_hunter_origin', "Jita"))
 
     def _create_widgets(self):
         """Setter opp hoved-layout og UI-elementer."""
@@ -141,7 +189,7 @@ class EveMarketApp(ctk.CTk):
         self.status_label = ctk.CTkLabel(self, text="Klar", height=24, anchor="w", text_color=("gray60", "gray40"), font=ctk.CTkFont(size=12))
         self.status_label.grid(row=1, column=1, padx=20, pady=(0, 10), sticky="ew")
 
-        # Opprett alle "sidene" (rammene) for de ulike fanene
+        # "Sidene" (rammene) for fanene bygges første gang de vises (se _get_tab_frame)
         self.frames = {}
         self.tab_creators = {
             "character": character.create_tab, "assets": assets.create_tab,
@@ -152,11 +200,6 @@ class EveMarketApp(ctk.CTk):
             "region_scanner": region_scanner.create_tab, "galaxy_scanner": galaxy_scanner.create_tab,
             "price_hunter": price_hunter.create_tab, "settings": settings.create_tab
         }
-        for frame_key, creator_func in self.tab_creators.items():
-            frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
-            self.frames[frame_key] = frame
-            creator_func(frame, self)
-        
         self._create_sidebar()
         self._create_right_click_menu()
 
@@ -203,6 +246,15 @@ class EveMarketApp(ctk.CTk):
         else: 
             self.show_frame("arbitrage")
 
+    def _get_tab_frame(self, frame_key):
+        """Returnerer rammen for en fane, og bygger fanen første gang den trengs."""
+        frame = self.frames.get(frame_key)
+        if frame is None:
+            frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
+            self.frames[frame_key] = frame
+            self.tab_creators[frame_key](frame, self)
+        return frame
+
     def show_frame(self, frame_key):
         if self.current_main_frame:
             self.current_main_frame.grid_forget()
@@ -215,7 +267,7 @@ class EveMarketApp(ctk.CTk):
                  continue
             button.configure(fg_color="transparent" if key != frame_key else ("#3a7ebf", "#1f538d"))
 
-        self.current_main_frame = self.frames[frame_key]
+        self.current_main_frame = self._get_tab_frame(frame_key)
         self.current_main_frame.grid(row=0, column=0, sticky="nsew")
         self.main_content_frame.grid_rowconfigure(0, weight=1)
         self.main_content_frame.grid_columnconfigure(0, weight=1)
@@ -231,8 +283,9 @@ class EveMarketApp(ctk.CTk):
             else:
                 data = [(tree.set(item, col), item) for item in tree.get_children('')]
                 def sort_key(x):
-                    try: return float(str(x[0]).replace(',', '').replace('%', ''))
-                    except (ValueError, AttributeError): return str(x[0])
+                    # Tall først, deretter tekst (f.eks. "-" for ukjent antall hopp)
+                    try: return (0, float(str(x[0]).replace(',', '').replace('%', '')), '')
+                    except (ValueError, AttributeError): return (1, 0.0, str(x[0]))
                 data.sort(key=sort_key, reverse=reverse)
 
             for index, (val, item) in enumerate(data):
@@ -395,6 +448,7 @@ class EveMarketApp(ctk.CTk):
     def _handle_token_refresh(self):
         """Bakgrunnstråd-funksjon for å fornye token og oppdatere UI."""
         if self.auth_manager.refresh_access_token():
+            self.items_loaded.wait()   # Ordrer og eiendeler vises med varenavn fra varelisten
             self.after(0, self.fetch_character_data)
         else:
             # Hvis fornyelse feiler, oppdater UI for å vise "utlogget" status
@@ -408,6 +462,7 @@ class EveMarketApp(ctk.CTk):
 
     def update_ui_for_logout(self):
         """Nullstiller all karakterspesifikk UI til en utlogget tilstand."""
+        self._get_tab_frame("assets")
         self.char_name_label.configure(text="Ikke innlogget")
         self.wallet_label.configure(text="Wallet: N/A")
         self.profit_label.configure(text="Netto handel: N/A", text_color="white")
@@ -439,7 +494,7 @@ class EveMarketApp(ctk.CTk):
         self.char_name_label.configure(text=char_info['name'])
         
         # Hent resten av dataen i bakgrunnstråder for å holde UI responsivt
-        wallet_response = api.fetch_esi_data(f"https://esi.evetech.net/latest/characters/{char_info['id']}/wallet/", token)
+        wallet_response = api.fetch_esi_data(f"{config.ESI_BASE_URL}/latest/characters/{char_info['id']}/wallet/", token)
         if wallet_response:
             self.wallet_balance = float(wallet_response.json())
             self.wallet_label.configure(text=f"Wallet: {self.wallet_balance:,.2f} ISK")
@@ -454,14 +509,15 @@ class EveMarketApp(ctk.CTk):
     def fetch_character_portrait(self):
         char_id = self.auth_manager.character_info.get('id')
         if not char_id: return
-        response = api.fetch_esi_data(f"https://esi.evetech.net/latest/characters/{char_id}/portrait/")
+        response = api.fetch_esi_data(f"{config.ESI_BASE_URL}/latest/characters/{char_id}/portrait/")
         if response and 'px128x128' in response.json():
             threading.Thread(target=self.load_image_from_url, args=(response.json()['px128x128'],), daemon=True).start()
 
     def load_image_from_url(self, url):
         try:
-            response = requests.get(url, timeout=10)
+            response = api.get_session().get(url, timeout=10)
             img_data = response.content
+            from PIL import Image   # Lastes først når portrettet trengs, for raskere oppstart
             pil_image = Image.open(io.BytesIO(img_data))
             ctk_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(128, 128))
             self.after(0, self.update_portrait_image, ctk_image)
@@ -492,14 +548,16 @@ class EveMarketApp(ctk.CTk):
 
         # ... (resten av logikken i denne funksjonen er den samme som før)
         orders = api.fetch_character_orders_paginated(char_id, token)
-        journal = api.fetch_all_pages(f"https://esi.evetech.net/v6/characters/{char_id}/wallet/journal/", token)
-        transactions = api.fetch_all_pages(f"https://esi.evetech.net/v1/characters/{char_id}/wallet/transactions/", token)
+        journal = api.fetch_all_pages(f"{config.ESI_BASE_URL}/v6/characters/{char_id}/wallet/journal/", token)
+        transactions = api.fetch_all_pages(f"{config.ESI_BASE_URL}/v1/characters/{char_id}/wallet/transactions/", token)
 
         if orders is None or journal is None:
             self.after(0, lambda: self.show_error("Kunne ikke hente ordrer eller journal fra ESI."))
             self.after(0, lambda: self.status_label.configure(text="Klar."))
             return
 
+        location_names = api.resolve_location_names([o['location_id'] for o in orders], token)
+
         unmatched_broker_fees = []
         if journal:
             for entry in journal:
@@ -560,7 +618,8 @@ class EveMarketApp(ctk.CTk):
                     if qty_from_this_buy == oldest_buy['quantity']:
                         temp_buy_queue.popleft()
                     else:
-                        temp_buy_queue[0]['quantity'] -= qty_from_this_buy
+                        # Ordrelistene fra ESI deles mellom kallerne og endres ikke; køen får en justert kopi
+                        temp_buy_queue[0] = dict(oldest_buy, quantity=oldest_buy['quantity'] - qty_from_this_buy)
                 
                 if items_accounted_for > 0:
                     buy_price_avg = cost_of_items / items_accounted_for
@@ -577,7 +636,7 @@ class EveMarketApp(ctk.CTk):
 
             values = (
                 id_to_name.get(type_id, f"ID: {type_id}"),
-                api.get_station_name_with_cache(order['location_id']),
+                location_names[order['location_id']],
                 "Kjøp" if is_buy else "Salg",
                 f"{buy_price_avg:,.2f}" if isinstance(buy_price_avg, (int, float)) else "N/A",
                 f"{order['price']:,.2f}",
@@ -606,23 +665,20 @@ class EveMarketApp(ctk.CTk):
         if not all_assets: return
         station_assets = [a for a in all_assets if a.get('location_flag') == 'Hangar']
         type_ids_to_price = list({a['type_id'] for a in station_assets})
-        market_prices = {}
-        for i in range(0, len(type_ids_to_price), 200):
-            chunk = type_ids_to_price[i:i+200]
-            price_data = api.fetch_fuzzwork_market_data(config.STATIONS_INFO['Jita']['id'], chunk)
-            for type_id, data in price_data.items():
-                market_prices[int(type_id)] = float(data.get('buy', {}).get('max', 0))
-            time.sleep(0.5)
-        total_assets_value = calculations.calculate_assets_value(station_assets, market_prices)
+        price_table = market_prices.fetch_price_table(config.STATIONS_INFO['Jita']['id'], type_ids_to_price)
+        asset_prices = {type_id: data['buy'].get('max', 0) for type_id, data in price_table.items()}
+        total_assets_value = calculations.calculate_assets_value(station_assets, asset_prices)
         grouped_assets = defaultdict(list)
         id_to_name = {v: k for k, v in config.ITEM_NAME_TO_ID.items()}
+        location_names = api.resolve_location_names([a['location_id'] for a in station_assets], token)
         for asset in station_assets:
-            grouped_assets[api.get_station_name_with_cache(asset['location_id'])].append({
+            grouped_assets[location_names[asset['location_id']]].append({
                 'name': id_to_name.get(asset['type_id'], f"Ukjent ID: {asset['type_id']}"),
-                'quantity': asset['quantity'], 'price': market_prices.get(asset['type_id'], 0)})
+                'quantity': asset['quantity'], 'price': asset_prices.get(asset['type_id'], 0)})
         self.after(0, self._update_assets_display, grouped_assets, total_assets_value)
 
     def _update_assets_display(self, grouped_assets, total_value):
+        self._get_tab_frame("assets")   # Eiendelene fylles inn selv om fanen ikke er åpnet ennå
         try:
             if not self.assets_tree.winfo_exists(): return
             self.clear_tree(self.assets_tree)
@@ -683,13 +739,9 @@ class EveMarketApp(ctk.CTk):
         if not config.SYSTEM_INDICES_CACHE: api.fetch_industry_system_indices()
         if not config.SYSTEM_INDICES_CACHE: return
         if not self.system_id_to_name_cache:
-            conn = db.connect_to_sde()
-            if conn:
-                cursor = conn.cursor()
-                ids = list(config.SYSTEM_INDICES_CACHE.keys())
-                cursor.execute(f"SELECT solarSystemID, solarSystemName FROM mapSolarSystems WHERE solarSystemID IN ({','.join('?'*len(ids))})", ids)
-                self.system_id_to_name_cache = {sys_id: name for sys_id, name in cursor.fetchall()}
-                conn.close()
+            uni = universe.get_universe()
+            if uni:
+                self.system_id_to_name_cache = {sys_id: uni.systems[sys_id].name for sys_id in config.SYSTEM_INDICES_CACHE if sys_id in uni.systems}
         self.all_system_names = sorted(self.system_id_to_name_cache.values())
 
     def _start_manufacturing_calculation(self):
@@ -810,18 +862,30 @@ class EveMarketApp(ctk.CTk):
         scan_config = {'scan_type': 'price_hunter', 'item_name': item_name, 'type_id': type_id,
                        'include_hisec': self.price_hunter_hisec_var.get(),
                        'include_lowsec': self.price_hunter_lowsec_var.get(),
-                       'include_nullsec': self.price_hunter_nullsec_var.get()}
+                       'include_nullsec': self.price_hunter_nullsec_var.get(),
+                       'origin': self.price_hunter_origin_var.get(),
+                       'user_structures': self.settings.get('user_structures', [])}
         self.clear_tree(self.price_hunter_tree)
         self.run_generic_scan(scan_config)
         
     def run_generic_scan(self, scan_config):
+        if not self.items_loaded.is_set(): self.show_error("Varelisten lastes fortsatt. Prøv igjen om et øyeblikk."); return
         if self.scan_thread and self.scan_thread.is_alive(): self.show_error("Et annet scan kjører allerede."); return
         self.scanning_active.set()
         scan_config['active_flag'] = self.scanning_active
         self._set_scanning_state(True, scan_config['scan_type'])
-        self.scan_thread = threading.Thread(target=lambda: (scanners.run_scan_thread(scan_config, self.progress_callback), self.after(0, self.reset_scanner_gui)), daemon=True)
+        self.scan_thread = threading.Thread(target=self._run_scan_and_report, args=(scan_config,), daemon=True)
         self.scan_thread.start()
 
+    def _run_scan_and_report(self, scan_config):
+        retry_stats = scanners.run_scan_thread(scan_config, self.progress_callback)
+        self.after(0, self._on_scan_finished, retry_stats)
+
+    def _on_scan_finished(self, retry_stats):
+        self.reset_scanner_gui()
+        if retry_stats and (retry_stats['retried'] or retry_stats['gave_up']):
+            self.status_label.configure(text=f"Klar. ESI: {retry_stats['retried']} nye forsøk, {retry_stats['gave_up']} kall feilet under skannet.")
+
     def stop_scan(self):
         if self.scan_thread and self.scan_thread.is_alive():
             self.scanning_active.clear()
@@ -853,14 +917,14 @@ class EveMarketApp(ctk.CTk):
         except (AttributeError, TclError): pass
     
     def add_scan_result(self, result, scan_type):
-        tree_map = {"station": self.scanner_tree, "arbitrage": self.arbitrage_tree, "region_trading": self.region_tree,
-                    "galaxy": self.galaxy_tree, "bpo_scanner": self.bpo_tree, "price_hunter": self.price_hunter_tree}
-        tree = tree_map.get(scan_type)
+        tree_map = {"station": "scanner_tree", "arbitrage": "arbitrage_tree", "region_trading": "region_tree",
+                    "galaxy": "galaxy_tree", "bpo_scanner": "bpo_tree", "price_hunter": "price_hunter_tree"}
+        tree = getattr(self, tree_map.get(scan_type, ""), None)
         if not tree or not tree.winfo_exists(): return
         try:
             if scan_type == 'price_hunter':
                 values = (f"{result['price']:,.2f}", f"{result['quantity']:,}", result['location_name'], 
-                          result['system_name'], result['security'])
+                          result['system_name'], result['security'], self._format_jumps(result.get('jumps')))
                 tree.insert("", "end", values=values)
                 return
 
@@ -894,6 +958,7 @@ class EveMarketApp(ctk.CTk):
                     f"Pakke ({bundle['item_count']} varer)", 
                     buy_station_text, 
                     f"{bundle['total_profit']:,.2f}",
+                    self._format_isk_per_jump(bundle.get('isk_per_jump')), self._format_jumps(bundle.get('jumps')),
                     f"{bundle['cargo_used_percentage']:.1f}%", "", "", "", "", "", "", ""
                 )
                 parent_id = tree.insert("", "end", values=parent_values, tags=('good_deal',))
@@ -905,7 +970,8 @@ class EveMarketApp(ctk.CTk):
                     child_values = (
                         item_display_name, 
                         station_display_name, 
-                        f"{item['profit']:,.2f}", "", 
+                        f"{item['profit']:,.2f}", "",
+                        self._format_jumps(item.get('jumps')) if bundle.get('is_multistation') else "", "",
                         f"{item['units']:,}",
                         f"{int(item['buy_volume_available']):,}", f"{int(item['sell_volume_available']):,}",
                         f"{item['buy_price']:,.2f}", f"{item['sell_price']:,.2f}", f"{int(item['daily_volume']):,}", 
@@ -918,7 +984,7 @@ class EveMarketApp(ctk.CTk):
             if result.get('profit_margin', 0) >= config.EXCELLENT_DEAL_MARGIN: tags = ('excellent_deal',)
             elif result.get('profit_margin', 0) >= config.GOOD_DEAL_MARGIN: tags = ('good_deal',)
             if scan_type in ['station', 'arbitrage']:
-                values = (result['item'], f"{result['profit_per_trip']:,.2f}", f"{result['profit_margin']:.2f}%", f"{int(result['units_to_trade']):,}", f"{int(result['buy_volume_available']):,}", f"{int(result['sell_volume_available']):,}", f"{result['buy_price']:,.2f}", f"{result['sell_price']:,.2f}", f"{int(result['daily_volume']):,}", result['trend'])
+                values = (result['item'], f"{result['profit_per_trip']:,.2f}", self._format_isk_per_jump(result.get('isk_per_jump')), self._format_jumps(result.get('jumps')), f"{result['profit_margin']:.2f}%", f"{int(result['units_to_trade']):,}", f"{int(result['buy_volume_available']):,}", f"{int(result['sell_volume_available']):,}", f"{result['buy_price']:,.2f}", f"{result['sell_price']:,.2f}", f"{int(result['daily_volume']):,}", result['trend'])
             elif scan_type == 'region_trading':
                 if result.get('daily_volume',0) >= config.GOLDEN_DEAL_MIN_VOLUME and result.get('competition',99) <= config.GOLDEN_DEAL_MAX_COMPETITION:
                     tags = ('golden_deal',)
@@ -928,6 +994,12 @@ class EveMarketApp(ctk.CTk):
         except (TclError, KeyError) as e:
             print(f"Error adding result to tree: {e}")
 
+    def _format_jumps(self, jumps):
+        return "-" if jumps is None else str(jumps)
+
+    def _format_isk_per_jump(self, isk_per_jump):
+        return "-" if isk_per_jump is None else f"{isk_per_jump:,.2f}"
+
     def _set_scanning_state(self, is_scanning, scan_type=None):
         state, stop_state = ("disabled", "normal") if is_scanning else ("normal", "disabled")
         st_map = {"station": "scanner", "arbitrage": "arbitrage", "region_trading": "region", 
@@ -957,7 +1029,7 @@ class EveMarketApp(ctk.CTk):
         
         values = tree.item(row_id)['values']
         
-        if tree is self.bpo_tree:
+        if tree is getattr(self, 'bpo_tree', None):
             bpo_name, product_name = values[0], values[1]
             bpo_type_id = config.ITEM_LOOKUP_LOWERCASE.get(bpo_name.lower())
             product_type_id = config.ITEM_LOOKUP_LOWERCASE.get(product_name.lower())
@@ -965,10 +1037,10 @@ class EveMarketApp(ctk.CTk):
             if product_type_id: self.right_click_menu.add_command(label=f"Åpne '{product_name}' i markedet", command=lambda t=product_type_id: self._open_in_game_market(t))
         else:
             is_parent = bool(tree.get_children(row_id))
-            if is_parent and tree is self.galaxy_tree:
+            if is_parent and tree is getattr(self, 'galaxy_tree', None):
                 self.right_click_menu.add_command(label="Kopier pakke til Multibuy", command=lambda: self._copy_bundle_to_clipboard(tree, row_id))
             else:
-                item_name_col_idx = 1 if tree is self.assets_tree else 0
+                item_name_col_idx = 1 if tree is getattr(self, 'assets_tree', None) else 0
                 item_name = str(values[item_name_col_idx]).lstrip("  └ ")
                 
                 id_match = re.search(r'(?:ID|Id):\s*(\d+)$', item_name)
@@ -996,10 +1068,11 @@ class EveMarketApp(ctk.CTk):
 
     def _copy_bundle_to_clipboard(self, tree, parent_id):
         item_lines = []
+        units_col_idx = tree['columns'].index('units')
         for child_id in tree.get_children(parent_id):
             values = tree.item(child_id)['values']
             item_name = values[0].lstrip("  └ ")
-            quantity = str(values[4]).replace(',', '')
+            quantity = str(values[units_col_idx]).replace(',', '')
             item_lines.append(f"{item_name} {quantity}")
         
         multibuy_string = "\n".join(item_lines)
@@ -1034,6 +1107,11 @@ class EveMarketApp(ctk.CTk):
         messagebox.showinfo("Navn Lagret", f"Navnet '{new_name}' er lagret.\n\nKlikk på en 'Oppdater'-knapp for å laste inn data på nytt med det nye navnet.")
 
     def load_all_regions(self):
+        # Regionene fra forrige økt ligger i den persistente cachen; ellers lastes de i bakgrunnen,
+        # siden første SDE-oppslag kan måtte bygge uttrekket (og hashe SDE-filen) før vinduet vises
+        if config.ALL_REGIONS_CACHE:
+            self.populate_region_dropdown()
+            return
         threading.Thread(target=lambda: (api.populate_all_regions_cache(), self.after(0, self.populate_region_dropdown)), daemon=True).start()
 
     def populate_region_dropdown(self):
@@ -1047,6 +1125,39 @@ class EveMarketApp(ctk.CTk):
         for s in self.settings.get('user_structures', []):
             self.structures_tree.insert("", "end", values=(s.get('name'), s.get('id'), s.get('system_name')))
     
+    def refresh_diagnostics(self, reschedule=True):
+        """Fyller diagnosepanelet med HTTP-telemetri. Tabellen oppdateres bare mens innstillingsfanen vises."""
+        if reschedule:
+            self.after(config.TELEMETRY_REFRESH_MS, self.refresh_diagnostics)
+        if self.current_main_frame is not self.frames.get("settings"):
+            return
+        snapshot = TELEMETRY.snapshot()
+        endpoints = snapshot['endpoints']
+        sources = snapshot['sources']
+        slow_limit = LATENCY_BUCKETS.index(1.0)
+        try:
+            self.clear_tree(self.diagnostics_tree)
+            for template, stats in endpoints.items():
+                slow = sum(list(stats['latency'].values())[slow_limit + 1:])
+                self.diagnostics_tree.insert("", "end", values=(
+                    template, stats['requests'], f"{stats['avg_time'] * 1000:.0f}", f"{stats['max_time'] * 1000:.0f}", slow,
+                    f"{stats['bytes'] / 1024:,.0f}", stats['not_modified'], stats['cache_hits'], stats['retries'],
+                    stats['shared'], stats['errors'] + stats['gave_up']))
+            total_requests = sum(s['requests'] for s in endpoints.values())
+            total_time = sum(s['avg_time'] * s['requests'] for s in endpoints.values())
+            total_mb = sum(s['bytes'] for s in endpoints.values()) / (1024 * 1024)
+            rates = ", ".join(f"{name} {rate}/s" for name, rate in (sources.get('rate_governors') or {}).items())
+            since = datetime.fromtimestamp(snapshot['since']).strftime('%H:%M:%S')
+            self.diagnostics_summary_label.configure(
+                text=f"Siden {since}: {total_requests} kall, {total_time:.1f} s ventetid, {total_mb:.1f} MB. "
+                     f"Rate: {rates}. Sammenslåtte kall: {sources.get('single_flight_shared', 0)}.")
+        except (TclError, AttributeError):
+            pass
+
+    def dump_diagnostics(self):
+        TELEMETRY.dump()
+        self.status_label.configure(text=f"HTTP-telemetri lagret til {config.TELEMETRY_FILE}.")
+
     def _add_structure_thread(self, structure_id, token):
         details = api.get_structure_details(structure_id, token)
         if not details: self.show_error(f"Kunne ikke hente detaljer for ID {structure_id}."); return
@@ -1081,9 +1192,9 @@ class EveMarketApp(ctk.CTk):
         char_id = self.auth_manager.character_info['id']
         # ... (resten av funksjonen er lik)
         self.after(0, lambda: self.trade_log_status_label.configure(text="Henter transaksjoner..."))
-        transactions = api.fetch_all_pages(f"https://esi.evetech.net/v1/characters/{char_id}/wallet/transactions/", token)
+        transactions = api.fetch_all_pages(f"{config.ESI_BASE_URL}/v1/characters/{char_id}/wallet/transactions/", token)
         self.after(0, lambda: self.trade_log_status_label.configure(text="Henter journal..."))
-        journal = api.fetch_all_pages(f"https://esi.evetech.net/v6/characters/{char_id}/wallet/journal/", token)
+        journal = api.fetch_all_pages(f"{config.ESI_BASE_URL}/v6/characters/{char_id}/wallet/journal/", token)
 
         if transactions is None or journal is None:
             self.after(0, lambda: self.show_error("Kunne ikke hente transaksjoner eller journal fra ESI."))
@@ -1099,7 +1210,8 @@ class EveMarketApp(ctk.CTk):
         for t in sorted(transactions, key=lambda x: x['date']):
             type_id = t['type_id']
             if t['is_buy']:
-                buy_queues[type_id].append(t)
+                # Kopi, siden mengden trekkes ned under matchingen og transaksjonslisten deles
+                buy_queues[type_id].append(dict(t))
             else:
                 quantity_to_sell = t['quantity']
                 units_sold = t['quantity']
@@ -1216,8 +1328,8 @@ class EveMarketApp(ctk.CTk):
             quantity = item['quantity']
             item_value = price * quantity
             total_cargo_value += item_value
-            history = api.fetch_esi_history(config.STATIONS_INFO['Jita']['region_id'], type_id)
-            avg_daily_vol = sum(h['volume'] for h in history[-7:]) / 7 if history and len(history) >= 7 else 0
+            summary = history_store.get_summary(config.STATIONS_INFO['Jita']['region_id'], type_id)
+            avg_daily_vol = summary['avg_daily_volume'] if summary else 0
             detailed_cargo_list.append({
                 'name': id_to_name.get(type_id, f"Ukjent Vare ID: {type_id}"),
                 'quantity': quantity,
@@ -1269,7 +1381,8 @@ class EveMarketApp(ctk.CTk):
         
         all_settings['user_structures'] = self.settings.get('user_structures', [])
         
-        # Lagre de oppdaterte innstillingene
+        # Lagre de oppdaterte innstillingene og cachene
         config.save_settings(all_settings)
+        config.CACHE_STORE.save()
         self.destroy()
 
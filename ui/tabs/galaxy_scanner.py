@@ -28,6 +28,7 @@ def create_tab(tab_frame, app):
     ctk.CTkLabel(settings_frame, text="Mål-region (Kjøp fra)").grid(row=2, column=0, padx=10, pady=5)
     app.galaxy_target_region_dropdown = ctk.CTkComboBox(settings_frame, variable=app.galaxy_target_region_var, values=["Laster..."], state="readonly")
     app.galaxy_target_region_dropdown.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+    app.populate_region_dropdown()   # Regionene kan være lastet før fanen bygges
 
     # Column 1: Filters
     ctk.CTkLabel(settings_frame, text="Min. profitt/tur").grid(row=0, column=1, padx=10, pady=5)
@@ -84,15 +85,17 @@ def create_tab(tab_frame, app):
     result_frame.grid_columnconfigure(0, weight=1)
     result_frame.grid_rowconfigure(0, weight=1)
     
-    columns = ('item', 'buy_station', 'profit', 'cargo_used', 'units', 'buy_vol', 'sell_vol', 'buy_price', 'sell_price', 'daily_vol', 'trend')
+    columns = ('item', 'buy_station', 'profit', 'isk_jump', 'jumps', 'cargo_used', 'units', 'buy_vol', 'sell_vol', 'buy_price', 'sell_price', 'daily_vol', 'trend')
     app.galaxy_tree = ttk.Treeview(result_frame, columns=columns, show="headings")
-    headings = {'item':'Vare/Pakke', 'buy_station':'Kjøp Fra', 'profit':'Profitt', 'cargo_used':'Last %', 'units':'Enheter', 'buy_vol':'Kjøp Vol.', 'sell_vol':'Salg Vol.', 'buy_price':'Kjøpspris', 'sell_price':'Salgspris', 'daily_vol':'Daglig Vol.', 'trend':'Trend'}
+    headings = {'item':'Vare/Pakke', 'buy_station':'Kjøp Fra', 'profit':'Profitt', 'isk_jump':'ISK/Hopp', 'jumps':'Hopp', 'cargo_used':'Last %', 'units':'Enheter', 'buy_vol':'Kjøp Vol.', 'sell_vol':'Salg Vol.', 'buy_price':'Kjøpspris', 'sell_price':'Salgspris', 'daily_vol':'Daglig Vol.', 'trend':'Trend'}
     for col, text in headings.items():
         app.galaxy_tree.heading(col, text=text, command=lambda c=col: app.sort_results(app.galaxy_tree, c, False))
     
     for col, width in {'item':300, 'buy_station':200, 'profit':120, 'cargo_used':80}.items():
         app.galaxy_tree.column(col, anchor='w', width=width)
-    for col in columns[4:]:
+    for col, width in {'isk_jump':120, 'jumps':70}.items():
+        app.galaxy_tree.column(col, anchor='e', width=width)
+    for col in columns[6:]:
         app.galaxy_tree.column(col, anchor='e', width=100)
     
     app.galaxy_tree.tag_configure('good_deal', background='#2E7D32')
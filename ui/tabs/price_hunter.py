@@ -1,5 +1,6 @@
 import customtkinter as ctk
 from tkinter import ttk
+import config
 
 def create_tab(tab_frame, app):
     """
@@ -29,10 +30,15 @@ def create_tab(tab_frame, app):
     ctk.CTkCheckBox(security_frame, text="Low-sec", variable=app.price_hunter_lowsec_var).pack(side="left", padx=5)
     ctk.CTkCheckBox(security_frame, text="Null-sec", variable=app.price_hunter_nullsec_var).pack(side="left", padx=5)
 
+    origin_frame = ctk.CTkFrame(input_frame, fg_color="transparent")
+    origin_frame.grid(row=0, column=3, padx=15, pady=15)
+    ctk.CTkLabel(origin_frame, text="Hopp fra:").pack(side="left", padx=5)
+    ctk.CTkComboBox(origin_frame, variable=app.price_hunter_origin_var, values=list(config.STATIONS_INFO.keys()), state="readonly", width=110).pack(side="left", padx=5)
+
     app.price_hunter_scan_button = ctk.CTkButton(input_frame, text="Start Søk", command=app.start_price_hunter_scan, height=35)
-    app.price_hunter_scan_button.grid(row=0, column=3, padx=15, pady=15)
+    app.price_hunter_scan_button.grid(row=0, column=4, padx=15, pady=15)
     app.price_hunter_stop_button = ctk.CTkButton(input_frame, text="Stopp", command=app.stop_scan, state="disabled", height=35, fg_color="#D32F2F", hover_color="#B71C1C")
-    app.price_hunter_stop_button.grid(row=0, column=4, padx=15, pady=15)
+    app.price_hunter_stop_button.grid(row=0, column=5, padx=15, pady=15)
 
     # --- Result Frame ---
     result_frame = ctk.CTkFrame(tab_frame, fg_color=("gray92", "gray28"))
@@ -40,9 +46,9 @@ def create_tab(tab_frame, app):
     result_frame.grid_columnconfigure(0, weight=1)
     result_frame.grid_rowconfigure(0, weight=1)
 
-    columns = ('price', 'quantity', 'location', 'system', 'security')
+    columns = ('price', 'quantity', 'location', 'system', 'security', 'jumps')
     app.price_hunter_tree = ttk.Treeview(result_frame, columns=columns, show="headings")
-    headings = {'price': 'Pris', 'quantity': 'Antall', 'location': 'Lokasjon', 'system': 'System', 'security': 'Sikkerhet'}
+    headings = {'price': 'Pris', 'quantity': 'Antall', 'location': 'Lokasjon', 'system': 'System', 'security': 'Sikkerhet', 'jumps': 'Hopp'}
     for col, text in headings.items():
         app.price_hunter_tree.heading(col, text=text, command=lambda c=col: app.sort_results(app.price_hunter_tree, c, False))
     
@@ -51,6 +57,7 @@ def create_tab(tab_frame, app):
     app.price_hunter_tree.column('location', anchor='w', width=300)
     app.price_hunter_tree.column('system', anchor='w', width=150)
     app.price_hunter_tree.column('security', anchor='center', width=100)
+    app.price_hunter_tree.column('jumps', anchor='e', width=80)
 
     app.price_hunter_tree.grid(row=0, column=0, sticky="nsew", padx=(1,0), pady=1)
     scrollbar = ttk.Scrollbar(result_frame, orient="vertical", command=app.price_hunter_tree.yview)
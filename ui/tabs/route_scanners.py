@@ -72,11 +72,11 @@ def create_tab(tab_frame, app, scan_type):
     result_frame.grid_columnconfigure(0, weight=1)
     result_frame.grid_rowconfigure(0, weight=1)
 
-    columns = ('item', 'profit', 'margin', 'units', 'buy_vol', 'sell_vol', 'buy_price', 'sell_price', 'daily_vol', 'trend')
+    columns = ('item', 'profit', 'isk_jump', 'jumps', 'margin', 'units', 'buy_vol', 'sell_vol', 'buy_price', 'sell_price', 'daily_vol', 'trend')
     tree = ttk.Treeview(result_frame, columns=columns, show="headings")
     setattr(app, f"{scan_type}_tree", tree)
     
-    headings = {'item':'Vare', 'profit':'Profitt/Tur', 'margin':'Margin', 'units':'Enheter/Tur', 'buy_vol':'Kjøp Vol.', 'sell_vol':'Salg Vol.', 'buy_price':'Kjøpspris', 'sell_price':'Salgspris', 'daily_vol':'Daglig Vol.', 'trend':'Trend'}
+    headings = {'item':'Vare', 'profit':'Profitt/Tur', 'isk_jump':'ISK/Hopp', 'jumps':'Hopp', 'margin':'Margin', 'units':'Enheter/Tur', 'buy_vol':'Kjøp Vol.', 'sell_vol':'Salg Vol.', 'buy_price':'Kjøpspris', 'sell_price':'Salgspris', 'daily_vol':'Daglig Vol.', 'trend':'Trend'}
     for col, text in headings.items():
         tree.heading(col, text=text, command=lambda c=col: app.sort_results(tree, c, False))
 
@@ -1,5 +1,8 @@
 import customtkinter as ctk
 from tkinter import ttk
+import jump_graph
+import market_prices
+from telemetry import TELEMETRY
 
 def create_tab(tab_frame, app):
     """
@@ -22,6 +25,10 @@ def create_tab(tab_frame, app):
     ctk.CTkEntry(fees_frame, textvariable=app.sales_tax_var).grid(row=1, column=1, padx=15, pady=10, sticky="ew")
     ctk.CTkLabel(fees_frame, text="Megleravgift (%):").grid(row=2, column=0, padx=15, pady=10, sticky="w")
     ctk.CTkEntry(fees_frame, textvariable=app.brokers_fee_var).grid(row=2, column=1, padx=15, pady=10, sticky="ew")
+    ctk.CTkLabel(fees_frame, text="Priskilde for skann:").grid(row=3, column=0, padx=15, pady=10, sticky="w")
+    ctk.CTkComboBox(fees_frame, variable=app.price_source_var, values=list(market_prices.PRICE_SOURCES), state="readonly").grid(row=3, column=1, padx=15, pady=10, sticky="ew")
+    ctk.CTkLabel(fees_frame, text="Rutevalg for hopp:").grid(row=4, column=0, padx=15, pady=10, sticky="w")
+    ctk.CTkComboBox(fees_frame, variable=app.route_policy_var, values=list(jump_graph.ROUTE_POLICIES), state="readonly").grid(row=4, column=1, padx=15, pady=10, sticky="ew")
 
     # --- API Settings Frame ---
     api_frame = ctk.CTkFrame(tab_frame, fg_color=("gray92", "gray28"))
@@ -64,4 +71,29 @@ def create_tab(tab_frame, app):
     app.new_structure_id_entry = ctk.CTkEntry(control_frame)
     app.new_structure_id_entry.grid(row=0, column=1, padx=5, sticky="ew")
     ctk.CTkButton(control_frame, text="Legg til", command=app.add_user_structure).grid(row=0, column=2, padx=5)
-    ctk.CTkButton(control_frame, text="Slett valgt", command=app.delete_user_structure, fg_color="#D32F2F", hover_color="#B71C1C").grid(row=0, column=3, padx=5)
\ No newline at end of file
+    ctk.CTkButton(control_frame, text="Slett valgt", command=app.delete_user_structure, fg_color="#D32F2F", hover_color="#B71C1C").grid(row=0, column=3, padx=5)
+
+    # --- Diagnostics Frame (HTTP-telemetri) ---
+    diagnostics_frame = ctk.CTkFrame(tab_frame, fg_color=("gray92", "gray28"))
+    diagnostics_frame.grid(row=4, column=0, sticky="ew", padx=10, pady=10)
+    diagnostics_frame.grid_columnconfigure(0, weight=1)
+
+    diagnostics_header = ctk.CTkFrame(diagnostics_frame, fg_color="transparent")
+    diagnostics_header.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="ew")
+    diagnostics_header.grid_columnconfigure(0, weight=1)
+    ctk.CTkLabel(diagnostics_header, text="Diagnose: HTTP-kall", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, padx=5, sticky="w")
+    ctk.CTkButton(diagnostics_header, text="Nullstill", width=90, command=lambda: (TELEMETRY.reset(), app.refresh_diagnostics(reschedule=False))).grid(row=0, column=1, padx=5)
+    ctk.CTkButton(diagnostics_header, text="Lagre JSON", width=90, command=app.dump_diagnostics).grid(row=0, column=2, padx=5)
+
+    app.diagnostics_summary_label = ctk.CTkLabel(diagnostics_frame, text="", anchor="w", justify="left")
+    app.diagnostics_summary_label.grid(row=1, column=0, padx=15, pady=5, sticky="ew")
+
+    columns = {'endpoint': 'Endepunkt', 'requests': 'Kall', 'avg_ms': 'Snitt (ms)', 'max_ms': 'Maks (ms)', 'slow': '>1s',
+               'kb': 'Data (KB)', 'not_modified': '304', 'cache_hits': 'Cache-treff', 'retries': 'Nye forsøk',
+               'shared': 'Delt', 'errors': 'Feil'}
+    app.diagnostics_tree = ttk.Treeview(diagnostics_frame, columns=list(columns), show='headings', height=8)
+    for col, text in columns.items():
+        app.diagnostics_tree.heading(col, text=text, command=lambda c=col: app.sort_results(app.diagnostics_tree, c, False))
+        app.diagnostics_tree.column(col, width=360 if col == 'endpoint' else 80, anchor="w" if col == 'endpoint' else "e", stretch=col == 'endpoint')
+    app.diagnostics_tree.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="ew")
+    app.refresh_diagnostics()
\ No newline at end of file
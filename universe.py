@@ -0,0 +1,96 @@
+# ==============================================================================
+# EVE MARKET VERKTØY - UNIVERS-MODELL (SDE)
+# ==============================================================================
+# Regioner, konstellasjoner, solsystemer og NPC-stasjoner lastes fra SDE én
+# gang og holdes indeksert i minnet, slik at oppslag som "navn på region",
+# "security for system" eller "stasjoner i region" ikke krever verken
+# SQLite-tilkoblinger eller ESI-kall.
+import threading
+from collections import defaultdict, namedtuple
+
+import db
+
+SolarSystem = namedtuple('SolarSystem', ['id', 'name', 'region_id', 'constellation_id', 'security', 'security_rounded'])
+Station = namedtuple('Station', ['id', 'name', 'system_id', 'region_id'])
+
+_UNIVERSE = None
+_UNIVERSE_LOCK = threading.Lock()
+
+class Universe:
+    """Indeksert modell av regioner, konstellasjoner, solsystemer og stasjoner."""
+    def __init__(self, tables):
+        self.regions = dict(tables['regions'])
+        self.region_ids_by_name = {name: region_id for region_id, name in self.regions.items()}
+        self.constellations = {c_id: (name, region_id) for c_id, name, region_id in tables['constellations']}
+        self.systems = {}
+        self.system_ids_by_name = {}
+        self.systems_in_region = defaultdict(list)
+        for row in tables['systems']:
+            system = SolarSystem(*row)
+            self.systems[system.id] = system
+            self.system_ids_by_name[system.name.lower()] = system.id
+            self.systems_in_region[system.region_id].append(system.id)
+        self.stations = {}
+        self.stations_by_system = defaultdict(list)
+        self.stations_by_region = defaultdict(list)
+        for row in tables['stations']:
+            station = Station(*row)
+            self.stations[station.id] = station
+            self.stations_by_system[station.system_id].append(station.id)
+            self.stations_by_region[station.region_id].append(station.id)
+
+    def k_space_regions(self):
+        """{regionnavn: regionID} for alle vanlige regioner (ID 10xxxxxx, ikke wormhole/abyss)."""
+        return {name: region_id for region_id, name in self.regions.items() if str(region_id).startswith('10')}
+
+    def region_name(self, region_id):
+        return self.regions.get(region_id)
+
+    def region_for_system(self, system_id):
+        system = self.systems.get(system_id)
+        return system.region_id if system else None
+
+    def system_name(self, system_id):
+        system = self.systems.get(system_id)
+        return system.name if system else f"Ukjent System ID: {system_id}"
+
+    def system_id(self, system_name):
+        return self.system_ids_by_name.get(system_name.lower())
+
+    def station_name(self, station_id):
+        station = self.stations.get(station_id)
+        return station.name if station else None
+
+    def stations_in_region(self, region_id, user_structures=()):
+        """
+        {stasjonsID: navn} for alle NPC-stasjoner i regionen, pluss brukerens
+        egne strukturer (settings['user_structures']) som ligger der.
+        """
+        stations = {s_id: self.stations[s_id].name for s_id in self.stations_by_region.get(region_id, [])}
+        stations.update({s['id']: s['name'] for s in user_structures if s.get('region_id') == region_id})
+        return stations
+
+    def stations_in_system(self, system_id, user_structures=()):
+        """{stasjonsID: navn} for NPC-stasjoner og egne strukturer i ett solsystem."""
+        stations = {s_id: self.stations[s_id].name for s_id in self.stations_by_system.get(system_id, [])}
+        stations.update({s['id']: s['name'] for s in user_structures if s.get('system_id') == system_id})
+        return stations
+
+    def security_statuses(self):
+        """{solarSystemID: security avrundet til én desimal}, som db.get_all_system_security_statuses()."""
+        return {system_id: system.security_rounded for system_id, system in self.systems.items()}
+
+def get_universe():
+    """
+    Returnerer den globale univers-modellen, lastet fra SDE ved første kall.
+    Returnerer None hvis SDE ikke kan leses; da prøves det igjen neste gang.
+    """
+    global _UNIVERSE
+    if _UNIVERSE is None:
+        with _UNIVERSE_LOCK:
+            if _UNIVERSE is None:
+                tables = db.get_universe_tables()
+                if tables:
+                    _UNIVERSE = Universe(tables)
+                    print(f"Univers lastet fra SDE: {len(_UNIVERSE.regions)} regioner, {len(_UNIVERSE.systems)} systemer, {len(_UNIVERSE.stations)} stasjoner.")
+    return _UNIVERSE